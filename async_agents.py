@@ -0,0 +1,90 @@
+"""
+Async orchestration for agent calls.
+
+The agent modules have async counterparts (``ainvoke``/``astream``) of their
+blocking calls. This module runs independent calls concurrently under a
+bounded semaphore (``gather_bounded``). It also gives synchronous callers
+such as the Streamlit script thread a way in:
+
+- ``submit`` starts a coroutine and returns a future
+- ``run_sync`` waits for its result
+
+Both schedule onto one long-lived background event loop. The shared async
+HTTP client is bound to the loop it first runs on, so every coroutine from
+sync code goes through this loop instead of a fresh ``asyncio.run`` per call.
+Code that already runs in an event loop (e.g. the batch runner) awaits the
+async functions directly.
+"""
+
+import asyncio
+import contextvars
+import os
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Coroutine, Iterable, List, Optional
+
+MAX_CONCURRENCY = int(os.environ.get("AGENT_MAX_CONCURRENCY", "8"))
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+async def gather_bounded(awaitables: Iterable[Awaitable[Any]], limit: int = MAX_CONCURRENCY) -> List[Any]:
+    """Await all ``awaitables`` with at most ``limit`` running at once, returning results in order"""
+    semaphore = asyncio.Semaphore(limit)
+
+    async def bounded(awaitable: Awaitable[Any]) -> Any:
+        async with semaphore:
+            return await awaitable
+
+    return await asyncio.gather(*(bounded(awaitable) for awaitable in awaitables))
+
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """Return the background event loop, starting it on first use"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="agent-event-loop", daemon=True).start()
+        return _loop
+
+
+def submit(coroutine: Coroutine[Any, Any, Any]) -> Future:
+    """Start ``coroutine`` on the background loop without waiting for it
+
+    The coroutine runs in a copy of the caller's context, so context variables
+    such as the rate limiter's scope carry over.
+    """
+    loop = get_event_loop()
+    context = contextvars.copy_context()
+    future: Future = Future()
+
+    def start() -> None:
+        # The future stays pending (not running) until the task is done, so it can still be cancelled
+        if future.cancelled():
+            coroutine.close()
+            return
+        task = loop.create_task(coroutine, context=context)
+        task.add_done_callback(lambda done: _copy_result(done, future))
+        # Cancelling the returned future cancels the task
+        future.add_done_callback(lambda _: future.cancelled() and loop.call_soon_threadsafe(task.cancel))
+
+    loop.call_soon_threadsafe(start)
+    return future
+
+
+def _copy_result(task: asyncio.Task, future: Future) -> None:
+    if future.done():
+        return
+    if task.cancelled():
+        future.cancel()
+    elif task.exception() is not None:
+        future.set_exception(task.exception())
+    else:
+        future.set_result(task.result())
+
+
+def run_sync(coroutine: Coroutine[Any, Any, Any]) -> Any:
+    """Run ``coroutine`` on the background loop and wait for its result"""
+    return submit(coroutine).result()
@@ -0,0 +1,191 @@
+"""
+Headless batch runner for the resume enhancement pipeline.
+
+Runs the non-interactive stages over a directory of PDF/TXT resumes:
+
+- analysis -> interview questions, for every resume
+- insights -> enhancement -> verification, for resumes that have a
+  transcript file ``<transcripts-dir>/<resume stem>.json`` containing the
+  interview as a list of ``{"role": "user" | "assistant", "content": ...}``
+
+Resumes are processed with bounded async concurrency, awaiting the async
+workflow nodes directly so no thread is held per in-flight model call, and
+each result is appended to a JSONL file as soon as it finishes. Re-running with the same
+output file skips resumes that already completed, so an interrupted batch
+picks up where it left off. ``--job-description FILE`` targets every resume
+at one role (see ``relevance.py``).
+
+Usage:
+    python batch_enhance.py resumes/ --output results.jsonl --transcripts transcripts/
+    python batch_enhance.py resumes/ --output results.jsonl --fake-llm
+    python batch_enhance.py resumes/ --output results.jsonl --job-description posting.txt
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+from async_agents import run_sync
+from rate_limiter import set_scope
+from resume_ingestion import extract_resume_text
+from workflow_loader import load_workflow_module
+
+RESUME_EXTENSIONS = {".pdf", ".txt"}
+
+
+def read_resume(path: Path) -> str:
+    """Extract the text of a PDF or TXT resume"""
+    return extract_resume_text(path.read_bytes(), path.suffix)
+
+
+def load_transcript(transcripts_dir: Optional[Path], resume_path: Path) -> Optional[List[Dict[str, str]]]:
+    """Load the interview transcript supplied for a resume, if any"""
+    if transcripts_dir is None:
+        return None
+    transcript_path = transcripts_dir / f"{resume_path.stem}.json"
+    if not transcript_path.exists():
+        return None
+    with open(transcript_path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def find_resumes(input_dir: Path) -> List[Path]:
+    return sorted(
+        path for path in input_dir.rglob("*")
+        if path.is_file() and path.suffix.lower() in RESUME_EXTENSIONS
+    )
+
+
+def completed_ids(output_path: Path) -> Set[str]:
+    """Return the ids of resumes that already have a successful result in the output file"""
+    done = set()
+    if not output_path.exists():
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short by an interruption; the resume is simply re-run
+                continue
+            if record.get("status") == "ok":
+                done.add(record["id"])
+    return done
+
+
+def resume_id(path: Path, input_dir: Path) -> str:
+    """Identify a resume by its relative path and content, so edited files are re-run"""
+    digest = hashlib.sha256(path.read_bytes()).hexdigest()[:16]
+    return f"{path.relative_to(input_dir).as_posix()}@{digest}"
+
+
+def initial_state(resume_content: str, job_description: Optional[str] = None) -> Dict[str, Any]:
+    state: Dict[str, Any] = {"resume_content": resume_content}
+    if job_description:
+        state["job_description"] = job_description
+    return state
+
+
+def process_resume(path: Path, transcripts_dir: Optional[Path] = None,
+                   job_description: Optional[str] = None) -> Dict[str, Any]:
+    """Run the non-interactive pipeline stages for one resume"""
+    workflow = load_workflow_module()
+    state = initial_state(read_resume(path), job_description)
+    state.update(workflow.analyze_resume(state))
+    state.update(workflow.generate_questions(state))
+
+    chat_history = load_transcript(transcripts_dir, path)
+    if chat_history:
+        state["chat_history"] = chat_history
+        state.update(workflow.generate_insights(state))
+        state.update(workflow.enhance_resume(state))
+        state.update(workflow.verify_resume(state))
+
+    return state
+
+
+async def aprocess_resume(path: Path, transcripts_dir: Optional[Path] = None,
+                          job_description: Optional[str] = None) -> Dict[str, Any]:
+    """Async counterpart of ``process_resume``"""
+    # Each resume runs in its own task, so the limiter queues it fairly against the others
+    set_scope(path.name)
+    workflow = load_workflow_module()
+    state = initial_state(await asyncio.to_thread(read_resume, path), job_description)
+    state.update(await workflow.aanalyze_resume(state))
+    state.update(await workflow.agenerate_questions(state))
+
+    chat_history = load_transcript(transcripts_dir, path)
+    if chat_history:
+        state["chat_history"] = chat_history
+        state.update(await workflow.agenerate_insights(state))
+        state.update(await workflow.aenhance_resume(state))
+        state.update(await workflow.averify_resume(state))
+
+    return state
+
+
+async def arun_batch(input_dir, output_path, transcripts_dir=None, concurrency: int = 4,
+                     job_description: Optional[str] = None) -> Dict[str, int]:
+    """Process every resume in ``input_dir``, appending results to ``output_path``"""
+    input_dir, output_path = Path(input_dir), Path(output_path)
+    transcripts_dir = Path(transcripts_dir) if transcripts_dir else None
+    done = completed_ids(output_path)
+    pending = [(path, resume_id(path, input_dir)) for path in find_resumes(input_dir)]
+    pending = [(path, rid) for path, rid in pending if rid not in done]
+    summary = {"skipped": len(done), "ok": 0, "error": 0}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    with open(output_path, "a", encoding="utf-8") as out:
+        async def run_one(path: Path, rid: str) -> None:
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    state = await aprocess_resume(path, transcripts_dir, job_description)
+                    record = {"id": rid, "file": str(path), "status": "ok", **state}
+                except Exception as e:
+                    record = {"id": rid, "file": str(path), "status": "error", "error": f"{type(e).__name__}: {e}"}
+                record["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+            # Writes happen on the event loop thread, one whole line at a time
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+            summary[record["status"]] += 1
+
+        await asyncio.gather(*(run_one(path, rid) for path, rid in pending))
+
+    return summary
+
+
+def run_batch(input_dir, output_path, transcripts_dir=None, concurrency: int = 4,
+              job_description: Optional[str] = None) -> Dict[str, int]:
+    """Synchronous wrapper around ``arun_batch``"""
+    # The shared async HTTP client stays bound to one loop across batches in a process
+    return run_sync(arun_batch(input_dir, output_path, transcripts_dir, concurrency, job_description))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Enhance a directory of resumes without the Streamlit UI")
+    parser.add_argument("input_dir", help="Directory containing PDF/TXT resumes")
+    parser.add_argument("--output", default="batch_results.jsonl", help="JSONL file results are appended to")
+    parser.add_argument("--transcripts", help="Directory of <resume stem>.json interview transcripts")
+    parser.add_argument("--concurrency", type=int, default=int(os.environ.get("BATCH_CONCURRENCY", "4")))
+    parser.add_argument("--fake-llm", action="store_true", help="Use the local deterministic fake model")
+    parser.add_argument("--job-description", help="Text file with the job description to target every resume at")
+    args = parser.parse_args(argv)
+    job_description = Path(args.job_description).read_text(encoding="utf-8") if args.job_description else None
+
+    if args.fake_llm:
+        from fake_llm import use_fake_llm
+        use_fake_llm()
+
+    summary = run_batch(args.input_dir, args.output, args.transcripts, args.concurrency, job_description)
+    print(f"Done: {summary['ok']} enhanced, {summary['error']} failed, {summary['skipped']} already completed")
+    return 1 if summary["error"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
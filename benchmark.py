@@ -0,0 +1,221 @@
+"""
+Offline end-to-end benchmark.
+
+Drives complete sessions through the real Streamlit app with Streamlit's
+``AppTest`` harness. Every model call is served by the local fake model, with
+a configurable time to first token and token rate, so no API key, network or
+spend is needed:
+
+    ingestion -> analysis -> questions -> N interview turns -> insights
+    -> enhance -> verify -> PDF
+
+Each session runs in a fresh process, so its peak RSS can be measured on its
+own. The report has:
+
+- p50/p95 wall time per stage: per agent, from the instrumentation timeline,
+  plus ingestion
+- p50/p95 wall time per UI step (each AppTest interaction)
+- rerun overhead: a full app rerun with no model work
+- peak RSS per session
+- PDF rendering throughput
+
+Usage:
+    python benchmark.py --sessions 5 --turns 6 --ttft-ms 400 --tokens-per-sec 60
+    python benchmark.py --sessions 1 --turns 2 --json bench.json
+"""
+
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List
+
+APP_PATH = str(Path(__file__).with_name("resume-enhancement-app.py"))
+RERUNS = 10
+
+# instrumentation agent name -> report stage
+AGENT_STAGES = {
+    "analyzer": "analysis",
+    "question_generator": "questions",
+    "interviewer": "interview_turn",
+    "interview_summarizer": "interview_summary",
+    "insight_tracker": "insights",
+    "insights": "insights",
+    "enhancer": "enhance",
+    "fact_checker": "verify",
+}
+
+
+def sample_resume(index: int) -> str:
+    """A resume that differs per session, so no session is served from another's caches"""
+    roles = "\n".join(
+        f"""## Software Engineer {year}, Company {index}-{year}
+- Built services in Python and Go handling {year * 7 % 900 + 100} requests per second
+- Worked with the data team on reporting pipelines
+- Maintained CI/CD pipelines and on-call rotations
+"""
+        for year in range(2012, 2024, 2)
+    )
+    return f"# Candidate {index}\n**Backend Engineer**\n\n{roles}\n## Skills\n- Python, Go, SQL, Kubernetes\n"
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    return ordered[max(math.ceil(q * len(ordered)) - 1, 0)]
+
+
+def _click(at, key: str) -> None:
+    at.button(key=key).click().run()
+
+
+def run_session(index: int, turns: int) -> Dict[str, Any]:
+    """Run one session end to end (in a worker process) and return its raw timings"""
+    from streamlit.testing.v1 import AppTest
+
+    from fake_llm import use_fake_llm
+    from instrumentation import get_metrics
+    from pdf_renderer import render_pdf
+    from resume_ingestion import extract_resume_text
+
+    use_fake_llm()
+    steps: Dict[str, List[float]] = defaultdict(list)
+    stages: Dict[str, List[float]] = defaultdict(list)
+
+    def step(name: str, action) -> None:
+        started = time.perf_counter()
+        action()
+        steps[name].append(time.perf_counter() - started)
+        if at.exception:
+            raise RuntimeError(f"{name} failed: {[e.message for e in at.exception]}")
+
+    resume_pdf = render_pdf(sample_resume(index))
+    started = time.perf_counter()
+    resume_text = extract_resume_text(resume_pdf, "pdf")
+    stages["ingestion"].append(time.perf_counter() - started)
+
+    at = AppTest.from_file(APP_PATH, default_timeout=600)
+    at.session_state["api_key"] = "sk-benchmark"
+    at.session_state["resume_content"] = resume_text
+    at.session_state["current_step"] = "analysis"
+
+    step("analysis_and_questions", at.run)
+    step("open_interview", lambda: _click(at, "to_interview"))
+    for turn in range(max(turns, 2)):
+        answer = f"In project {turn} I cut latency by {10 + turn}% and mentored {turn + 1} engineers"
+        step("interview_turn", lambda: at.chat_input[0].set_value(answer).run())
+    step("finish_interview_and_enhance", lambda: _click(at, "finish_interview"))
+    step("verify", lambda: _click(at, "to_verification"))
+    step("download", lambda: _click(at, "to_download"))
+    for _ in range(RERUNS):
+        step("rerun", at.run)
+
+    for event in get_metrics().session_timeline(at.session_state["session_id"]):
+        if event["kind"] == "llm":
+            stages[AGENT_STAGES.get(event["agent"], event["agent"])].append(event["duration"])
+
+    return {
+        "steps": dict(steps),
+        "stages": dict(stages),
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def summarize(samples: Dict[str, List[float]]) -> Dict[str, Dict[str, float]]:
+    return {
+        name: {"n": len(values), "p50_ms": percentile(values, 0.5) * 1000, "p95_ms": percentile(values, 0.95) * 1000}
+        for name, values in samples.items()
+    }
+
+
+def run_benchmark(sessions: int = 3, turns: int = 4, ttft_ms: float = 0, tokens_per_sec: float = 0) -> Dict[str, Any]:
+    """Run ``sessions`` sessions one after another, each in a fresh process, and aggregate them"""
+    with tempfile.TemporaryDirectory(prefix="resume-bench-") as workdir:
+        env = {
+            "FAKE_LLM_TTFT_MS": str(ttft_ms),
+            "FAKE_LLM_TOKENS_PER_SEC": str(tokens_per_sec),
+            "LLM_CACHE_PATH": os.path.join(workdir, "llm_cache.sqlite3"),
+            "RESUME_INDEX_PATH": os.path.join(workdir, "resume_index.sqlite3"),
+            "WORKFLOW_CHECKPOINT_PATH": os.path.join(workdir, "checkpoints.sqlite3"),
+            "SESSION_STORE_PATH": os.path.join(workdir, "sessions.sqlite3"),
+            "AGENT_TRACE_PATH": "",
+            "METRICS_PORT": "",
+        }
+        # Spawned workers inherit this process's environment and read it at import time;
+        # the caller's values are restored afterwards
+        saved = {name: os.environ.get(name) for name in env}
+        os.environ.update(env)
+        try:
+            results = []
+            for index in range(sessions):
+                with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+                    results.append(executor.submit(run_session, index, turns).result())
+        finally:
+            for name, value in saved.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+
+    steps: Dict[str, List[float]] = defaultdict(list)
+    stages: Dict[str, List[float]] = defaultdict(list)
+    for result in results:
+        for name, values in result["steps"].items():
+            steps[name].extend(values)
+        for name, values in result["stages"].items():
+            stages[name].extend(values)
+
+    from pdf_renderer import benchmark as pdf_benchmark
+
+    peak_rss = [result["peak_rss_mb"] for result in results]
+    return {
+        "config": {"sessions": sessions, "turns": turns, "ttft_ms": ttft_ms, "tokens_per_sec": tokens_per_sec},
+        "stages": summarize(stages),
+        "steps": summarize({name: values for name, values in steps.items() if name != "rerun"}),
+        "rerun_overhead": summarize({"rerun": steps["rerun"]})["rerun"],
+        "peak_rss_mb": {"max": max(peak_rss), "mean": sum(peak_rss) / len(peak_rss)},
+        "pdf": pdf_benchmark(),
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    config = report["config"]
+    print(f"{config['sessions']} sessions, {config['turns']} interview turns, "
+          f"TTFT {config['ttft_ms']} ms, {config['tokens_per_sec']} tokens/s")
+    for section in ("stages", "steps"):
+        print(f"\n{section.capitalize():<32}{'n':>5}{'p50 ms':>12}{'p95 ms':>12}")
+        for name, row in report[section].items():
+            print(f"  {name:<30}{row['n']:>5}{row['p50_ms']:>12.1f}{row['p95_ms']:>12.1f}")
+    rerun = report["rerun_overhead"]
+    print(f"\nRerun overhead: p50 {rerun['p50_ms']:.1f} ms, p95 {rerun['p95_ms']:.1f} ms")
+    print(f"Peak RSS per session: max {report['peak_rss_mb']['max']:.0f} MB, mean {report['peak_rss_mb']['mean']:.0f} MB")
+    print(f"PDF throughput: {report['pdf']['pages_per_second']:.1f} pages/sec")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the full resume pipeline offline with a fake LLM")
+    parser.add_argument("--sessions", type=int, default=3)
+    parser.add_argument("--turns", type=int, default=4, help="Interview turns per session (at least 2)")
+    parser.add_argument("--ttft-ms", type=float, default=0, help="Simulated time to first token")
+    parser.add_argument("--tokens-per-sec", type=float, default=0, help="Simulated output rate; 0 for instant")
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.sessions, args.turns, args.ttft_ms, args.tokens_per_sec)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
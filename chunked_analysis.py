@@ -0,0 +1,216 @@
+"""
+Map-reduce analysis for long resumes.
+
+Single-shot analysis puts the whole document into one prompt, so a long
+academic CV becomes one large, slow call whose output grows with the input.
+Above ``CHUNK_THRESHOLD_TOKENS`` the resume is split into section-aligned
+chunks (see ``resume_sections.chunk_resume``). Each chunk is analyzed
+concurrently (map), then one short call merges the partial analyses into the
+final report (reduce). Every map call sees the outline of the whole resume,
+so it knows where its chunk sits, and the reduce call gets the notes of
+the rule-based checks (``heuristic_analysis.prompt_notes``), like the
+single-shot analysis.
+
+``analysis_prompt`` is the single-shot analyzer prompt used by the app and
+the LangGraph workflow.
+
+``python chunked_analysis.py cv.pdf`` times single-shot against map-reduce
+analysis of one resume.
+"""
+
+import argparse
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables.config import get_executor_for_config
+
+from async_agents import gather_bounded
+from heuristic_analysis import pre_analyze, prompt_notes
+from interview_context import count_tokens
+from resume_sections import chunk_resume, split_sections
+
+CHUNK_THRESHOLD_TOKENS = int(os.environ.get("ANALYSIS_CHUNK_THRESHOLD", "3000"))
+CHUNK_TOKENS = int(os.environ.get("ANALYSIS_CHUNK_TOKENS", "1500"))
+MAX_CONCURRENCY = int(os.environ.get("ANALYSIS_MAX_CONCURRENCY", "4"))
+
+ANALYZER_SYSTEM_PROMPT = """You are a professional resume analyzer. Your task is to:
+1. Analyze the resume in detail
+2. Identify gaps, weaknesses, and areas for improvement
+3. Note any missing information that would strengthen the resume
+4. Evaluate the resume's structure, format, and content
+5. Suggest specific improvements
+
+Be thorough about the content, but do not repeat the issues the automated checks below already found; mention them only where they support a larger point. Format your response with clear sections and bullet points."""
+
+
+def analysis_prompt(resume_content: str) -> ChatPromptTemplate:
+    """Single-shot analysis of the whole resume"""
+    return ChatPromptTemplate.from_messages([
+        SystemMessage(content=ANALYZER_SYSTEM_PROMPT),
+        HumanMessage(content=f"Here is the resume to analyze:\n\n{resume_content}\n\n{prompt_notes(pre_analyze(resume_content))}")
+    ])
+
+
+def needs_chunking(resume_content: str, threshold: int = CHUNK_THRESHOLD_TOKENS) -> bool:
+    return count_tokens(resume_content) > threshold
+
+
+def outline(resume_content: str) -> str:
+    return "\n".join(f"- {section.title}" for section in split_sections(resume_content))
+
+
+def map_prompt(resume_outline: str, chunk: str, index: int, total: int) -> ChatPromptTemplate:
+    return ChatPromptTemplate.from_messages([
+        SystemMessage(content="""You are a professional resume analyzer reviewing one part of a longer resume. Your task is to:
+1. Analyze this part in detail
+2. Identify gaps, weaknesses, and areas for improvement in it
+3. Note any missing information that would strengthen it
+4. Suggest specific improvements
+
+Only comment on the part you are given; the other parts are reviewed separately. Weak verbs, bullets without numbers and overlong bullets are reported by automated checks, so do not list them one by one. Use concise bullet points."""),
+        HumanMessage(content=f"""Sections of the full resume:
+{resume_outline}
+
+Part {index} of {total}:
+
+{chunk}""")
+    ])
+
+
+def reduce_prompt(resume_content: str, partial_analyses: List[str]) -> ChatPromptTemplate:
+    """Prompt that merges the per-chunk analyses into one report"""
+    parts = "\n\n".join(f"### Part {i}\n{analysis}" for i, analysis in enumerate(partial_analyses, 1))
+    return ChatPromptTemplate.from_messages([
+        SystemMessage(content="""You are a professional resume analyzer. You are given analyses of the individual parts of one resume. Your task is to:
+1. Merge them into a single analysis of the whole resume
+2. Combine overlapping points and drop duplicates
+3. Evaluate the resume's overall structure, format, and content
+4. Put the most important gaps and improvements first
+
+Do not repeat the issues the automated checks below already found; mention them only where they support a larger point. Format your response with clear sections and bullet points."""),
+        HumanMessage(content=f"""Sections of the resume:
+{outline(resume_content)}
+
+Analyses of its parts:
+
+{parts}
+
+{prompt_notes(pre_analyze(resume_content))}""")
+    ])
+
+
+def map_sections(llm, resume_content: str, config: Optional[Dict[str, Any]] = None,
+                 chunk_tokens: int = CHUNK_TOKENS, max_concurrency: int = MAX_CONCURRENCY) -> Dict[str, Any]:
+    """Analyze the chunks of a resume concurrently
+
+    Returns the partial analyses with the wall time of the map step and the
+    summed latency of its calls.
+    """
+    chunks = chunk_resume(resume_content, chunk_tokens)
+    prompts = _map_prompts(resume_content, chunks)
+    chain = llm | StrOutputParser()
+    config = {**(config or {}), "max_concurrency": max_concurrency}
+
+    def analyze_chunk(prompt: ChatPromptTemplate):
+        started = time.perf_counter()
+        return chain.invoke(prompt.format_messages(), config=config), time.perf_counter() - started
+
+    started = time.perf_counter()
+    # Same executor as Runnable.batch: bounded by max_concurrency, carries the tracing context
+    with get_executor_for_config(config) as executor:
+        results = list(executor.map(analyze_chunk, prompts))
+    return _mapped(results, started)
+
+
+async def amap_sections(llm, resume_content: str, config: Optional[Dict[str, Any]] = None,
+                        chunk_tokens: int = CHUNK_TOKENS, max_concurrency: int = MAX_CONCURRENCY) -> Dict[str, Any]:
+    """Async counterpart of ``map_sections``"""
+    prompts = _map_prompts(resume_content, chunk_resume(resume_content, chunk_tokens))
+    chain = llm | StrOutputParser()
+
+    async def analyze_chunk(prompt: ChatPromptTemplate):
+        started = time.perf_counter()
+        return await chain.ainvoke(prompt.format_messages(), config=config), time.perf_counter() - started
+
+    started = time.perf_counter()
+    results = await gather_bounded((analyze_chunk(prompt) for prompt in prompts), max_concurrency)
+    return _mapped(results, started)
+
+
+def _map_prompts(resume_content: str, chunks: List[str]) -> List[ChatPromptTemplate]:
+    resume_outline = outline(resume_content)
+    return [map_prompt(resume_outline, chunk, i, len(chunks)) for i, chunk in enumerate(chunks, 1)]
+
+
+def _mapped(results: List[tuple], started: float) -> Dict[str, Any]:
+    return {
+        "partial_analyses": [text for text, _ in results],
+        "chunks": len(results),
+        "wall_seconds": time.perf_counter() - started,
+        "summed_call_seconds": sum(seconds for _, seconds in results),
+    }
+
+
+def analyze_chunked(llm, resume_content: str, config: Optional[Dict[str, Any]] = None) -> str:
+    """Map-reduce analysis without streaming"""
+    mapped = map_sections(llm, resume_content, config)
+    chain = reduce_prompt(resume_content, mapped["partial_analyses"]) | llm | StrOutputParser()
+    return chain.invoke({}, config=config)
+
+
+async def aanalyze_chunked(llm, resume_content: str, config: Optional[Dict[str, Any]] = None) -> str:
+    """Async counterpart of ``analyze_chunked``"""
+    mapped = await amap_sections(llm, resume_content, config)
+    chain = reduce_prompt(resume_content, mapped["partial_analyses"]) | llm | StrOutputParser()
+    return await chain.ainvoke({}, config=config)
+
+
+def analyze_single_shot(llm, resume_content: str, config: Optional[Dict[str, Any]] = None) -> str:
+    return (analysis_prompt(resume_content) | llm | StrOutputParser()).invoke({}, config=config)
+
+
+def compare(llm, resume_content: str) -> Dict[str, float]:
+    """Time single-shot and map-reduce analysis of the same resume, bypassing the response cache"""
+    llm = llm.model_copy(update={"cache": False})
+    started = time.perf_counter()
+    analyze_single_shot(llm, resume_content)
+    single_shot = time.perf_counter() - started
+    started = time.perf_counter()
+    analyze_chunked(llm, resume_content)
+    chunked = time.perf_counter() - started
+    return {
+        "tokens": count_tokens(resume_content),
+        "chunks": len(chunk_resume(resume_content, CHUNK_TOKENS)),
+        "single_shot_seconds": single_shot,
+        "map_reduce_seconds": chunked,
+        "saved_seconds": single_shot - chunked,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare single-shot and map-reduce analysis of a resume")
+    parser.add_argument("resume", help="PDF or TXT resume")
+    parser.add_argument("--fake-llm", action="store_true", help="Use the local deterministic fake model")
+    args = parser.parse_args(argv)
+
+    from llm_pool import get_chat_model
+    from resume_ingestion import extract_resume_text
+
+    if args.fake_llm:
+        from fake_llm import use_fake_llm
+        use_fake_llm()
+
+    path = Path(args.resume)
+    result = compare(get_chat_model("gpt-4o", temperature=0), extract_resume_text(path.read_bytes(), path.suffix))
+    print(f"{result['tokens']} tokens in {result['chunks']} chunks: single-shot {result['single_shot_seconds']:.1f}s, "
+          f"map-reduce {result['map_reduce_seconds']:.1f}s ({result['saved_seconds']:+.1f}s saved)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
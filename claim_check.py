@@ -0,0 +1,301 @@
+"""
+Local claim-diff prefilter for the fact checker.
+
+Sending both full resumes to the model to verify every line is slow and
+expensive, and most lines only restate the original. This module extracts the
+checkable claims of the enhanced resume: numbers, percentages, amounts,
+years, and capitalized names (employers, titles, tools). It then diffs them
+against the original resume and the candidate's interview answers.
+Only lines with a claim found in neither go to the model, together with the
+source lines most likely to support them. The model returns a structured
+accept/fix/remove verdict per line, and the verdicts are applied locally.
+"""
+
+import re
+from typing import Any, Dict, Iterable, List, Literal, NamedTuple, Optional, Set
+
+from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.prompts import ChatPromptTemplate
+from pydantic import BaseModel, Field
+
+from interview_context import count_message_tokens, count_tokens, keywords
+from resume_sections import SECTION_NAMES, section_heading
+
+EVIDENCE_LINES = 3
+
+MULTIPLIERS = {
+    "k": 1e3, "thousand": 1e3, "m": 1e6, "mm": 1e6, "million": 1e6, "b": 1e9, "bn": 1e9, "billion": 1e9,
+}
+NUMBER_PATTERN = re.compile(
+    r"(?<![\w.])[$€£]?(\d{1,3}(?:,\d{3})+|\d+(?:\.\d+)?)"
+    r"\s*(%|percent\b|thousand\b|million\b|billion\b|mm\b|bn\b|[kmb]\b|x\b)?",
+    re.IGNORECASE,
+)
+WORD_PATTERN = re.compile(r"(?<![\w.$€£])[A-Za-z][\w+#&.'/-]*")
+LIST_MARKER = re.compile(r"^\s*(?:[-*•]|\d+[.)]|#{1,6})\s+")
+SENTENCE_BREAK = re.compile(r"(?<=[.!?;:])\s+|\s+[-–—|]\s+")
+
+# Capitalized words that are not claims about the candidate
+COMMON_WORDS = {
+    "a", "an", "and", "as", "at", "by", "for", "from", "i", "in", "of", "on", "or", "the", "to", "with",
+    "jan", "january", "feb", "february", "mar", "march", "apr", "april", "may", "jun", "june", "jul", "july",
+    "aug", "august", "sep", "sept", "september", "oct", "october", "nov", "november", "dec", "december",
+    "present", "current", "summer", "spring", "fall", "winter",
+}
+
+
+class Claim(NamedTuple):
+    kind: str  # "number", "year" or "name"
+    text: str
+    value: str
+
+
+class FlaggedLine(NamedTuple):
+    line_id: int
+    text: str
+    claims: List[Claim]
+    evidence: List[str]
+
+
+class ClaimVerdict(BaseModel):
+    """Verdict on one resume line with unsupported claims"""
+    line_id: int = Field(description="The id of the line being judged")
+    verdict: Literal["accept", "fix", "remove"] = Field(
+        description="accept if the evidence supports the line or it is a reasonable inference, "
+                    "fix if it overstates or misstates the evidence, remove if it is fabricated"
+    )
+    corrected_line: str = Field(default="", description="For fix: the full corrected line, in the same format")
+    reason: str = Field(default="", description="One short sentence explaining the verdict")
+
+
+class ClaimVerification(BaseModel):
+    """Verdicts for every line sent for verification"""
+    verdicts: List[ClaimVerdict] = Field(default_factory=list)
+
+
+def _plain(line: str) -> str:
+    return LIST_MARKER.sub("", line).replace("**", "").replace("__", "").strip()
+
+
+def _number_value(number: str, unit: Optional[str]) -> str:
+    value = float(number.replace(",", ""))
+    unit = (unit or "").lower()
+    if unit in ("%", "percent"):
+        return f"{value:g}%"
+    return f"{value * MULTIPLIERS.get(unit, 1):g}"
+
+
+def extract_claims(line: str) -> List[Claim]:
+    """Extract the numbers, years and capitalized names stated in one line"""
+    text = _plain(line)
+    claims = []
+    for match in NUMBER_PATTERN.finditer(text):
+        number, unit = match.group(1), match.group(2)
+        if not unit and len(number) == 4 and 1950 <= int(number) <= 2099:
+            claims.append(Claim("year", match.group(0).strip(), number))
+        else:
+            claims.append(Claim("number", match.group(0).strip(), _number_value(number, unit)))
+
+    # Runs of capitalized words, e.g. "Senior Data Engineer" or "Example Corp". A lone
+    # capitalized word opening a sentence of prose is usually just a verb ("Led a team")
+    for sentence in SENTENCE_BREAK.split(text):
+        phrase: List[str] = []
+        starts_sentence, previous_end = False, 0
+
+        def flush(before_prose: bool = False):
+            if phrase and not (starts_sentence and len(phrase) == 1 and before_prose):
+                claims.append(Claim("name", " ".join(phrase), " ".join(phrase).lower()))
+            phrase.clear()
+
+        for position, match in enumerate(WORD_PATTERN.finditer(sentence)):
+            word = match.group(0).rstrip(".'")
+            if sentence[previous_end:match.start()].strip():
+                # Punctuation ends a phrase: "Kafka, Spark" are two names
+                flush()
+            previous_end = match.end()
+            if (word[0].isupper() or any(char in word for char in "+#")) and word.lower() not in COMMON_WORDS:
+                if not phrase:
+                    starts_sentence = position == 0
+                phrase.append(word)
+            else:
+                flush(before_prose=True)
+        flush()
+    return claims
+
+
+class SourceIndex:
+    """The claims and vocabulary of the texts the enhanced resume may draw on"""
+
+    def __init__(self, sources: Iterable[str]):
+        self.lines: List[str] = []
+        self.values: Set[str] = set()
+        self.words: Set[str] = set()
+        for source in sources:
+            for line in source.splitlines():
+                # Long interview answers are split into sentences to keep evidence snippets short
+                for sentence in SENTENCE_BREAK.split(line) if len(line) > 300 else [line]:
+                    if not sentence.strip():
+                        continue
+                    self.lines.append(sentence.strip())
+                    self.values.update(claim.value for claim in extract_claims(sentence) if claim.kind != "name")
+                    self.words.update(word.lower().rstrip(".'") for word in WORD_PATTERN.findall(sentence))
+
+    def supports(self, claim: Claim) -> bool:
+        if claim.kind != "name":
+            return claim.value in self.values
+        # Word by word, so "Example Corp" is backed by "worked at Example Corp." or "Corp, Example"
+        return all(word in self.words or word.rstrip("s") in self.words for word in claim.value.split())
+
+    def evidence(self, line: str, limit: int = EVIDENCE_LINES) -> List[str]:
+        """Return the source lines sharing the most keywords with ``line``"""
+        line_keywords = keywords(line)
+        scored = [(len(line_keywords & keywords(source)), source) for source in self.lines]
+        return [source for score, source in sorted(scored, key=lambda item: -item[0])[:limit] if score]
+
+
+def candidate_answers(chat_history: List[Dict[str, str]]) -> str:
+    return "\n".join(msg["content"] for msg in chat_history if msg["role"] == "user")
+
+
+def flag_lines(original_resume: str, enhanced_resume: str, chat_history: List[Dict[str, str]]) -> Dict[str, Any]:
+    """Find the lines of the enhanced resume whose claims appear in neither the original nor the interview"""
+    index = SourceIndex([original_resume, candidate_answers(chat_history)])
+    flagged, checked = [], 0
+    for line_id, line in enumerate(enhanced_resume.splitlines()):
+        # Role headings ("## Senior Engineer, Acme (2019 - 2024)") are checked, section titles are not
+        if not line.strip() or section_heading(line).lower() in SECTION_NAMES:
+            continue
+        claims = extract_claims(line)
+        checked += len(claims)
+        unsupported = [claim for claim in claims if not index.supports(claim)]
+        if unsupported:
+            flagged.append(FlaggedLine(line_id, line, unsupported, index.evidence(line)))
+    return {"flagged": flagged, "claims_checked": checked}
+
+
+def verification_prompt(flagged: List[FlaggedLine]) -> ChatPromptTemplate:
+    lines = "\n\n".join(
+        f"""Line {item.line_id}: {item.text}
+New claims: {", ".join(claim.text for claim in item.claims)}
+Evidence from the original resume and the interview:
+{chr(10).join(f"- {source}" for source in item.evidence) or "- (nothing related found)"}"""
+        for item in flagged
+    )
+    return ChatPromptTemplate.from_messages([
+        SystemMessage(content="""You are a resume fact checker and accuracy verifier. An automatic comparison found lines in the enhanced resume with claims (numbers, dates, employers, titles, tools) that appear neither in the original resume nor in the candidate's interview answers. For each line:
+1. accept it if the evidence supports it or it is a reasonable inference or rephrasing
+2. fix it if it overstates or misstates the evidence, returning the full corrected line in the same format
+3. remove it if it is fabricated and cannot be fixed
+
+Return one verdict for every line."""),
+        HumanMessage(content=lines)
+    ])
+
+
+def apply_verdicts(enhanced_resume: str, flagged: List[FlaggedLine], verdicts: List[ClaimVerdict]) -> Dict[str, Any]:
+    """Apply the model's verdicts to the enhanced resume
+
+    Lines without a verdict are kept as they are and returned as ``unverified``.
+    """
+    by_line = {verdict.line_id: verdict for verdict in verdicts}
+    lines = enhanced_resume.splitlines()
+    applied, unverified = [], []
+    for item in flagged:
+        verdict = by_line.get(item.line_id)
+        if verdict is None:
+            unverified.append(item)
+            continue
+        if verdict.verdict == "fix" and not verdict.corrected_line.strip():
+            # A fix without the corrected line changes nothing
+            verdict = ClaimVerdict(line_id=item.line_id, verdict="accept",
+                                   reason=verdict.reason or "no corrected line returned")
+        elif verdict.verdict == "fix":
+            lines[item.line_id] = verdict.corrected_line
+        elif verdict.verdict == "remove":
+            lines[item.line_id] = None
+        applied.append((item, verdict))
+    return {
+        "final_resume": "\n".join(line for line in lines if line is not None),
+        "applied": applied,
+        "unverified": unverified,
+    }
+
+
+def report(claims_checked: int, flagged: List[FlaggedLine], applied, unverified: List[FlaggedLine] = ()) -> str:
+    """Render the verification result shown to the user
+
+    ``unverified`` are the flagged lines the model returned no verdicts for.
+    """
+    supported = claims_checked - sum(len(item.claims) for item in flagged)
+    summary = f"Checked {claims_checked} claims; {supported} are backed by the original resume or the interview."
+    if not flagged:
+        return summary + " No changes were needed."
+    labels = {"accept": "✅ Kept", "fix": "✏️ Corrected", "remove": "❌ Removed"}
+    lines = [summary]
+    if applied:
+        lines += ["", f"{len(applied)} lines with new claims were verified:"]
+    for item, verdict in applied:
+        line = f"- {labels[verdict.verdict]}: {_plain(item.text)}"
+        if verdict.verdict == "fix":
+            line += f" → {_plain(verdict.corrected_line)}"
+        if verdict.reason:
+            line += f" ({verdict.reason})"
+        lines.append(line)
+    if unverified:
+        lines += ["", f"⚠️ Verification failed: no verdicts came back for {len(unverified)} lines with new claims, "
+                      "so they were kept unchecked:"]
+        lines.extend(f"- {_plain(item.text)}" for item in unverified)
+    return "\n".join(lines)
+
+
+def verify_claims(llm, original_resume: str, enhanced_resume: str, chat_history: List[Dict[str, str]],
+                  config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Verify the enhanced resume, sending only its unsupported claims to ``llm``
+
+    Returns the corrected ``final_resume``, a markdown ``verification_result``,
+    the prompt size against what sending both full resumes would cost, and the
+    raw ``claims_checked``/``flagged``/``applied`` data the report is built from.
+    """
+    found = flag_lines(original_resume, enhanced_resume, chat_history)
+    verification = None
+    if found["flagged"]:
+        chain = verification_prompt(found["flagged"]) | llm.with_structured_output(ClaimVerification)
+        verification = chain.invoke({}, config=config)
+    return _verification_result(original_resume, enhanced_resume, found, verification)
+
+
+async def averify_claims(llm, original_resume: str, enhanced_resume: str, chat_history: List[Dict[str, str]],
+                         config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Async counterpart of ``verify_claims``"""
+    found = flag_lines(original_resume, enhanced_resume, chat_history)
+    verification = None
+    if found["flagged"]:
+        chain = verification_prompt(found["flagged"]) | llm.with_structured_output(ClaimVerification)
+        verification = await chain.ainvoke({}, config=config)
+    return _verification_result(original_resume, enhanced_resume, found, verification)
+
+
+def _verification_result(original_resume: str, enhanced_resume: str, found: Dict[str, Any],
+                         verification: Optional[ClaimVerification]) -> Dict[str, Any]:
+    flagged = found["flagged"]
+    result = {
+        "final_resume": enhanced_resume,
+        "prompt_tokens": 0,
+        "full_prompt_tokens": count_tokens(original_resume) + count_tokens(enhanced_resume),
+        "claims_checked": found["claims_checked"],
+        "flagged": flagged,
+        "applied": [],
+        "unverified": [],
+    }
+    if flagged:
+        result["prompt_tokens"] = count_message_tokens(verification_prompt(flagged).format_messages())
+    if verification is not None and verification.verdicts:
+        applied_verdicts = apply_verdicts(enhanced_resume, flagged, verification.verdicts)
+        result["final_resume"] = applied_verdicts["final_resume"]
+        result["applied"] = applied_verdicts["applied"]
+        result["unverified"] = applied_verdicts["unverified"]
+    elif flagged:
+        # Structured output came back empty or as None: nothing was verified
+        result["unverified"] = flagged
+    result["verification_result"] = report(found["claims_checked"], flagged, result["applied"], result["unverified"])
+    return result
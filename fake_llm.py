@@ -0,0 +1,235 @@
+"""
+Deterministic local chat model for running the pipeline offline.
+
+The fake model recognises which agent is calling it from the system prompt
+and answers with a short, plausible response derived from a hash of the
+conversation, so the same input always produces the same output. Install it
+for the whole process with ``use_fake_llm()``.
+
+Latency can be simulated with a simple model of a hosted LLM: a fixed delay
+before the first token (``FAKE_LLM_TTFT_MS``) followed by a steady output rate
+(``FAKE_LLM_TOKENS_PER_SEC``). Both default to 0, i.e. instant responses.
+``FAKE_LLM_MODEL_TTFT_MS`` sets the first-token delay per model as a JSON
+object (``{"gpt-4o": 3000}``), and a call whose first token would take longer
+than the model's ``timeout`` raises ``TimeoutError`` after waiting that long,
+so model routing and failover can be exercised offline.
+Structured output (``with_structured_output``) is answered with placeholder
+values for every field of the requested schema. The async methods wait with
+``asyncio.sleep``, so concurrent async calls overlap without holding threads.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import Runnable
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from llm_cache import get_llm_cache
+from llm_pool import set_model_factory
+
+FIRST_TOKEN_LATENCY = float(os.environ.get("FAKE_LLM_TTFT_MS", "0")) / 1000
+TOKENS_PER_SECOND = float(os.environ.get("FAKE_LLM_TOKENS_PER_SEC", "0"))
+MODEL_FIRST_TOKEN_LATENCY = {
+    model: float(ms) / 1000 for model, ms in json.loads(os.environ.get("FAKE_LLM_MODEL_TTFT_MS", "{}")).items()
+}
+
+CANNED_RESPONSES = {
+    "resume analyzer": """## Strengths
+- Clear chronological structure
+
+## Weaknesses
+- Bullet points describe duties rather than outcomes
+- Few quantified achievements
+
+## Suggested Improvements
+- Add metrics to the most recent role
+- Expand the skills section (ref {digest})""",
+    "interview question generator": """1. What was the measurable impact of your most recent project?
+2. Which tools did you use day to day that are not on your resume?
+3. Can you describe a problem you solved that you are proud of?
+4. How large was the team you worked with? (ref {digest})""",
+    "extracting valuable insights": """#### Achievements
+- Delivered the most recent project ahead of schedule (ref {digest})
+
+#### Skills
+- Python, SQL""",
+    "professional resume writer": """# Enhanced Resume
+
+## Experience
+- Delivered the most recent project ahead of schedule
+- Built reporting pipelines in Python and SQL (ref {digest})""",
+    "fact checker": "The enhanced resume is consistent with the original resume (ref {digest}).",
+    "opening message": "Hi, I'm Alex! I read your resume and would love to hear more about your most recent role. Shall we start? (ref {digest})",
+    "interviewer": "Thanks for sharing that. Could you tell me more about the results you achieved? (ref {digest})",
+}
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model that returns deterministic canned responses per agent"""
+
+    model_name: str = "fake-chat"
+    temperature: float = 0
+    first_token_latency: float = FIRST_TOKEN_LATENCY
+    tokens_per_second: float = TOKENS_PER_SECOND
+    timeout: Optional[float] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return {"model_name": self.model_name, "temperature": self.temperature}
+
+    def _respond(self, messages: List[BaseMessage]) -> str:
+        digest = self._digest(messages)
+        system_prompt = str(messages[0].content).lower() if messages else ""
+        for marker, response in CANNED_RESPONSES.items():
+            if marker in system_prompt:
+                return response.format(digest=digest)
+        return f"Acknowledged (ref {digest})."
+
+    @staticmethod
+    def _digest(messages: List[BaseMessage]) -> str:
+        transcript = "\n".join(str(message.content) for message in messages)
+        return hashlib.sha256(transcript.encode("utf-8")).hexdigest()[:8]
+
+    @staticmethod
+    def _usage(messages: List[BaseMessage], output_tokens: int) -> Dict[str, int]:
+        # About four characters per token, as for English text with GPT tokenizers
+        input_tokens = sum(len(str(message.content)) for message in messages) // 4 + 1
+        return {"input_tokens": input_tokens, "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens}
+
+    def _delay(self, tokens: int, first: bool) -> float:
+        delay = self.first_token_latency if first else 0.0
+        if self.tokens_per_second > 0:
+            delay += tokens / self.tokens_per_second
+        return delay
+
+    def _timed_out(self, delay: float) -> bool:
+        return self.timeout is not None and delay > self.timeout
+
+    def _wait(self, tokens: int, first: bool) -> None:
+        delay = self._delay(tokens, first)
+        if self._timed_out(delay):
+            time.sleep(self.timeout)
+            raise TimeoutError(f"{self.model_name} did not respond within {self.timeout:g}s")
+        if delay > 0:
+            time.sleep(delay)
+
+    async def _await(self, tokens: int, first: bool) -> None:
+        delay = self._delay(tokens, first)
+        if self._timed_out(delay):
+            await asyncio.sleep(self.timeout)
+            raise TimeoutError(f"{self.model_name} did not respond within {self.timeout:g}s")
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def _placeholder(self, name: str, schema: Dict[str, Any], digest: str) -> Any:
+        """Build a value of the shape ``schema`` describes"""
+        if "enum" in schema:
+            return schema["enum"][0]
+        if "anyOf" in schema:
+            return self._placeholder(name, schema["anyOf"][0], digest)
+        kind = schema.get("type")
+        if kind == "array":
+            return [self._placeholder(name, schema.get("items", {}), digest)]
+        if kind == "object":
+            return {key: self._placeholder(key, value, digest) for key, value in schema.get("properties", {}).items()}
+        if kind in ("integer", "number"):
+            return 0
+        if kind == "boolean":
+            return False
+        return f"{name.replace('_', ' ').capitalize()} from the interview (ref {digest})"
+
+    def _tool_call(self, tool: Dict[str, Any], digest: str) -> Dict[str, Any]:
+        """Fill every field of a tool's JSON schema with a placeholder value"""
+        function = tool["function"]
+        args = self._placeholder(function["name"], function.get("parameters", {}), digest)
+        return {"name": function["name"], "args": args, "id": f"call_{digest}", "type": "tool_call"}
+
+    def bind_tools(self, tools: Sequence[Any], *, tool_choice: Optional[Any] = None, **kwargs: Any):
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    def with_structured_output(self, schema: Any, **kwargs: Any) -> Runnable:
+        # BaseChatModel's return annotation cannot be resolved at runtime, which
+        # with_fallbacks needs to apply this to the fallback models as well
+        return super().with_structured_output(schema, **kwargs)
+
+    def _message(self, messages: List[BaseMessage], tools: Optional[List[Dict[str, Any]]]) -> Tuple[AIMessage, int]:
+        if tools:
+            tool_call = self._tool_call(tools[0], self._digest(messages))
+            output_tokens = len(str(tool_call["args"])) // 4 + 1
+            return AIMessage(content="", tool_calls=[tool_call], usage_metadata=self._usage(messages, output_tokens),
+                             response_metadata={"model_name": self.model_name}), output_tokens
+        content = self._respond(messages)
+        output_tokens = len(content.split(" "))
+        return AIMessage(content=content, usage_metadata=self._usage(messages, output_tokens),
+                         response_metadata={"model_name": self.model_name}), output_tokens
+
+    def _chunk(self, messages: List[BaseMessage], tokens: List[str], i: int) -> ChatGenerationChunk:
+        # Usage is reported on the last chunk, as OpenAI does with stream_usage
+        last = i == len(tokens) - 1
+        usage = self._usage(messages, len(tokens)) if last else None
+        metadata = {"model_name": self.model_name} if last else {}
+        return ChatGenerationChunk(message=AIMessageChunk(content=tokens[i] + " ", usage_metadata=usage,
+                                                          response_metadata=metadata))
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        message, output_tokens = self._message(messages, kwargs.get("tools"))
+        self._wait(output_tokens, first=True)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        message, output_tokens = self._message(messages, kwargs.get("tools"))
+        await self._await(output_tokens, first=True)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        tokens = self._respond(messages).split(" ")
+        for i in range(len(tokens)):
+            self._wait(1, first=i == 0)
+            chunk = self._chunk(messages, tokens, i)
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+                       **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        tokens = self._respond(messages).split(" ")
+        for i in range(len(tokens)):
+            await self._await(1, first=i == 0)
+            chunk = self._chunk(messages, tokens, i)
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+
+def fake_model_factory(model: str, temperature: float, api_key: Optional[str] = None,
+                       timeout: Optional[float] = None) -> FakeChatModel:
+    """Build a fake model in place of ``ChatOpenAI`` for the client pool
+
+    It uses the same LLM cache as pooled ``ChatOpenAI`` models (and gets the
+    same callbacks from the pool), so benchmarks include caching and
+    single-flight coalescing.
+    """
+    return FakeChatModel(model_name=model, temperature=temperature, timeout=timeout, cache=get_llm_cache(),
+                         first_token_latency=MODEL_FIRST_TOKEN_LATENCY.get(model, FIRST_TOKEN_LATENCY))
+
+
+def use_fake_llm() -> None:
+    """Route every pooled chat model in this process to ``FakeChatModel``"""
+    set_model_factory(fake_model_factory)
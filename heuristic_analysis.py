@@ -0,0 +1,190 @@
+"""
+Rule-based pre-analysis of a resume, in milliseconds.
+
+Much of what the analyzer reports can be found mechanically. ``pre_analyze``
+checks every bullet in one pass with precompiled patterns:
+
+- bullets that open with a weak verb ("responsible for", "helped", ...)
+- bullets without a number, percentage or amount
+- bullets longer than ``LONG_BULLET_WORDS`` words
+- standard sections the resume does not have
+- gaps of more than ``GAP_MONTHS`` months between the date ranges of roles
+
+The findings are shown as soon as a resume is uploaded, before any model
+call. ``prompt_notes`` summarizes them for the analyzer and the question
+generator, so those prompts can skip the mechanical checks and write
+shorter answers.
+"""
+
+import datetime
+import os
+import re
+import time
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Tuple
+
+from resume_sections import BULLET, ENTRY_SECTIONS, split_sections
+
+LONG_BULLET_WORDS = int(os.environ.get("PRE_ANALYSIS_LONG_BULLET_WORDS", "30"))
+GAP_MONTHS = int(os.environ.get("PRE_ANALYSIS_GAP_MONTHS", "6"))
+MAX_EXAMPLES = 3
+
+WEAK_OPENINGS = re.compile(
+    r"^(?:responsible for|in charge of|worked on|working on|helped|helping|assisted|assisting|"
+    r"participated in|involved in|duties included|tasked with|handled|utilized|tried to|"
+    r"was part of|member of)\b",
+    re.IGNORECASE,
+)
+QUANTITY = re.compile(r"\d|%|\$|€|£")
+EXPECTED_SECTIONS = {
+    "Summary": ("summary", "profile", "objective", "about"),
+    "Experience": ("experience", "employment", "work history"),
+    "Education": ("education",),
+    "Skills": ("skills", "competencies"),
+}
+
+MONTHS = {name: index for index, name in enumerate(
+    ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"], 1
+)}
+_MONTH = r"(?:(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?\s+|(\d{1,2})/)?"
+DATE_RANGE = re.compile(
+    _MONTH + r"((?:19|20)\d{2})\s*(?:-|–|—|to)\s*(?:" + _MONTH + r"((?:19|20)\d{2})|(present|current|now))",
+    re.IGNORECASE,
+)
+
+
+class Finding(NamedTuple):
+    check: str
+    section: str
+    text: str
+
+
+class PreAnalysis(NamedTuple):
+    findings: Tuple[Finding, ...]
+    bullets: int
+    seconds: float
+
+    def by_check(self) -> Dict[str, List[Finding]]:
+        grouped: Dict[str, List[Finding]] = {}
+        for finding in self.findings:
+            grouped.setdefault(finding.check, []).append(finding)
+        return grouped
+
+
+CHECK_TITLES = {
+    "weak_verb": "Bullets that open with a weak verb",
+    "no_numbers": "Bullets without numbers",
+    "long_bullet": f"Bullets longer than {LONG_BULLET_WORDS} words",
+    "missing_section": "Missing sections",
+    "date_gap": f"Gaps of more than {GAP_MONTHS} months between roles",
+}
+
+
+def _month(month_name: str, month_number: str, year: str, default: int) -> int:
+    if month_name:
+        month = MONTHS[month_name.lower()]
+    elif month_number and 1 <= int(month_number) <= 12:
+        month = int(month_number)
+    else:
+        month = default
+    return int(year) * 12 + month - 1
+
+
+def _format_month(months: int) -> str:
+    return datetime.date(months // 12, months % 12 + 1, 1).strftime("%b %Y")
+
+
+def date_gaps(text: str, today: datetime.date) -> List[Tuple[int, int]]:
+    """Gaps longer than ``GAP_MONTHS`` between the merged date ranges in ``text``, as (first, last) month indexes"""
+    now = today.year * 12 + today.month - 1
+    ranges = []
+    for match in DATE_RANGE.finditer(text):
+        start_name, start_number, start_year, end_name, end_number, end_year, ongoing = match.groups()
+        start = _month(start_name, start_number, start_year, 1)
+        end = now if ongoing else _month(end_name, end_number, end_year, 12)
+        if start <= end:
+            ranges.append((start, end))
+    gaps = []
+    ranges.sort()
+    covered_until = None
+    for start, end in ranges:
+        if covered_until is not None and start - covered_until - 1 > GAP_MONTHS:
+            gaps.append((covered_until + 1, start - 1))
+        covered_until = end if covered_until is None else max(covered_until, end)
+    return gaps
+
+
+@lru_cache(maxsize=256)
+def pre_analyze(resume_content: str) -> PreAnalysis:
+    """Run the rule-based checks over a resume; memoized by content"""
+    started = time.perf_counter()
+    sections = split_sections(resume_content)
+    findings = []
+    bullets = 0
+    for section in sections:
+        for line in section.text.splitlines():
+            match = BULLET.match(line)
+            if not match:
+                continue
+            bullets += 1
+            bullet = line[match.end():].strip()
+            if WEAK_OPENINGS.match(bullet):
+                findings.append(Finding("weak_verb", section.title, bullet))
+            if not QUANTITY.search(bullet):
+                findings.append(Finding("no_numbers", section.title, bullet))
+            if len(bullet.split()) > LONG_BULLET_WORDS:
+                findings.append(Finding("long_bullet", section.title, bullet))
+
+    titles = [section.title.lower() for section in sections]
+    for name, keywords in EXPECTED_SECTIONS.items():
+        if not any(keyword in title for title in titles for keyword in keywords):
+            findings.append(Finding("missing_section", name, name))
+
+    roles = "\n".join(
+        section.text for section in sections if any(name in section.title.lower() for name in ENTRY_SECTIONS)
+    )
+    for first, last in date_gaps(roles, datetime.date.today()):
+        findings.append(Finding(
+            "date_gap", "Experience", f"{_format_month(first)} to {_format_month(last)} ({last - first + 1} months)"
+        ))
+    return PreAnalysis(tuple(findings), bullets, time.perf_counter() - started)
+
+
+def _shorten(text: str, limit: int = 80) -> str:
+    return text if len(text) <= limit else text[:limit - 3].rstrip() + "..."
+
+
+def render_markdown(report: PreAnalysis) -> str:
+    """The findings as markdown, with a few examples per check"""
+    grouped = report.by_check()
+    if not grouped:
+        return "No mechanical issues found."
+    blocks = []
+    for check, title in CHECK_TITLES.items():
+        findings = grouped.get(check)
+        if not findings:
+            continue
+        if check in ("missing_section", "date_gap"):
+            blocks.append(f"**{title}:** " + "; ".join(finding.text for finding in findings))
+            continue
+        examples = [f"- {finding.section}: {_shorten(finding.text)}" for finding in findings[:MAX_EXAMPLES]]
+        blocks.append("\n".join([f"**{title}:** {len(findings)} of {report.bullets}"] + examples))
+    return "\n\n".join(blocks)
+
+
+def prompt_notes(report: PreAnalysis) -> str:
+    """A compact summary of the findings for model prompts"""
+    grouped = report.by_check()
+    if not grouped:
+        return "Automated checks found no weak verbs, unquantified or overlong bullets, missing sections or date gaps."
+    lines = ["Automated checks already found the following; they are reported to the candidate separately:"]
+    for check, title in CHECK_TITLES.items():
+        findings = grouped.get(check)
+        if not findings:
+            continue
+        if check in ("missing_section", "date_gap"):
+            lines.append(f"- {title}: " + "; ".join(finding.text for finding in findings))
+        else:
+            examples = "; ".join(f'"{_shorten(finding.text, 60)}"' for finding in findings[:MAX_EXAMPLES])
+            lines.append(f"- {title}: {len(findings)} of {report.bullets}, e.g. {examples}")
+    return "\n".join(lines)
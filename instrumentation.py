@@ -0,0 +1,372 @@
+"""
+Per-agent latency, token and cost instrumentation.
+
+``AgentMetrics`` is a LangChain callback handler attached to every pooled
+chat model. It records, per agent and per session, the wall time,
+time-to-first-token, prompt/completion tokens, retries, errors and estimated
+cost of each model call, the model that actually served it (as reported by
+the API), plus the wall time of each LangGraph node. Calls are
+labelled through run metadata: pass ``agent_config("analyzer", session_id)``
+as the ``config`` of a call (LangGraph adds ``langgraph_node`` and
+``thread_id`` on its own).
+
+The data is exposed three ways:
+
+- Prometheus text format, served by ``start_metrics_server`` on
+  ``METRICS_HOST:METRICS_PORT`` (loopback only unless ``METRICS_HOST`` is set)
+- a JSONL trace file with one line per call, if ``AGENT_TRACE_PATH`` is set
+- ``session_timeline`` for the per-session panel in the app sidebar
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict, deque
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from rate_limiter import set_retry_listener
+
+METRICS_PORT = os.environ.get("METRICS_PORT", "9464")
+METRICS_HOST = os.environ.get("METRICS_HOST", "127.0.0.1")
+# Tracing is opt-in: the file grows by one line per model call
+TRACE_PATH = os.environ.get("AGENT_TRACE_PATH", "")
+MAX_SESSIONS = 500
+MAX_EVENTS_PER_SESSION = 200
+# Weight of the newest call in the recent latency of an agent/model pair
+LATENCY_SMOOTHING = 0.3
+
+# USD per million (prompt, completion) tokens
+MODEL_PRICES = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1-nano": (0.10, 0.40),
+}
+
+
+def agent_config(agent: str, session_id: Optional[str] = None) -> Dict[str, Any]:
+    """Run config that labels a model call with its agent and session"""
+    metadata = {"agent": agent}
+    if session_id:
+        metadata["session_id"] = session_id
+    return {"metadata": metadata, "run_name": agent}
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    # Dated snapshots (gpt-4o-2024-08-06) are priced like their base model
+    for name in sorted(MODEL_PRICES, key=len, reverse=True):
+        if model.startswith(name):
+            prompt_price, completion_price = MODEL_PRICES[name]
+            return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+    return 0.0
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class AgentMetrics(BaseCallbackHandler):
+    """Callback handler aggregating per-agent metrics and per-session timelines"""
+
+    # Model call starts are handled in the caller's context, also on the async path, so the
+    # retry listener set there is seen by the rate-limited transport sending the request
+    run_inline = True
+
+    def __init__(self, trace_path: Optional[str] = TRACE_PATH):
+        self.trace_path = trace_path
+        self._lock = threading.Lock()
+        # The trace file stays open, with its own lock, so writes do not hold up the metrics
+        self._trace_file = None
+        self._trace_lock = threading.Lock()
+        self._active: Dict[UUID, Dict[str, Any]] = {}
+        self._nodes: Dict[UUID, Dict[str, Any]] = {}
+        self._agents: Dict[tuple, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        self._node_totals: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        self._sessions: "OrderedDict[str, deque]" = OrderedDict()
+        self._collectors: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+    # Model calls
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], *, run_id: UUID,
+                            tags: Optional[List[str]] = None, metadata: Optional[Dict[str, Any]] = None,
+                            **kwargs: Any) -> None:
+        metadata = metadata or {}
+        params = kwargs.get("invocation_params") or {}
+        with self._lock:
+            self._active[run_id] = {
+                "agent": metadata.get("agent") or metadata.get("langgraph_node") or "unknown",
+                "session_id": metadata.get("session_id") or metadata.get("thread_id"),
+                "model": params.get("model_name") or params.get("model") or params.get("_type", "unknown"),
+                "started_at": time.time(),
+                "start": time.perf_counter(),
+                "first_token": None,
+                "retries": 0,
+            }
+        # Retries happen in the rate-limited transport, not in LangChain
+        set_retry_listener(partial(self.on_retry, None, run_id=run_id))
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            record = self._active.get(run_id)
+            if record is not None and record["first_token"] is None:
+                record["first_token"] = time.perf_counter()
+
+    def on_retry(self, retry_state: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            record = self._active.get(run_id)
+            if record is not None:
+                record["retries"] += 1
+
+    def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        prompt_tokens, completion_tokens = self._token_usage(response)
+        self._finish(run_id, prompt_tokens, completion_tokens, error=None, served_model=self._served_model(response))
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id, 0, 0, error=f"{type(error).__name__}: {error}")
+
+    @staticmethod
+    def _token_usage(response: Any) -> tuple:
+        for generations in response.generations or []:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        return usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+
+    @staticmethod
+    def _served_model(response: Any) -> Optional[str]:
+        for generations in response.generations or []:
+            for generation in generations:
+                metadata = getattr(getattr(generation, "message", None), "response_metadata", None) or {}
+                if metadata.get("model_name"):
+                    return metadata["model_name"]
+        return (response.llm_output or {}).get("model_name")
+
+    def _finish(self, run_id: UUID, prompt_tokens: int, completion_tokens: int, error: Optional[str],
+                served_model: Optional[str] = None) -> None:
+        now = time.perf_counter()
+        with self._lock:
+            record = self._active.pop(run_id, None)
+            if record is None:
+                return
+            duration = now - record.pop("start")
+            first_token = record.pop("first_token")
+            record.update({
+                "kind": "llm",
+                "duration": duration,
+                # Without streaming the whole response arrives at once
+                "ttft": (first_token - (now - duration)) if first_token else duration,
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "cost": estimate_cost(record["model"], prompt_tokens, completion_tokens),
+                "served_model": served_model,
+                "error": error,
+            })
+            totals = self._agents[(record["agent"], record["model"])]
+            totals["calls"] += 1
+            totals["errors"] += 1 if error else 0
+            totals["retries"] += record["retries"]
+            totals["seconds"] += duration
+            totals["ttft_seconds"] += record["ttft"]
+            totals["prompt_tokens"] += prompt_tokens
+            totals["completion_tokens"] += completion_tokens
+            totals["cost"] += record["cost"]
+            totals["recent_seconds"] = duration if totals["calls"] == 1 else (
+                LATENCY_SMOOTHING * duration + (1 - LATENCY_SMOOTHING) * totals["recent_seconds"]
+            )
+            totals["last_call_at"] = record["started_at"]
+            self._add_to_session(record)
+        self._trace(record)
+
+    # LangGraph nodes
+
+    def on_chain_start(self, serialized: Dict[str, Any], inputs: Dict[str, Any], *, run_id: UUID,
+                       parent_run_id: Optional[UUID] = None, metadata: Optional[Dict[str, Any]] = None,
+                       **kwargs: Any) -> None:
+        metadata = metadata or {}
+        node = metadata.get("langgraph_node")
+        # Only the node's own run, not the chains nested inside it (including a
+        # same-named RunnableLambda wrapping the node function) or LangGraph's internal nodes
+        if node and kwargs.get("name") == node and not node.startswith("__"):
+            with self._lock:
+                if parent_run_id in self._nodes:
+                    return
+                self._nodes[run_id] = {
+                    "node": node,
+                    "session_id": metadata.get("thread_id"),
+                    "started_at": time.time(),
+                    "start": time.perf_counter(),
+                }
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish_node(run_id, error=None)
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish_node(run_id, error=f"{type(error).__name__}: {error}")
+
+    def _finish_node(self, run_id: UUID, error: Optional[str]) -> None:
+        with self._lock:
+            record = self._nodes.pop(run_id, None)
+            if record is None:
+                return
+            record.update({"kind": "node", "duration": time.perf_counter() - record.pop("start"), "error": error})
+            totals = self._node_totals[record["node"]]
+            totals["runs"] += 1
+            totals["seconds"] += record["duration"]
+            self._add_to_session(record)
+        self._trace(record)
+
+    # Storage and export
+
+    def _add_to_session(self, record: Dict[str, Any]) -> None:
+        session_id = record.get("session_id")
+        if not session_id:
+            return
+        events = self._sessions.get(session_id)
+        if events is None:
+            events = self._sessions[session_id] = deque(maxlen=MAX_EVENTS_PER_SESSION)
+            while len(self._sessions) > MAX_SESSIONS:
+                self._sessions.popitem(last=False)
+        self._sessions.move_to_end(session_id)
+        events.append(record)
+
+    def _trace(self, record: Dict[str, Any]) -> None:
+        if not self.trace_path:
+            return
+        line = json.dumps(record, default=str) + "\n"
+        with self._trace_lock:
+            if self._trace_file is None:
+                self._trace_file = open(self.trace_path, "a", encoding="utf-8", buffering=1)
+            self._trace_file.write(line)
+
+    def recent_latency(self, agent: str, model: str, max_age: Optional[float] = None) -> Optional[float]:
+        """Smoothed wall time of ``agent``'s recent calls to ``model``, failed ones included
+
+        Returns ``None`` if there are none, or none within the last ``max_age`` seconds.
+        """
+        with self._lock:
+            totals = self._agents.get((agent, model))
+            if not totals or not totals["calls"]:
+                return None
+            if max_age is not None and time.time() - totals["last_call_at"] > max_age:
+                return None
+            return totals["recent_seconds"]
+
+    def call_counts(self) -> Dict[tuple, int]:
+        """Return the number of finished model calls per ``(agent, model)``, failed ones included"""
+        with self._lock:
+            return {key: totals["calls"] for key, totals in self._agents.items() if totals["calls"]}
+
+    def session_timeline(self, session_id: str) -> List[Dict[str, Any]]:
+        """Return the recorded calls and node runs of a session, oldest first"""
+        with self._lock:
+            return list(self._sessions.get(session_id, ()))
+
+    def register_collector(self, name: str, collect: Callable[[], Dict[str, Any]]) -> None:
+        """Export the numeric values returned by ``collect()`` as ``resume_<name>_<key>`` gauges"""
+        with self._lock:
+            self._collectors[name] = collect
+
+    def render_prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            agents = {key: dict(values) for key, values in self._agents.items()}
+            nodes = {key: dict(values) for key, values in self._node_totals.items()}
+            collectors = dict(self._collectors)
+
+        series = [
+            ("resume_agent_calls_total", "counter", "Model calls per agent", "calls"),
+            ("resume_agent_errors_total", "counter", "Failed model calls per agent", "errors"),
+            ("resume_agent_retries_total", "counter", "Retried model calls per agent", "retries"),
+            ("resume_agent_latency_seconds_sum", "counter", "Total wall time of model calls", "seconds"),
+            ("resume_agent_ttft_seconds_sum", "counter", "Total time to first token", "ttft_seconds"),
+            ("resume_agent_prompt_tokens_total", "counter", "Prompt tokens per agent", "prompt_tokens"),
+            ("resume_agent_completion_tokens_total", "counter", "Completion tokens per agent", "completion_tokens"),
+            ("resume_agent_cost_usd_total", "counter", "Estimated spend per agent", "cost"),
+        ]
+        for name, kind, help_text, field in series:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for (agent, model), values in sorted(agents.items()):
+                lines.append(f'{name}{{agent="{_escape(agent)}",model="{_escape(model)}"}} {values.get(field, 0):g}')
+
+        name = "resume_agent_recent_latency_seconds"
+        lines.append(f"# HELP {name} Smoothed wall time of recent model calls, as used by the model router")
+        lines.append(f"# TYPE {name} gauge")
+        for (agent, model), values in sorted(agents.items()):
+            lines.append(f'{name}{{agent="{_escape(agent)}",model="{_escape(model)}"}} {values.get("recent_seconds", 0):g}')
+
+        for name, field, help_text in [
+            ("resume_node_runs_total", "runs", "LangGraph node runs"),
+            ("resume_node_latency_seconds_sum", "seconds", "Total wall time of LangGraph node runs"),
+        ]:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for node, values in sorted(nodes.items()):
+                lines.append(f'{name}{{node="{_escape(node)}"}} {values.get(field, 0):g}')
+
+        for prefix, collect in sorted(collectors.items()):
+            try:
+                values = collect()
+            except Exception:
+                continue
+            for key, value in sorted(values.items()):
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    name = f"resume_{prefix}_{key}"
+                    lines.append(f"# TYPE {name} gauge")
+                    lines.append(f"{name} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+_metrics: Optional[AgentMetrics] = None
+_server: Optional[ThreadingHTTPServer] = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics() -> AgentMetrics:
+    """Return the process-wide metrics handler"""
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = AgentMetrics()
+        return _metrics
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = get_metrics().render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: Optional[str] = METRICS_PORT, host: str = METRICS_HOST) -> Optional[ThreadingHTTPServer]:
+    """Serve ``/metrics`` on a background thread once per process; an empty port disables it"""
+    global _server
+    with _metrics_lock:
+        if _server is not None or not port:
+            return _server
+        try:
+            _server = ThreadingHTTPServer((host, int(port)), _MetricsRequestHandler)
+        except OSError:
+            # Another process (e.g. a second Streamlit worker) already serves the port
+            return None
+        threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+        return _server
@@ -0,0 +1,183 @@
+"""
+Bounded-context prompt building for the chat interviewer.
+
+Without this, every interviewer turn resends the full analysis, the full
+question list and the complete transcript, so prompt size and latency grow
+with every turn. ``InterviewContext`` keeps each turn's prompt within a token
+budget:
+
+- the analysis and question list are trimmed to the items the conversation
+  has not covered yet
+- once the prompt would exceed the budget, older turns are folded into a
+  short running summary and only the most recent turns are sent verbatim
+- the prompt size of every turn is recorded
+"""
+
+import os
+import re
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+DEFAULT_TOKEN_BUDGET = int(os.environ.get("INTERVIEW_TOKEN_BUDGET", "6000"))
+DEFAULT_RECENT_TURNS = int(os.environ.get("INTERVIEW_RECENT_TURNS", "6"))
+COVERAGE_THRESHOLD = 0.5
+
+STOPWORDS = {
+    "about", "after", "also", "been", "could", "does", "from", "have", "into", "more",
+    "most", "other", "should", "some", "such", "than", "that", "their", "them", "then",
+    "there", "these", "they", "this", "what", "when", "where", "which", "while", "will",
+    "with", "would", "your", "resume", "candidate", "tell", "describe", "please",
+}
+
+ITEM_PATTERN = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+(.*\S)")
+
+_encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """Count GPT-4o tokens, falling back to a characters-per-token estimate without tiktoken"""
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+
+def count_message_tokens(messages: List[BaseMessage]) -> int:
+    # Each chat message carries a few tokens of role/formatting overhead
+    return sum(count_tokens(str(message.content)) + 4 for message in messages) + 2
+
+
+def keywords(text: str) -> Set[str]:
+    return {word for word in re.findall(r"[a-z][a-z+#.-]{3,}", text.lower()) if word not in STOPWORDS}
+
+
+def open_items(text: str, covered_text: str) -> str:
+    """Drop list items from ``text`` whose keywords are mostly present in ``covered_text``"""
+    covered = keywords(covered_text)
+    kept, dropped = [], 0
+    for line in text.splitlines():
+        match = ITEM_PATTERN.match(line)
+        if match:
+            item_keywords = keywords(match.group(1))
+            if len(item_keywords) >= 2 and len(item_keywords & covered) / len(item_keywords) >= COVERAGE_THRESHOLD:
+                dropped += 1
+                continue
+        kept.append(line)
+    if not dropped:
+        return text
+    return "\n".join(kept).strip()
+
+
+def to_messages(message_history: List[Dict[str, str]]) -> List[BaseMessage]:
+    return [
+        HumanMessage(content=msg["content"]) if msg["role"] == "user" else AIMessage(content=msg["content"])
+        for msg in message_history
+    ]
+
+
+class InterviewContext:
+    """Build interviewer prompts that stay within a token budget"""
+
+    def __init__(self, resume_analysis: str, interview_questions: str, summarizer,
+                 token_budget: int = DEFAULT_TOKEN_BUDGET, recent_turns: int = DEFAULT_RECENT_TURNS,
+                 summarizer_config: Optional[Dict[str, Any]] = None):
+        self.resume_analysis = resume_analysis or ""
+        self.interview_questions = interview_questions or ""
+        self.summarizer = summarizer
+        self.token_budget = token_budget
+        self.recent_turns = recent_turns
+        self.summarizer_config = summarizer_config
+        self.memory = ""
+        self.summarized_upto = 0
+        self.prompt_tokens: List[int] = []
+
+    @property
+    def last_prompt_tokens(self) -> int:
+        return self.prompt_tokens[-1] if self.prompt_tokens else 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return the JSON-serializable state needed to rebuild this context"""
+        return {"memory": self.memory, "summarized_upto": self.summarized_upto,
+                "prompt_tokens": self.prompt_tokens[-1:]}
+
+    def restore(self, snapshot: Dict[str, Any]) -> None:
+        """Continue from a ``snapshot`` of another instance for the same interview"""
+        self.memory = snapshot.get("memory", "")
+        self.summarized_upto = snapshot.get("summarized_upto", 0)
+        self.prompt_tokens = list(snapshot.get("prompt_tokens", []))
+
+    def build_messages(self, render_system_prompt: Callable[[str, str, str], str],
+                       message_history: List[Dict[str, str]]) -> List[BaseMessage]:
+        """Return the messages for the next interviewer turn
+
+        ``render_system_prompt(analysis, questions, memory)`` renders the system prompt
+        from the still-open analysis items, the still-open questions and the running summary.
+        """
+        analysis, questions = self._open_items(message_history)
+        messages = self._render(render_system_prompt, analysis, questions, message_history)
+        tokens = count_message_tokens(messages)
+        if self._over_budget(tokens, message_history):
+            upto = len(message_history) - self.recent_turns
+            response = self.summarizer.invoke(self._summary_messages(message_history, upto),
+                                              config=self.summarizer_config)
+            self.memory, self.summarized_upto = response.content, upto
+            messages = self._render(render_system_prompt, analysis, questions, message_history)
+            tokens = count_message_tokens(messages)
+
+        self.prompt_tokens.append(tokens)
+        return messages
+
+    async def abuild_messages(self, render_system_prompt: Callable[[str, str, str], str],
+                              message_history: List[Dict[str, str]]) -> List[BaseMessage]:
+        """Async counterpart of ``build_messages``"""
+        analysis, questions = self._open_items(message_history)
+        messages = self._render(render_system_prompt, analysis, questions, message_history)
+        tokens = count_message_tokens(messages)
+        if self._over_budget(tokens, message_history):
+            upto = len(message_history) - self.recent_turns
+            response = await self.summarizer.ainvoke(self._summary_messages(message_history, upto),
+                                                     config=self.summarizer_config)
+            self.memory, self.summarized_upto = response.content, upto
+            messages = self._render(render_system_prompt, analysis, questions, message_history)
+            tokens = count_message_tokens(messages)
+
+        self.prompt_tokens.append(tokens)
+        return messages
+
+    def _open_items(self, message_history: List[Dict[str, str]]) -> Tuple[str, str]:
+        # Questions count as covered once the interviewer has asked them, analysis
+        # items once the conversation as a whole has touched on them
+        asked = "\n".join(msg["content"] for msg in message_history if msg["role"] != "user")
+        discussed = "\n".join(msg["content"] for msg in message_history)
+        return open_items(self.resume_analysis, discussed), open_items(self.interview_questions, asked)
+
+    def _over_budget(self, tokens: int, message_history: List[Dict[str, str]]) -> bool:
+        return tokens > self.token_budget and len(message_history) - self.summarized_upto > self.recent_turns
+
+    def _render(self, render_system_prompt, analysis, questions, message_history) -> List[BaseMessage]:
+        system_prompt = render_system_prompt(analysis, questions, self.memory)
+        return [SystemMessage(content=system_prompt)] + to_messages(message_history[self.summarized_upto:])
+
+    def _summary_messages(self, message_history: List[Dict[str, str]], upto: int) -> List[BaseMessage]:
+        """Prompt that folds turns ``summarized_upto:upto`` into the running memory block"""
+        turns = message_history[self.summarized_upto:upto]
+        formatted = "\n".join(
+            f"{'User' if msg['role'] == 'user' else 'Interviewer'}: {msg['content']}" for msg in turns
+        )
+        return [
+            SystemMessage(content="""You maintain the memory of an ongoing resume interview. Merge the new turns into the existing memory.
+Keep every concrete fact the candidate shared (achievements, metrics, tools, employers, dates) and note which topics were already discussed.
+Use terse bullet points and stay under 250 words."""),
+            HumanMessage(content=f"""Existing memory:
+{self.memory or "None yet."}
+
+New turns:
+{formatted}"""),
+        ]
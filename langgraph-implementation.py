@@ -2,23 +2,50 @@
 This is an alternative implementation using LangGraph more extensively
 for orchestrating the multi-agent workflow.
 
-Note: This is not used in the main application but provided
-as a reference for a more formal agent architecture approach.
+The compiled graph is checkpointed to a local SQLite file, keyed by session
+id (the LangGraph thread id). The interview is a human-in-the-loop interrupt:
+the graph pauses in ``conduct_interview`` until the transcript is supplied.
+A crashed or reloaded session resumes from its last completed node, so no
+model call is repeated. The Streamlit app records its progress into the
+same checkpoints.
+
+Every node that calls a model also has an async counterpart (``aanalyze_resume``
+and so on) that the graph uses under ``ainvoke``/``astream``. Async graph runs
+need an async checkpointer such as ``AsyncSqliteSaver``; headless runners can
+also await the async nodes directly.
 """
 
-import operator
-from typing import Dict, List, Any, TypedDict
-from pydantic import BaseModel, Field
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Any, Optional, TypedDict
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai import ChatOpenAI
 from langchain_core.output_parsers import StrOutputParser
-from langgraph.graph import END, StateGraph
-from langgraph.prebuilt import ToolNode
+from langchain_core.runnables import RunnableLambda
+from langgraph.graph import END, START, StateGraph
+from langgraph.checkpoint.sqlite import SqliteSaver
+from langgraph.types import Command, interrupt
+
+from chunked_analysis import aanalyze_chunked, analyze_chunked, needs_chunking
+from chunked_analysis import analysis_prompt as single_shot_analysis_prompt
+from section_enhancement import aenhance_sections, averify_sections, enhance_sections, verify_sections
+from instrumentation import agent_config, get_metrics
+from model_router import get_agent_model
+from rate_limiter import set_scope
+from resume_index import aupdate_analysis, aupdate_questions, get_resume_index, update_analysis, update_questions
+from heuristic_analysis import pre_analyze, prompt_notes
+from relevance import focus_resume, job_summary
+
+CHECKPOINT_PATH = os.environ.get("WORKFLOW_CHECKPOINT_PATH", ".workflow_checkpoints.sqlite3")
 
 # State definition
 class ResumeState(TypedDict):
     resume_content: str
+    # Optional target role: questions, insights and enhancement focus on the sections relevant to it
+    job_description: str
+    # Optional resume index scope of the user (``resume_index.scope_key``); without it nothing is reused
+    index_scope: str
     resume_analysis: str
     interview_questions: str
     chat_history: List[Dict[str, str]]
@@ -27,63 +54,44 @@ class ResumeState(TypedDict):
     verification_result: str
     final_resume: str
 
-# Node definitions
-def analyze_resume(state: ResumeState) -> ResumeState:
-    """Agent 1: Analyze the resume for gaps and weaknesses"""
-    llm = ChatOpenAI(model="gpt-4o", temperature=0)
-    
-    prompt = ChatPromptTemplate.from_messages([
-        SystemMessage(content="""You are a professional resume analyzer. Your task is to:
-1. Analyze the resume in detail
-2. Identify gaps, weaknesses, and areas for improvement
-3. Note any missing information that would strengthen the resume
-4. Evaluate the resume's structure, format, and content
-5. Suggest specific improvements
-
-Be thorough in your analysis. Format your response with clear sections and bullet points."""),
-        HumanMessage(content=f"Here is the resume to analyze:\n\n{state['resume_content']}")
-    ])
-    
-    chain = prompt | llm | StrOutputParser()
-    analysis = chain.invoke({})
-    
-    return {"resume_analysis": analysis}
+# Prompt definitions
+def target_role_notes(state: ResumeState) -> str:
+    """The target role block for a prompt, or an empty string without one"""
+    if not state.get("job_description"):
+        return ""
+    return f"The candidate is applying for this role:\n{job_summary(state['job_description'])}\n\n"
 
-def generate_questions(state: ResumeState) -> ResumeState:
-    """Agent 2: Generate interview questions based on resume analysis"""
-    llm = ChatOpenAI(model="gpt-4o", temperature=0.2)
-    
-    prompt = ChatPromptTemplate.from_messages([
+def analysis_prompt(state: ResumeState) -> ChatPromptTemplate:
+    return single_shot_analysis_prompt(state["resume_content"])
+
+def questions_prompt(state: ResumeState) -> ChatPromptTemplate:
+    return ChatPromptTemplate.from_messages([
         SystemMessage(content="""You are an expert interview question generator. Your task is to:
 1. Create 8-10 thoughtful interview questions based on the resume and its analysis
 2. Focus questions on areas that need clarification or expansion
 3. Include questions about missing information identified in the analysis
 4. Design questions that will help extract the candidate's accomplishments and skills
 5. Format each question with clear numbering
+6. Where the automated checks list bullets without numbers or gaps between roles, ask for the missing figures or what happened in the gap
+7. If a target role is given, focus on the experience and skills that role asks for
 
 The questions should be conversational and help gather valuable information to enhance the resume."""),
-        HumanMessage(content=f"""Here is the resume:
-{state['resume_content']}
+        HumanMessage(content=f"""{target_role_notes(state)}Here is the resume:
+{focus_resume(state['resume_content'], state.get('job_description'))}
 
 Here is the analysis of the resume:
 {state['resume_analysis']}
 
+{prompt_notes(pre_analyze(state['resume_content']))}
+
 Based on this information, generate interview questions to help fill gaps and strengthen the resume.""")
     ])
-    
-    chain = prompt | llm | StrOutputParser()
-    questions = chain.invoke({})
-    
-    return {"interview_questions": questions}
 
-def generate_insights(state: ResumeState) -> ResumeState:
-    """Agent 4: Extract insights from interview chat"""
-    llm = ChatOpenAI(model="gpt-4o", temperature=0.1)
-    
+def insights_prompt(state: ResumeState) -> ChatPromptTemplate:
     # Format chat history for the prompt
     formatted_chat = "\n".join([f"{'User' if msg['role'] == 'user' else 'Interviewer'}: {msg['content']}" for msg in state['chat_history']])
     
-    prompt = ChatPromptTemplate.from_messages([
+    return ChatPromptTemplate.from_messages([
         SystemMessage(content="""You are an expert at extracting valuable insights from interviews to enhance resumes. Your task is to:
 1. Analyze the interview conversation carefully
 2. Identify specific achievements, skills, experiences, and metrics mentioned
@@ -94,85 +102,182 @@ def generate_insights(state: ResumeState) -> ResumeState:
 
 Your insights will be used to enhance the candidate's resume."""),
         HumanMessage(content=f"""Here is the original resume:
-{state['resume_content']}
+{focus_resume(state['resume_content'], state.get('job_description'))}
 
 Here is the interview conversation:
 {formatted_chat}
 
 Based on this conversation, extract valuable insights that could enhance the resume.""")
     ])
+
+def similar_resume(state: ResumeState, field: str):
+    """An earlier near-duplicate of the resume, by the same user, whose ``field`` can be updated rather than redone"""
+    match = get_resume_index().find(state["resume_content"], state.get("index_scope"))
+    return match if match is not None and getattr(match, field) else None
+
+def questions_match(state: ResumeState):
+    # Indexed questions were written without a target role
+    return None if state.get("job_description") else similar_resume(state, "interview_questions")
+
+def index_result(state: ResumeState, match, **results) -> None:
+    """Index results written from the full resume; updates of a near-duplicate's results are not indexed"""
+    if match is None:
+        get_resume_index().add(state["resume_content"], state.get("index_scope"), **results)
+
+# Node definitions
+def analyze_resume(state: ResumeState) -> ResumeState:
+    """Agent 1: Analyze the resume for gaps and weaknesses"""
+    llm = get_agent_model("analyzer", temperature=0)
+    
+    # A near-duplicate was analyzed before: its analysis is edited to the changed lines
+    match = similar_resume(state, "resume_analysis")
+    if match is not None:
+        analysis = update_analysis(llm, match, state["resume_content"], config=agent_config("analyzer"))
+    # Long CVs are analyzed section by section concurrently, then merged
+    elif needs_chunking(state["resume_content"]):
+        analysis = analyze_chunked(llm, state["resume_content"], config=agent_config("analyzer"))
+    else:
+        chain = analysis_prompt(state) | llm | StrOutputParser()
+        analysis = chain.invoke({}, config=agent_config("analyzer"))
+    
+    index_result(state, match, resume_analysis=analysis)
+    return {"resume_analysis": analysis}
+
+async def aanalyze_resume(state: ResumeState) -> ResumeState:
+    """Agent 1, async"""
+    llm = get_agent_model("analyzer", temperature=0)
+    
+    match = similar_resume(state, "resume_analysis")
+    if match is not None:
+        analysis = await aupdate_analysis(llm, match, state["resume_content"], config=agent_config("analyzer"))
+    elif needs_chunking(state["resume_content"]):
+        analysis = await aanalyze_chunked(llm, state["resume_content"], config=agent_config("analyzer"))
+    else:
+        chain = analysis_prompt(state) | llm | StrOutputParser()
+        analysis = await chain.ainvoke({}, config=agent_config("analyzer"))
+    
+    index_result(state, match, resume_analysis=analysis)
+    return {"resume_analysis": analysis}
+
+def generate_questions(state: ResumeState) -> ResumeState:
+    """Agent 2: Generate interview questions based on resume analysis"""
+    llm = get_agent_model("question_generator", temperature=0.2)
+    
+    match = questions_match(state)
+    if match is not None:
+        questions = update_questions(llm, match, state["resume_content"], config=agent_config("question_generator"))
+    else:
+        chain = questions_prompt(state) | llm | StrOutputParser()
+        questions = chain.invoke({}, config=agent_config("question_generator"))
     
-    chain = prompt | llm | StrOutputParser()
-    insights = chain.invoke({})
+    if not state.get("job_description"):
+        index_result(state, match, interview_questions=questions)
+    return {"interview_questions": questions}
+
+async def agenerate_questions(state: ResumeState) -> ResumeState:
+    """Agent 2, async"""
+    llm = get_agent_model("question_generator", temperature=0.2)
+    
+    match = questions_match(state)
+    if match is not None:
+        questions = await aupdate_questions(llm, match, state["resume_content"],
+                                            config=agent_config("question_generator"))
+    else:
+        chain = questions_prompt(state) | llm | StrOutputParser()
+        questions = await chain.ainvoke({}, config=agent_config("question_generator"))
+    
+    if not state.get("job_description"):
+        index_result(state, match, interview_questions=questions)
+    return {"interview_questions": questions}
+
+def conduct_interview(state: ResumeState) -> ResumeState:
+    """Agent 3: Pause the workflow until the interview transcript is supplied"""
+    if len(state.get("chat_history") or []) > 3:
+        # The transcript was recorded before the graph reached this node
+        return {}
+    
+    # Resumed with Command(resume=chat_history); this node makes no model calls,
+    # so re-running it on resume is free
+    chat_history = interrupt({
+        "resume_analysis": state["resume_analysis"],
+        "interview_questions": state["interview_questions"]
+    })
+    return {"chat_history": chat_history}
+
+def generate_insights(state: ResumeState) -> ResumeState:
+    """Agent 4: Extract insights from interview chat"""
+    llm = get_agent_model("insights", temperature=0.1)
+    
+    chain = insights_prompt(state) | llm | StrOutputParser()
+    insights = chain.invoke({}, config=agent_config("insights"))
     
     return {"interview_insights": insights}
 
-def enhance_resume(state: ResumeState) -> ResumeState:
-    """Agent 5: Create an enhanced resume"""
-    llm = ChatOpenAI(model="gpt-4o", temperature=0.2)
-    
-    prompt = ChatPromptTemplate.from_messages([
-        SystemMessage(content="""You are a professional resume writer. Your task is to:
-1. Create an enhanced version of the resume incorporating the insights from the interview
-2. Maintain the original resume's structure but improve it where needed
-3. Add specific achievements, metrics, and experiences from the insights
-4. Strengthen the language and impact of bullet points
-5. Ensure the resume remains factual and truthful - don't invent information
-6. Keep the resume concise and professional
-7. Focus on quantifiable achievements and specific skills
-
-Output the complete enhanced resume in a clean, professional format."""),
-        HumanMessage(content=f"""Here is the original resume:
-{state['resume_content']}
+async def agenerate_insights(state: ResumeState) -> ResumeState:
+    """Agent 4, async"""
+    llm = get_agent_model("insights", temperature=0.1)
+    
+    chain = insights_prompt(state) | llm | StrOutputParser()
+    return {"interview_insights": await chain.ainvoke({}, config=agent_config("insights"))}
 
-Here are the insights from the interview to incorporate:
-{state['interview_insights']}
+def enhance_resume(state: ResumeState) -> ResumeState:
+    """Agent 5: Create an enhanced resume, one section at a time"""
+    llm = get_agent_model("enhancer", temperature=0.2)
+    
+    # Sections are enhanced concurrently; unchanged sections come from the section cache
+    enhanced = enhance_sections(
+        llm, state["resume_content"], state["interview_insights"], config=agent_config("enhancer"),
+        job_description=state.get("job_description")
+    )
+    
+    return {"enhanced_resume": enhanced["resume"]}
 
-Create an enhanced version of the resume that incorporates these insights.""")
-    ])
+async def aenhance_resume(state: ResumeState) -> ResumeState:
+    """Agent 5, async"""
+    llm = get_agent_model("enhancer", temperature=0.2)
     
-    chain = prompt | llm | StrOutputParser()
-    enhanced = chain.invoke({})
+    enhanced = await aenhance_sections(
+        llm, state["resume_content"], state["interview_insights"], config=agent_config("enhancer"),
+        job_description=state.get("job_description")
+    )
     
-    return {"enhanced_resume": enhanced}
+    return {"enhanced_resume": enhanced["resume"]}
 
 def verify_resume(state: ResumeState) -> ResumeState:
-    """Agent 6: Verify the enhanced resume for accuracy"""
-    llm = ChatOpenAI(model="gpt-4o", temperature=0)
-    
-    prompt = ChatPromptTemplate.from_messages([
-        SystemMessage(content="""You are a resume fact checker and accuracy verifier. Your task is to:
-1. Compare the original and enhanced resumes carefully
-2. Identify any potential inaccuracies, exaggerations, or fabrications in the enhanced resume
-3. Verify that all information in the enhanced resume is factually supported by either the original resume or could be reasonably inferred
-4. If you find issues, provide corrections that maintain the improved quality while ensuring accuracy
-5. If no issues are found, confirm the enhanced resume's accuracy
-
-Be thorough in your verification. The final resume must be both improved AND accurate."""),
-        HumanMessage(content=f"""Here is the original resume:
-{state['resume_content']}
-
-Here is the enhanced resume:
-{state['enhanced_resume']}
+    """Agent 6: Verify the claims the enhanced resume adds to the original and the interview"""
+    llm = get_agent_model("fact_checker", temperature=0)
+    
+    # Claims already backed by the original resume or the interview are checked locally and
+    # only lines with new claims go to the model; unchanged sections are not re-checked
+    verification = verify_sections(
+        llm,
+        state["resume_content"],
+        state["enhanced_resume"],
+        state.get("chat_history") or [],
+        config=agent_config("fact_checker")
+    )
+    
+    return {
+        "verification_result": verification["verification_result"],
+        "final_resume": verification["final_resume"]
+    }
 
-Please verify the enhanced resume for accuracy and provide a corrected version if needed.""")
-    ])
+async def averify_resume(state: ResumeState) -> ResumeState:
+    """Agent 6, async"""
+    llm = get_agent_model("fact_checker", temperature=0)
     
-    chain = prompt | llm | StrOutputParser()
-    verification = chain.invoke({})
+    verification = await averify_sections(
+        llm,
+        state["resume_content"],
+        state["enhanced_resume"],
+        state.get("chat_history") or [],
+        config=agent_config("fact_checker")
+    )
     
-    # Check if verification result contains a corrected resume
-    # This is a simple heuristic - if the verification result is long, it likely contains a corrected resume
-    if len(verification.split()) > 200:
-        return {
-            "verification_result": "The enhanced resume has been verified and corrected for accuracy.",
-            "final_resume": verification
-        }
-    else:
-        return {
-            "verification_result": verification,
-            "final_resume": state['enhanced_resume']
-        }
+    return {
+        "verification_result": verification["verification_result"],
+        "final_resume": verification["final_resume"]
+    }
 
 def decide_next_step(state: ResumeState) -> str:
     """Decision function to determine the next step in the workflow"""
@@ -197,28 +302,41 @@ def decide_next_step(state: ResumeState) -> str:
         return END
     
     # Interview is not complete yet
-    return "conduct_interview"  # This would be handled in the UI
+    return "conduct_interview"
+
+_checkpointer = None
+_checkpointer_lock = threading.Lock()
+
+def get_checkpointer(path: str = CHECKPOINT_PATH) -> SqliteSaver:
+    """Return the process-wide on-disk checkpointer"""
+    global _checkpointer
+    with _checkpointer_lock:
+        if _checkpointer is None:
+            _checkpointer = SqliteSaver(sqlite3.connect(path, check_same_thread=False))
+        return _checkpointer
 
 # Build the graph
-def build_resume_workflow():
+def build_resume_workflow(checkpointer=None):
     """Build the LangGraph workflow for resume enhancement"""
     # Initialize the graph
     workflow = StateGraph(ResumeState)
     
-    # Add nodes
-    workflow.add_node("analyze_resume", analyze_resume)
-    workflow.add_node("generate_questions", generate_questions)
-    workflow.add_node("generate_insights", generate_insights)
-    workflow.add_node("enhance_resume", enhance_resume)
-    workflow.add_node("verify_resume", verify_resume)
+    # Add nodes; model-calling nodes run their async counterpart under ainvoke/astream
+    workflow.add_node("analyze_resume", RunnableLambda(analyze_resume, afunc=aanalyze_resume))
+    workflow.add_node("generate_questions", RunnableLambda(generate_questions, afunc=agenerate_questions))
+    workflow.add_node("conduct_interview", conduct_interview)
+    workflow.add_node("generate_insights", RunnableLambda(generate_insights, afunc=agenerate_insights))
+    workflow.add_node("enhance_resume", RunnableLambda(enhance_resume, afunc=aenhance_resume))
+    workflow.add_node("verify_resume", RunnableLambda(verify_resume, afunc=averify_resume))
     
     # Add edges
     workflow.add_conditional_edges(
-        "",
+        START,
         decide_next_step,
         {
             "analyze_resume": "analyze_resume",
             "generate_questions": "generate_questions",
+            "conduct_interview": "conduct_interview",
             "generate_insights": "generate_insights",
             "enhance_resume": "enhance_resume",
             "verify_resume": "verify_resume",
@@ -227,21 +345,65 @@ def build_resume_workflow():
     )
     
     workflow.add_edge("analyze_resume", "generate_questions")
-    workflow.add_edge("generate_questions", "conduct_interview")  # This would be handled externally
+    workflow.add_edge("generate_questions", "conduct_interview")
+    workflow.add_edge("conduct_interview", "generate_insights")
     workflow.add_edge("generate_insights", "enhance_resume")
     workflow.add_edge("enhance_resume", "verify_resume")
     workflow.add_edge("verify_resume", END)
     
     # Compile the graph
-    return workflow.compile()
+    return workflow.compile(checkpointer=checkpointer)
+
+_workflow = None
+
+def get_resume_workflow():
+    """Return the process-wide workflow compiled with the on-disk checkpointer"""
+    global _workflow
+    if _workflow is None:
+        _workflow = build_resume_workflow(checkpointer=get_checkpointer())
+    return _workflow
+
+def session_config(session_id: str) -> Dict[str, Any]:
+    return {"configurable": {"thread_id": session_id}}
+
+def run_config(session_id: str) -> Dict[str, Any]:
+    # The metrics handler also times each node; model calls are measured either way.
+    # Node tasks copy this context, so their requests queue under the session
+    set_scope(session_id)
+    return {**session_config(session_id), "callbacks": [get_metrics()]}
+
+def run_workflow(session_id: str, initial_state: Optional[ResumeState] = None, workflow=None):
+    """Run a session until it finishes or waits for the interview, resuming from its last checkpoint"""
+    workflow = workflow or get_resume_workflow()
+    config = run_config(session_id)
+    snapshot = workflow.get_state(config)
+    if snapshot.values:
+        # Continue from the last completed node; finished nodes are never re-run
+        if snapshot.next:
+            workflow.invoke(None, config)
+    else:
+        workflow.invoke(initial_state, config)
+    return workflow.get_state(config)
+
+def submit_interview(session_id: str, chat_history: List[Dict[str, str]], workflow=None):
+    """Resume a session paused at the interview with the completed transcript"""
+    workflow = workflow or get_resume_workflow()
+    config = run_config(session_id)
+    workflow.invoke(Command(resume=chat_history), config)
+    return workflow.get_state(config)
+
+def record_progress(session_id: str, node: str, values: Dict[str, Any], workflow=None):
+    """Checkpoint work done outside the graph (e.g. in the UI) as if ``node`` had produced it"""
+    workflow = workflow or get_resume_workflow()
+    workflow.update_state(session_config(session_id), values, as_node=node)
+
+def load_progress(session_id: str, workflow=None) -> Dict[str, Any]:
+    """Return the checkpointed state of a session, or an empty dict for a new one"""
+    workflow = workflow or get_resume_workflow()
+    return dict(workflow.get_state(session_config(session_id)).values)
 
 # Example usage:
-# resume_workflow = build_resume_workflow()
-# initial_state = {"resume_content": "Your resume content here"}
-# for event in resume_workflow.stream(initial_state, {'recursion_limit': 25}):
-#     if event["type"] == "state":
-#         # Process state updates
-#         print(f"Step: {event['step']}")
-#     elif event["type"] == "end":
-#         final_state = event["state"]
-#         print("Workflow complete!")
+# state = run_workflow("session-123", {"resume_content": "Your resume content here"})
+# # ... paused at the interview: state.next == ("conduct_interview",)
+# state = submit_interview("session-123", chat_history)
+# print(state.values["final_resume"])
@@ -0,0 +1,244 @@
+"""
+Persistent, content-addressed cache for the agent LLM calls.
+
+Every call is keyed on a SHA-256 of the model configuration (model name,
+temperature and the other invocation parameters LangChain folds into its
+``llm_string``) and the rendered prompt messages. Entries live in a local
+SQLite file so they survive restarts, and are evicted by TTL and by a
+least-recently-used size bound.
+
+The same cache instance is shared by the Streamlit app and the LangGraph
+nodes, so re-running a stock resume through either path is served from
+disk instead of paying for another GPT-4o round-trip. A lookup for a prompt
+that is still being generated waits for that call (see ``single_flight``)
+rather than missing and starting a second one.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps
+from langchain_core.messages import AIMessage, BaseMessage, message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, Generation
+
+from single_flight import SingleFlight, get_single_flight
+
+DEFAULT_CACHE_PATH = os.environ.get("LLM_CACHE_PATH", ".llm_cache.sqlite3")
+DEFAULT_MAX_ENTRIES = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", "5000"))
+DEFAULT_TTL_SECONDS = int(os.environ.get("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+
+def _generation_to_dict(generation: Generation) -> Dict[str, Any]:
+    # Store plain message dicts rather than serialized LangChain objects, so reading
+    # the cache never instantiates arbitrary classes; tool calls are preserved
+    if isinstance(generation, ChatGeneration):
+        return {"message": message_to_dict(generation.message)}
+    return {"text": generation.text}
+
+
+def _generation_from_dict(data: Dict[str, Any]) -> Generation:
+    if "message" in data:
+        return ChatGeneration(message=messages_from_dict([data["message"]])[0])
+    return Generation(text=data["text"])
+
+
+class SQLiteLLMCache(BaseCache):
+    """LangChain cache backed by SQLite with TTL and LRU size eviction"""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 ttl_seconds: Optional[int] = DEFAULT_TTL_SECONDS, flights: Optional[SingleFlight] = None):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # Coalesces lookups for prompts that are still being generated; None turns that off
+        self.flights = flights
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_last_used ON llm_cache (last_used)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(prompt: str, llm_string: str) -> str:
+        """Hash the model configuration and rendered prompt into a cache key"""
+        return hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = self.make_key(prompt, llm_string)
+        if self.flights is None:
+            return self.get(key)
+        cached = self.get(key)
+        while cached is None:
+            flight, leader = self.flights.join(key)
+            if leader:
+                # The previous flight may have ended between the read and the join
+                return self._lead(key, flight, self.get(key, count=False))
+            # Another caller is generating this prompt; its update ends the flight
+            self.flights.wait(flight)
+            cached = self.get(key, count=False)
+        return cached
+
+    async def alookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = self.make_key(prompt, llm_string)
+        loop = asyncio.get_running_loop()
+        if self.flights is None:
+            return await loop.run_in_executor(None, self.get, key)
+        cached = await loop.run_in_executor(None, self.get, key)
+        while cached is None:
+            flight, leader = self.flights.join(key)
+            if leader:
+                # Re-read in the executor, then take the lease here, in the caller's context
+                return self._lead(key, flight, await loop.run_in_executor(None, self.get, key, False))
+            await self.flights.await_flight(flight)
+            cached = await loop.run_in_executor(None, self.get, key, False)
+        return cached
+
+    def _lead(self, key: str, flight, cached: Optional[RETURN_VAL_TYPE]) -> Optional[RETURN_VAL_TYPE]:
+        """Lead ``flight`` for the model call about to run, unless ``cached`` (a fresh re-read) already has the result"""
+        if cached is not None:
+            self.flights.finish(key, flight)
+            return cached
+        self.flights.lead(key, flight)
+        return None
+
+    def get(self, key: str, count: bool = True) -> Optional[RETURN_VAL_TYPE]:
+        """Return the generations stored under ``key``, or None if there are none or they expired
+
+        ``count=False`` re-reads for a lookup that was already counted, so one lookup is one hit or miss.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += count
+                return None
+            value, created_at = row
+            if self.ttl_seconds and now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                self.evictions += 1
+                self.misses += count
+                return None
+            self._conn.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += count
+        return [_generation_from_dict(generation) for generation in json.loads(value)]
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        key = self.make_key(prompt, llm_string)
+        value = json.dumps([_generation_to_dict(generation) for generation in return_val])
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+        if self.flights is not None:
+            self.flights.finish(key)
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+
+    def _evict(self, now: float) -> None:
+        """Drop expired entries, then the least recently used ones above the size bound"""
+        if self.ttl_seconds:
+            cursor = self._conn.execute(
+                "DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_seconds,)
+            )
+            self.evictions += max(cursor.rowcount, 0)
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN "
+                "(SELECT key FROM llm_cache ORDER BY last_used ASC LIMIT ?)",
+                (overflow,),
+            )
+            self.evictions += overflow
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the current number of stored entries"""
+        with self._lock:
+            (entries,) = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "evictions": self.evictions,
+        }
+
+
+_cache: Optional[SQLiteLLMCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> SQLiteLLMCache:
+    """Return the process-wide LLM cache, creating it on first use"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SQLiteLLMCache(flights=get_single_flight())
+        return _cache
+
+
+def cached_stream(llm, messages: List[BaseMessage], config: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+    """Stream the text of an LLM response, serving it from and storing it in the LLM cache
+
+    ``BaseChatModel.stream`` skips the cache, so streamed agent calls look up and
+    update it here using the same key LangChain's ``invoke`` path would use.
+    The model is streamed on a background thread that callers asking for the
+    same prompt share, so a rerun that abandons the stream attaches to it again.
+    """
+    cache = llm.cache if isinstance(llm.cache, BaseCache) else get_llm_cache()
+    llm_string = llm._get_llm_string()
+    prompt = dumps(messages)
+
+    def read(count: bool = True) -> Optional[str]:
+        cached = cache.lookup(prompt, llm_string) if flights is None else cache.get(key, count)
+        return cached[0].text if cached else None
+
+    def produce() -> Iterator[str]:
+        parts = []
+        for chunk in llm.stream(messages, config=config):
+            if chunk.content:
+                parts.append(chunk.content)
+                yield chunk.content
+        text = "".join(parts)
+        cache.update(prompt, llm_string, [ChatGeneration(message=AIMessage(content=text))])
+
+    flights = getattr(cache, "flights", None)
+    if flights is None:
+        cached = read()
+        if cached is not None:
+            yield cached
+            return
+        yield from produce()
+        return
+    key = cache.make_key(prompt, llm_string)
+    yield from flights.stream(key, read, produce)
@@ -0,0 +1,210 @@
+"""
+Process-wide registry of chat model clients.
+
+Building a ``ChatOpenAI`` per agent call gives every call its own HTTP
+connection pool, so each step pays TCP/TLS setup again. This registry hands
+out one client per (API key, model, temperature, timeout), all sharing a single
+keep-alive HTTP connection pool, so connections are reused across agents,
+LangGraph nodes and the many sessions a Streamlit process serves.
+
+The registry is bounded and evicts clients that have been idle for too long.
+Requests from every pooled client share one ``RateLimiter`` through the
+pool's HTTP transports, so retries and backoff happen there rather than in
+the OpenAI SDK. A different model factory (e.g. a local fake model) can be
+installed with ``set_model_factory`` for offline runs.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import httpx
+
+from instrumentation import get_metrics
+from llm_cache import get_llm_cache
+from rate_limiter import AsyncRateLimitedTransport, RateLimitedTransport, get_rate_limiter
+from single_flight import get_single_flight
+
+MAX_CLIENTS = int(os.environ.get("LLM_POOL_MAX_CLIENTS", "64"))
+IDLE_TIMEOUT_SECONDS = float(os.environ.get("LLM_POOL_IDLE_SECONDS", "900"))
+MAX_CONNECTIONS = int(os.environ.get("LLM_POOL_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("LLM_POOL_MAX_KEEPALIVE", "20"))
+KEEPALIVE_EXPIRY_SECONDS = float(os.environ.get("LLM_POOL_KEEPALIVE_EXPIRY", "120"))
+
+
+class ConnectionStats:
+    """Count HTTP requests and newly opened connections to derive connection reuse"""
+
+    def __init__(self):
+        self.requests = 0
+        self.connections_opened = 0
+        self._lock = threading.Lock()
+
+    def on_request(self, request: httpx.Request) -> None:
+        with self._lock:
+            self.requests += 1
+        # httpcore reports connection setup through the trace extension; a reused
+        # keep-alive connection never emits a connect event
+        request.extensions["trace"] = self._trace
+
+    async def on_async_request(self, request: httpx.Request) -> None:
+        with self._lock:
+            self.requests += 1
+        request.extensions["trace"] = self._async_trace
+
+    def _trace(self, event_name: str, info: Dict[str, Any]) -> None:
+        if event_name == "connection.connect_tcp.complete":
+            with self._lock:
+                self.connections_opened += 1
+
+    async def _async_trace(self, event_name: str, info: Dict[str, Any]) -> None:
+        self._trace(event_name, info)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            reused = max(self.requests - self.connections_opened, 0)
+            return {
+                "http_requests": self.requests,
+                "connections_opened": self.connections_opened,
+                "connection_reuse_rate": reused / self.requests if self.requests else 0.0,
+            }
+
+
+class LLMClientPool:
+    """Thread-safe, bounded registry of chat models sharing keep-alive HTTP pools"""
+
+    def __init__(self, max_clients: int = MAX_CLIENTS, idle_timeout: float = IDLE_TIMEOUT_SECONDS,
+                 factory: Optional[Callable[..., Any]] = None):
+        self.max_clients = max_clients
+        self.idle_timeout = idle_timeout
+        self.factory = factory
+        self.created = 0
+        self.reused = 0
+        self.evicted = 0
+        self.connection_stats = ConnectionStats()
+        self._clients: "OrderedDict[Tuple[str, str, float, Optional[float]], list]" = OrderedDict()
+        self._lock = threading.Lock()
+        limits = httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY_SECONDS,
+        )
+        timeout = httpx.Timeout(120.0, connect=10.0)
+        # Every request waits for the shared RPM/TPM budget and a concurrency slot
+        self._http_client = httpx.Client(
+            transport=RateLimitedTransport(httpx.HTTPTransport(limits=limits), get_rate_limiter()),
+            timeout=timeout,
+            event_hooks={"request": [self.connection_stats.on_request]},
+        )
+        self._http_async_client = httpx.AsyncClient(
+            transport=AsyncRateLimitedTransport(httpx.AsyncHTTPTransport(limits=limits), get_rate_limiter()),
+            timeout=timeout,
+            event_hooks={"request": [self.connection_stats.on_async_request]},
+        )
+
+    def get(self, model: str, temperature: float, api_key: Optional[str] = None, timeout: Optional[float] = None):
+        """Return the shared chat model for this API key, model, temperature and request timeout"""
+        api_key = api_key or os.environ.get("OPENAI_API_KEY")
+        key_hash = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()
+        key = (key_hash, model, float(temperature), timeout)
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            entry = self._clients.get(key)
+            if entry is not None:
+                entry[1] = now
+                self._clients.move_to_end(key)
+                self.reused += 1
+                return entry[0]
+            llm = self._build(model, temperature, api_key, timeout)
+            self._clients[key] = [llm, now]
+            self.created += 1
+            while len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+                self.evicted += 1
+            return llm
+
+    def _build(self, model: str, temperature: float, api_key: Optional[str], timeout: Optional[float]):
+        if self.factory is not None:
+            llm = self.factory(model=model, temperature=temperature, api_key=api_key, timeout=timeout)
+        else:
+            # langchain_openai (and the OpenAI SDK) take about a second to import, so only
+            # when the first real model is built, not at app start or with a fake factory
+            from langchain_openai import ChatOpenAI
+
+            llm = ChatOpenAI(
+                model=model,
+                temperature=temperature,
+                api_key=api_key,
+                # Per-agent request timeout from the model router, so a slow model fails over
+                timeout=timeout,
+                cache=get_llm_cache(),
+                # Report token usage on streamed responses too
+                stream_usage=True,
+                # 429/5xx are retried by the rate-limited transport, with backoff shared across sessions
+                max_retries=0,
+                http_client=self._http_client,
+                http_async_client=self._http_async_client,
+            )
+        # Every pooled model reports latency, tokens and cost per agent, and a failed call
+        # releases the callers waiting on it in the single-flight registry
+        llm.callbacks = [get_metrics(), get_single_flight()]
+        return llm
+
+    def _evict_idle(self, now: float) -> None:
+        """Drop clients that have not been handed out within the idle timeout"""
+        # Entries are kept in least-recently-used order, so stop at the first fresh one
+        while self._clients:
+            key, (_, last_used) = next(iter(self._clients.items()))
+            if now - last_used <= self.idle_timeout:
+                break
+            del self._clients[key]
+            self.evicted += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return client and connection reuse counters"""
+        with self._lock:
+            handed_out = self.created + self.reused
+            stats = {
+                "clients": len(self._clients),
+                "clients_created": self.created,
+                "clients_reused": self.reused,
+                "client_reuse_rate": self.reused / handed_out if handed_out else 0.0,
+                "clients_evicted": self.evicted,
+            }
+        stats.update(self.connection_stats.snapshot())
+        return stats
+
+
+_pool: Optional[LLMClientPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_llm_pool() -> LLMClientPool:
+    """Return the process-wide client pool, creating it on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = LLMClientPool()
+        return _pool
+
+
+def set_model_factory(factory: Optional[Callable[..., Any]]) -> LLMClientPool:
+    """Replace the process-wide pool with one that builds models through ``factory``
+
+    ``factory`` is called with ``model``, ``temperature``, ``api_key`` and
+    ``timeout`` keyword arguments; pass ``None`` to go back to ``ChatOpenAI``.
+    """
+    global _pool
+    with _pool_lock:
+        _pool = LLMClientPool(factory=factory)
+        return _pool
+
+
+def get_chat_model(model: str = "gpt-4o", temperature: float = 0, api_key: Optional[str] = None,
+                   timeout: Optional[float] = None):
+    """Shortcut for ``get_llm_pool().get(...)``"""
+    return get_llm_pool().get(model, temperature, api_key, timeout)
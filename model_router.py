@@ -0,0 +1,143 @@
+"""
+Per-agent model routing with latency targets and fallbacks.
+
+Every agent declares in ``model_routing.json``:
+
+- ``tier``: the list of interchangeable models it may run on (``tiers``)
+- ``latency_target_seconds``: how long a call of this agent should take
+- ``timeout_seconds``: when a request is given up on
+- ``fallbacks``: further models to fail over to, e.g. another tier
+
+``get_agent_model`` picks the fastest model of the tier whose recent latency
+for this agent (as measured by ``instrumentation``) meets the target. Models
+without calls in the last ``MODEL_LATENCY_WINDOW_SECONDS`` are taken in tier
+order before any model that missed the target, so a model that was slow gets
+another chance once its measurements are stale. The chosen model is wrapped
+with the rest of the tier and the agent's fallbacks, which take over when a
+call times out, cannot connect, or still fails with 429/5xx after the rate
+limiter's retries.
+
+A deployment can override the defaults with a JSON file of the same shape
+named by ``MODEL_ROUTING_PATH``; its tiers replace the default tiers of the
+same name and its agent entries are merged over the default ones.
+"""
+
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+from instrumentation import get_metrics
+from llm_pool import get_llm_pool
+
+DEFAULT_ROUTING_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "model_routing.json")
+ROUTING_PATH = os.environ.get("MODEL_ROUTING_PATH")
+LATENCY_WINDOW_SECONDS = float(os.environ.get("MODEL_LATENCY_WINDOW_SECONDS", "600"))
+
+
+def failover_errors() -> tuple:
+    """Errors after which the next model is tried
+
+    Other errors (bad request, authentication) would fail on every model alike.
+    """
+    # Imported here rather than at module level, like ChatOpenAI in llm_pool
+    import openai
+
+    return (
+        openai.APITimeoutError,
+        openai.APIConnectionError,
+        openai.InternalServerError,
+        openai.RateLimitError,
+        TimeoutError,
+    )
+
+
+def load_routing(path: Optional[str] = ROUTING_PATH) -> Dict[str, Any]:
+    """Load the default routing config with the deployment override at ``path`` merged over it"""
+    with open(DEFAULT_ROUTING_PATH, encoding="utf-8") as f:
+        routing = json.load(f)
+    if path:
+        with open(path, encoding="utf-8") as f:
+            override = json.load(f)
+        routing["tiers"].update(override.get("tiers", {}))
+        for agent, settings in override.get("agents", {}).items():
+            routing["agents"][agent] = {**routing["agents"].get(agent, routing["agents"]["default"]), **settings}
+    for agent, settings in routing["agents"].items():
+        if settings["tier"] not in routing["tiers"]:
+            raise ValueError(f"Agent {agent!r} uses unknown model tier {settings['tier']!r}")
+    return routing
+
+
+class ModelRouter:
+    """Choose a model per agent call from the routing config and recent latencies"""
+
+    def __init__(self, routing: Dict[str, Any], latency_window: float = LATENCY_WINDOW_SECONDS):
+        self.routing = routing
+        self.latency_window = latency_window
+
+    def settings(self, agent: str) -> Dict[str, Any]:
+        agents = self.routing["agents"]
+        return agents.get(agent, agents["default"])
+
+    def rank(self, agent: str) -> List[str]:
+        """The agent's tier models, best first: fastest within target, unmeasured, then the rest by latency"""
+        settings = self.settings(agent)
+        target = settings["latency_target_seconds"]
+        metrics = get_metrics()
+        ranked = []
+        for index, model in enumerate(self.routing["tiers"][settings["tier"]]):
+            latency = metrics.recent_latency(agent, model, max_age=self.latency_window)
+            if latency is None:
+                ranked.append(((1, index), model))
+            else:
+                ranked.append(((0 if latency <= target else 2, latency), model))
+        return [model for _, model in sorted(ranked)]
+
+    def route(self, agent: str) -> List[str]:
+        """Models to try for a call of ``agent``, in order"""
+        tier = self.rank(agent)
+        return list(dict.fromkeys(tier + self.settings(agent).get("fallbacks", [])))
+
+    def model(self, agent: str, temperature: float = 0, api_key: Optional[str] = None):
+        """Pooled chat model for ``agent`` that fails over along its route"""
+        timeout = self.settings(agent).get("timeout_seconds")
+        pool = get_llm_pool()
+        primary, *fallbacks = [pool.get(model, temperature, api_key, timeout) for model in self.route(agent)]
+        if not fallbacks:
+            return primary
+        return primary.with_fallbacks(fallbacks, exceptions_to_handle=failover_errors())
+
+    def stats(self) -> Dict[str, Any]:
+        """Return how many routed calls were sent and how many went to a model other than the tier's first
+
+        Counted from the calls ``instrumentation`` recorded, so a fallback attempt
+        counts when it is made, and a client that is built but never called does not.
+        """
+        routed = rerouted = 0
+        for (agent, model), calls in get_metrics().call_counts().items():
+            settings = self.settings(agent)
+            tier = self.routing["tiers"][settings["tier"]]
+            if model not in tier and model not in settings.get("fallbacks", []):
+                continue
+            routed += calls
+            if model != tier[0]:
+                rerouted += calls
+        return {"routed": routed, "rerouted": rerouted}
+
+
+_router: Optional[ModelRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_model_router() -> ModelRouter:
+    """Return the process-wide router, loading the routing config on first use"""
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = ModelRouter(load_routing())
+        return _router
+
+
+def get_agent_model(agent: str, temperature: float = 0, api_key: Optional[str] = None):
+    """Shortcut for ``get_model_router().model(...)``"""
+    return get_model_router().model(agent, temperature, api_key)
@@ -0,0 +1,200 @@
+"""
+PDF rendering for the enhanced resume.
+
+Lays out the markdown the enhancer produces (headings, bullets, numbered
+items, rules and bold markers) on top of reportlab, wrapping lines to the
+page width with cached font metrics. Rendered bytes are memoized by content
+hash, so Streamlit reruns of the download step cost nothing. The reportlab
+canvas and font metrics are imported on first use, when a PDF is requested.
+
+Run ``python pdf_renderer.py`` for a throughput benchmark (pages/sec).
+"""
+
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from io import BytesIO
+from typing import List, Tuple
+
+from reportlab.lib.pagesizes import letter
+
+PAGE_WIDTH, PAGE_HEIGHT = letter
+MARGIN = 50
+TOP_MARGIN = 40
+BULLET_INDENT = 12
+CACHE_SIZE = 32
+
+# style: (font, size, line height, space before)
+STYLES = {
+    "h1": ("Helvetica-Bold", 16, 20, 6),
+    "h2": ("Helvetica-Bold", 13, 17, 8),
+    "h3": ("Helvetica-Bold", 11, 15, 6),
+    "bold": ("Helvetica-Bold", 10, 14, 0),
+    "body": ("Helvetica", 10, 14, 0),
+}
+
+HEADING_PATTERN = re.compile(r"^(#{1,6})\s+(.*)")
+BULLET_PATTERN = re.compile(r"^(\s*)[-*•]\s+(.*)")
+NUMBERED_PATTERN = re.compile(r"^(\s*)(\d+[.)])\s+(.*)")
+RULE_PATTERN = re.compile(r"^\s*([-*_])(\s*\1){2,}\s*$")
+
+_pdf_cache: "OrderedDict[str, bytes]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+@lru_cache(maxsize=65536)
+def text_width(text: str, font: str, size: float) -> float:
+    """Width of a word in points, cached because resumes repeat the same words constantly"""
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+
+    return stringWidth(text, font, size)
+
+
+def _break_word(word: str, font: str, size: float, max_width: float) -> List[str]:
+    """Split a word wider than the line (e.g. a long URL) into pieces that fit"""
+    pieces, current = [], ""
+    for char in word:
+        if current and text_width(current + char, font, size) > max_width:
+            pieces.append(current)
+            current = char
+        else:
+            current += char
+    pieces.append(current)
+    return pieces
+
+
+def wrap_text(text: str, font: str, size: float, max_width: float) -> List[str]:
+    """Greedily wrap ``text`` into lines no wider than ``max_width``"""
+    space = text_width(" ", font, size)
+    lines, current, current_width = [], [], 0.0
+    for word in text.split():
+        width = text_width(word, font, size)
+        if width > max_width:
+            pieces = _break_word(word, font, size, max_width)
+            if current:
+                lines.append(" ".join(current))
+            lines.extend(pieces[:-1])
+            current, current_width = [pieces[-1]], text_width(pieces[-1], font, size)
+            continue
+        needed = width if not current else current_width + space + width
+        if current and needed > max_width:
+            lines.append(" ".join(current))
+            current, current_width = [word], width
+        else:
+            current.append(word)
+            current_width = needed
+    if current:
+        lines.append(" ".join(current))
+    return lines or [""]
+
+
+def parse_markdown(text: str) -> List[Tuple[str, str, str, int]]:
+    """Turn markdown into (kind, style, text, indent) blocks"""
+    blocks = []
+    for raw_line in text.splitlines():
+        line = raw_line.rstrip()
+        if not line.strip():
+            blocks.append(("blank", "body", "", 0))
+        elif RULE_PATTERN.match(line):
+            blocks.append(("rule", "body", "", 0))
+        elif HEADING_PATTERN.match(line):
+            hashes, content = HEADING_PATTERN.match(line).groups()
+            blocks.append(("text", f"h{min(len(hashes), 3)}", content.replace("**", ""), 0))
+        elif BULLET_PATTERN.match(line):
+            spaces, content = BULLET_PATTERN.match(line).groups()
+            blocks.append(("bullet:•", "body", content.replace("**", ""), len(spaces) // 2))
+        elif NUMBERED_PATTERN.match(line):
+            spaces, label, content = NUMBERED_PATTERN.match(line).groups()
+            blocks.append((f"bullet:{label}", "body", content.replace("**", ""), len(spaces) // 2))
+        else:
+            content = line.strip()
+            style = "bold" if content.startswith("**") and content.endswith("**") and len(content) > 4 else "body"
+            blocks.append(("text", style, content.replace("**", ""), 0))
+    return blocks
+
+
+def _render(text: str) -> Tuple[bytes, int]:
+    from reportlab.pdfgen import canvas
+
+    buffer = BytesIO()
+    # invariant=1 keeps output byte-identical for identical input
+    c = canvas.Canvas(buffer, pagesize=letter, invariant=1)
+    c.setTitle("Enhanced Resume")
+    y = PAGE_HEIGHT - TOP_MARGIN
+
+    def new_page():
+        c.showPage()
+        return PAGE_HEIGHT - TOP_MARGIN
+
+    for kind, style, content, indent in parse_markdown(text):
+        font, size, line_height, space_before = STYLES[style]
+        if kind == "blank":
+            y -= line_height / 2
+            continue
+        if kind == "rule":
+            if y - line_height < MARGIN:
+                y = new_page()
+            c.line(MARGIN, y + 4, PAGE_WIDTH - MARGIN, y + 4)
+            y -= line_height / 2
+            continue
+
+        x = MARGIN + indent * BULLET_INDENT
+        if kind.startswith("bullet:"):
+            label = kind.split(":", 1)[1]
+            x += BULLET_INDENT + (text_width(label, font, size) if label != "•" else 0)
+        lines = wrap_text(content, font, size, PAGE_WIDTH - MARGIN - x)
+
+        y -= space_before
+        for i, line in enumerate(lines):
+            if y < MARGIN:
+                y = new_page()
+            c.setFont(font, size)
+            if i == 0 and kind.startswith("bullet:"):
+                c.drawString(MARGIN + indent * BULLET_INDENT, y, kind.split(":", 1)[1])
+            c.drawString(x, y, line)
+            y -= line_height
+
+    pages = c.getPageNumber()
+    c.save()
+    return buffer.getvalue(), pages
+
+
+def render_pdf(text: str) -> bytes:
+    """Render resume markdown to PDF bytes, memoized by content hash"""
+    key = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    with _cache_lock:
+        if key in _pdf_cache:
+            _pdf_cache.move_to_end(key)
+            return _pdf_cache[key]
+    pdf_content, _ = _render(text)
+    with _cache_lock:
+        _pdf_cache[key] = pdf_content
+        while len(_pdf_cache) > CACHE_SIZE:
+            _pdf_cache.popitem(last=False)
+    return pdf_content
+
+
+def benchmark(pages_per_document: int = 5, documents: int = 20) -> dict:
+    """Measure uncached rendering throughput in pages per second"""
+    role = """## Senior Data Engineer, Example Corp (2019 - 2024)
+- Designed and operated streaming pipelines processing 2 billion events per day with Kafka, Spark and Python, cutting end-to-end latency from 15 minutes to 40 seconds
+- Led a team of 6 engineers through a migration from on-premise Hadoop to a cloud data lake, reducing infrastructure cost by 35%
+- Introduced data quality checks and lineage tracking adopted by 12 downstream teams
+"""
+    sample = "# Jane Doe\n**Data Engineer**\n\n---\n" + role * (6 * pages_per_document)
+    total_pages = 0
+    started = time.perf_counter()
+    for _ in range(documents):
+        # Bypass the bytes cache; font metrics stay warm as they would in a long-running server
+        _, pages = _render(sample)
+        total_pages += pages
+    elapsed = time.perf_counter() - started
+    return {"documents": documents, "pages": total_pages, "seconds": elapsed, "pages_per_second": total_pages / elapsed}
+
+
+if __name__ == "__main__":
+    result = benchmark()
+    print(f"Rendered {result['pages']} pages in {result['seconds']:.2f}s: {result['pages_per_second']:.1f} pages/sec")
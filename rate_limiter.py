@@ -0,0 +1,512 @@
+"""
+Process-wide client-side rate limiting for the OpenAI API.
+
+Every request from the shared client pool goes through a
+``RateLimitedTransport`` (sync) or ``AsyncRateLimitedTransport`` (async)
+in front of httpx. Before a request is sent, the transport takes from
+``RateLimiter``:
+
+- a request from the requests-per-minute bucket (``LLM_RPM_LIMIT``)
+- an estimate of its tokens from the tokens-per-minute bucket
+  (``LLM_TPM_LIMIT``): the request body size / 4 plus the completion budget
+- a slot under the adaptive concurrency limit
+
+Waiting requests queue per scope (the session id set with ``set_scope``) and
+scopes are served round-robin, so one busy session cannot starve the others.
+429 and 5xx responses are retried with exponential backoff and full jitter,
+honouring ``Retry-After``; each retry is also reported to the listener set
+for the calling context with ``set_retry_listener`` (``instrumentation``
+counts it against the model call). Each one halves the concurrency limit, and every
+success raises it again by about one per window of requests (AIMD). The
+OpenAI SDK's own retries are turned off so that only one layer retries.
+Timeouts are not retried: they are raised so the model router
+(``model_router``) can fail over to another model.
+
+``python rate_limiter.py`` runs a burst of calls against a local mock
+server that answers a share of requests with 429.
+"""
+
+import argparse
+import asyncio
+import contextvars
+import json
+import os
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Deque, Dict, Iterator, Optional
+
+import httpx
+
+RPM_LIMIT = float(os.environ.get("LLM_RPM_LIMIT", "500"))
+TPM_LIMIT = float(os.environ.get("LLM_TPM_LIMIT", "30000"))
+INITIAL_CONCURRENCY = float(os.environ.get("LLM_CONCURRENCY_START", "8"))
+MAX_CONCURRENCY = float(os.environ.get("LLM_CONCURRENCY_MAX", "32"))
+MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "5"))
+BACKOFF_BASE_SECONDS = float(os.environ.get("LLM_BACKOFF_BASE", "0.5"))
+BACKOFF_MAX_SECONDS = float(os.environ.get("LLM_BACKOFF_MAX", "30"))
+COMPLETION_TOKENS_ESTIMATE = int(os.environ.get("LLM_COMPLETION_TOKENS_ESTIMATE", "1000"))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Concurrent failures from one overload count as a single decrease
+DECREASE_COOLDOWN_SECONDS = 1.0
+# Waiters re-check the buckets at least this often
+MAX_POLL_SECONDS = 0.5
+
+_scope: contextvars.ContextVar[str] = contextvars.ContextVar("rate_limit_scope", default="default")
+_retry_listener: contextvars.ContextVar[Optional[Callable[[], None]]] = contextvars.ContextVar(
+    "rate_limit_retry_listener", default=None
+)
+
+
+def set_scope(scope: Optional[str]) -> None:
+    """Queue this context's requests under ``scope`` (a session id) for fair scheduling"""
+    _scope.set(scope or "default")
+
+
+def set_retry_listener(listener: Optional[Callable[[], None]]) -> None:
+    """Call ``listener()`` each time a request sent from this context is retried"""
+    _retry_listener.set(listener)
+
+
+class TokenBucket:
+    """Bucket that refills ``per_minute`` units a minute up to a one-minute burst"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until ``amount`` units are available; larger requests wait for a full bucket"""
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.level
+        return max(missing, 0) / self.rate
+
+    def take(self, amount: float) -> None:
+        self.level -= min(amount, self.capacity)
+
+
+class _Ticket:
+    def __init__(self, scope: str, tokens: int, loop: Optional[asyncio.AbstractEventLoop]):
+        self.scope = scope
+        self.tokens = tokens
+        self.enqueued = time.perf_counter()
+        self.granted = False
+        self.loop = loop
+        self.event = threading.Event() if loop is None else None
+        self.future = loop.create_future() if loop is not None else None
+
+    def wake(self) -> None:
+        if self.event is not None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(lambda: self.future.done() or self.future.set_result(None))
+
+
+class RateLimiter:
+    """Shared RPM/TPM budget with fair queuing across scopes and AIMD concurrency"""
+
+    def __init__(self, rpm: float = RPM_LIMIT, tpm: float = TPM_LIMIT,
+                 initial_concurrency: float = INITIAL_CONCURRENCY, max_concurrency: float = MAX_CONCURRENCY):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.concurrency = initial_concurrency
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.granted = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.retries = 0
+        self.throttled = 0
+        self.server_errors = 0
+        self._last_decrease = 0.0
+        self._queues: "OrderedDict[str, Deque[_Ticket]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _enqueue(self, tokens: int, loop: Optional[asyncio.AbstractEventLoop]) -> _Ticket:
+        ticket = _Ticket(_scope.get(), tokens, loop)
+        with self._lock:
+            self._queues.setdefault(ticket.scope, deque()).append(ticket)
+        return ticket
+
+    def _dispatch(self) -> Optional[float]:
+        """Grant queued requests round-robin across scopes while capacity lasts
+
+        Returns how long to wait before budget frees up, or ``None`` when only
+        a finished request can make room.
+        """
+        with self._lock:
+            while self._queues:
+                if self.in_flight >= int(self.concurrency):
+                    return None
+                scope, queue = next(iter(self._queues.items()))
+                ticket = queue[0]
+                now = time.monotonic()
+                delay = max(self.requests.wait_time(1, now), self.tokens.wait_time(ticket.tokens, now))
+                if delay > 0:
+                    return delay
+                self.requests.take(1)
+                self.tokens.take(ticket.tokens)
+                self.in_flight += 1
+                queue.popleft()
+                # The scope goes to the back of the rotation, or leaves it once empty
+                del self._queues[scope]
+                if queue:
+                    self._queues[scope] = queue
+                self._record_grant(ticket)
+                ticket.wake()
+            return None
+
+    def _record_grant(self, ticket: _Ticket) -> None:
+        ticket.granted = True
+        waited = time.perf_counter() - ticket.enqueued
+        self.granted += 1
+        self.wait_seconds += waited
+        self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+    def _cancel(self, ticket: _Ticket) -> None:
+        with self._lock:
+            queue = self._queues.get(ticket.scope)
+            if queue and ticket in queue:
+                queue.remove(ticket)
+                if not queue:
+                    del self._queues[ticket.scope]
+                return
+        if ticket.granted:
+            self.release()
+
+    def acquire(self, tokens: int) -> None:
+        """Block until the request may be sent"""
+        ticket = self._enqueue(tokens, None)
+        try:
+            while not ticket.granted:
+                delay = self._dispatch()
+                ticket.event.wait(min(delay, MAX_POLL_SECONDS) if delay else MAX_POLL_SECONDS)
+        except BaseException:
+            self._cancel(ticket)
+            raise
+
+    async def aacquire(self, tokens: int) -> None:
+        """Async counterpart of ``acquire``"""
+        ticket = self._enqueue(tokens, asyncio.get_running_loop())
+        try:
+            while not ticket.granted:
+                delay = self._dispatch()
+                try:
+                    await asyncio.wait_for(asyncio.shield(ticket.future),
+                                           min(delay, MAX_POLL_SECONDS) if delay else MAX_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            self._cancel(ticket)
+            raise
+
+    def release(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+        self._dispatch()
+
+    def count_retry(self) -> None:
+        with self._lock:
+            self.retries += 1
+        # The transports run in the context of the call that sent the request
+        listener = _retry_listener.get()
+        if listener is not None:
+            listener()
+
+    def record(self, status_code: Optional[int]) -> None:
+        """Adjust the concurrency limit from a response status (``None`` for a connection error)"""
+        with self._lock:
+            if status_code is not None and status_code < 400:
+                self.concurrency = min(self.max_concurrency, self.concurrency + 1 / self.concurrency)
+                return
+            if status_code == 429:
+                self.throttled += 1
+            elif status_code is None or status_code >= 500:
+                self.server_errors += 1
+            now = time.monotonic()
+            if now - self._last_decrease > DECREASE_COOLDOWN_SECONDS:
+                self._last_decrease = now
+                self.concurrency = max(1.0, self.concurrency / 2)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue, concurrency and retry counters"""
+        with self._lock:
+            return {
+                "queued": sum(len(queue) for queue in self._queues.values()),
+                "in_flight": self.in_flight,
+                "concurrency_limit": int(self.concurrency),
+                "granted": self.granted,
+                "queue_wait_seconds_total": self.wait_seconds,
+                "queue_wait_seconds_avg": self.wait_seconds / self.granted if self.granted else 0.0,
+                "queue_wait_seconds_max": self.max_wait_seconds,
+                "retries": self.retries,
+                "throttled": self.throttled,
+                "server_errors": self.server_errors,
+            }
+
+
+def estimate_tokens(request: httpx.Request) -> int:
+    """Rough token cost of a request: its body at ~4 bytes a token plus the completion budget"""
+    completion = COMPLETION_TOKENS_ESTIMATE
+    try:
+        body = json.loads(request.content or b"{}")
+        completion = body.get("max_completion_tokens") or body.get("max_tokens") or completion
+    except (ValueError, httpx.RequestNotRead):
+        pass
+    return len(request.content or b"") // 4 + completion
+
+
+def backoff_delay(attempt: int, response: Optional[httpx.Response] = None) -> float:
+    """Server-requested delay if there is one, else exponential backoff with full jitter"""
+    if response is not None:
+        retry_after_ms = response.headers.get("retry-after-ms")
+        retry_after = response.headers.get("retry-after")
+        try:
+            if retry_after_ms:
+                return min(float(retry_after_ms) / 1000, BACKOFF_MAX_SECONDS)
+            if retry_after:
+                return min(float(retry_after), BACKOFF_MAX_SECONDS)
+        except ValueError:
+            pass
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+
+class _ReleasingStream(httpx.SyncByteStream):
+    """Response body that frees the concurrency slot once it has been read or closed"""
+
+    def __init__(self, stream: httpx.SyncByteStream, release):
+        self._stream = stream
+        self._release = release
+
+    def __iter__(self) -> Iterator[bytes]:
+        yield from self._stream
+
+    def close(self) -> None:
+        try:
+            self._stream.close()
+        finally:
+            self._release()
+
+
+class _AsyncReleasingStream(httpx.AsyncByteStream):
+    def __init__(self, stream: httpx.AsyncByteStream, release):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            self._release()
+
+
+def _once(function):
+    called = threading.Lock()
+
+    def wrapper():
+        if called.acquire(blocking=False):
+            function()
+    return wrapper
+
+
+def _with_stream(response: httpx.Response, stream) -> httpx.Response:
+    return httpx.Response(status_code=response.status_code, headers=response.headers,
+                          stream=stream, extensions=response.extensions)
+
+
+class RateLimitedTransport(httpx.BaseTransport):
+    """httpx transport that sends each request through the rate limiter, retrying 429/5xx"""
+
+    def __init__(self, transport: httpx.BaseTransport, limiter: "RateLimiter", max_retries: int = MAX_RETRIES):
+        self._transport = transport
+        self._limiter = limiter
+        self._max_retries = max_retries
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        tokens = estimate_tokens(request)
+        for attempt in range(self._max_retries + 1):
+            self._limiter.acquire(tokens)
+            release = _once(self._limiter.release)
+            try:
+                response = self._transport.handle_request(request)
+            except httpx.TimeoutException:
+                # The call's own timeout ran out: not retried, so the model router can fail over
+                release()
+                raise
+            except httpx.TransportError:
+                release()
+                self._limiter.record(None)
+                if attempt == self._max_retries:
+                    raise
+                self._limiter.count_retry()
+                time.sleep(backoff_delay(attempt))
+                continue
+            self._limiter.record(response.status_code)
+            if response.status_code in RETRY_STATUSES and attempt < self._max_retries:
+                response.close()
+                release()
+                self._limiter.count_retry()
+                time.sleep(backoff_delay(attempt, response))
+                continue
+            return _with_stream(response, _ReleasingStream(response.stream, release))
+
+    def close(self) -> None:
+        self._transport.close()
+
+
+class AsyncRateLimitedTransport(httpx.AsyncBaseTransport):
+    """Async counterpart of ``RateLimitedTransport``"""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, limiter: "RateLimiter", max_retries: int = MAX_RETRIES):
+        self._transport = transport
+        self._limiter = limiter
+        self._max_retries = max_retries
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        tokens = estimate_tokens(request)
+        for attempt in range(self._max_retries + 1):
+            await self._limiter.aacquire(tokens)
+            release = _once(self._limiter.release)
+            try:
+                response = await self._transport.handle_async_request(request)
+            except httpx.TimeoutException:
+                release()
+                raise
+            except httpx.TransportError:
+                release()
+                self._limiter.record(None)
+                if attempt == self._max_retries:
+                    raise
+                self._limiter.count_retry()
+                await asyncio.sleep(backoff_delay(attempt))
+                continue
+            self._limiter.record(response.status_code)
+            if response.status_code in RETRY_STATUSES and attempt < self._max_retries:
+                await response.aclose()
+                release()
+                self._limiter.count_retry()
+                await asyncio.sleep(backoff_delay(attempt, response))
+                continue
+            return _with_stream(response, _AsyncReleasingStream(response.stream, release))
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+_limiter: Optional[RateLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Return the process-wide rate limiter, creating it on first use"""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter()
+        return _limiter
+
+
+def set_rate_limiter(limiter: RateLimiter) -> RateLimiter:
+    """Replace the process-wide rate limiter; clients built after this use it"""
+    global _limiter
+    with _limiter_lock:
+        _limiter = limiter
+        return _limiter
+
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    """Chat completions endpoint that throttles a share of requests, for exercising the limiter"""
+
+    throttle_rate = 0.3
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if random.random() < self.throttle_rate:
+            body = json.dumps({"error": {"message": "Rate limit reached", "type": "requests"}}).encode()
+            self.send_response(429)
+            self.send_header("Retry-After-Ms", "200")
+        else:
+            time.sleep(0.05)
+            body = json.dumps({
+                "id": "chatcmpl-mock", "object": "chat.completion", "created": int(time.time()), "model": "gpt-4o",
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "Mock response"}}],
+                "usage": {"prompt_tokens": 10, "completion_tokens": 2, "total_tokens": 12},
+            }).encode()
+            self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def mock_openai_server(throttle_rate: float = 0.3) -> Iterator[str]:
+    """Serve ``MockOpenAIHandler`` on a free local port and yield its base URL"""
+    handler = type("Handler", (MockOpenAIHandler,), {"throttle_rate": throttle_rate})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/v1"
+    finally:
+        server.shutdown()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a burst of calls through the rate limiter against a mock server")
+    parser.add_argument("--calls", type=int, default=40)
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument("--throttle-rate", type=float, default=0.3, help="Share of requests answered with 429")
+    parser.add_argument("--rpm", type=float, default=RPM_LIMIT)
+    parser.add_argument("--tpm", type=float, default=TPM_LIMIT)
+    args = parser.parse_args(argv)
+
+    from async_agents import gather_bounded
+    from instrumentation import agent_config
+    from llm_pool import get_chat_model
+    # Run as a script this file is __main__; the client pool uses the importable module
+    import rate_limiter
+
+    limiter = rate_limiter.set_rate_limiter(rate_limiter.RateLimiter(rpm=args.rpm, tpm=args.tpm))
+
+    async def call(index: int) -> bool:
+        rate_limiter.set_scope(f"session-{index % args.sessions}")
+        llm = get_chat_model("gpt-4o", temperature=0, api_key="sk-mock").model_copy(update={"cache": False})
+        try:
+            await llm.ainvoke(f"Request {index}", config=agent_config("mock"))
+            return True
+        except Exception:
+            return False
+
+    with rate_limiter.mock_openai_server(args.throttle_rate) as base_url:
+        os.environ["OPENAI_BASE_URL"] = base_url
+        started = time.perf_counter()
+        results = asyncio.run(gather_bounded((call(i) for i in range(args.calls)), args.calls))
+        elapsed = time.perf_counter() - started
+
+    stats = limiter.stats()
+    print(f"{sum(results)}/{args.calls} calls succeeded in {elapsed:.1f}s: {stats['throttled']} throttled, "
+          f"{stats['retries']} retries, concurrency limit {stats['concurrency_limit']}, "
+          f"queue wait avg {stats['queue_wait_seconds_avg'] * 1000:.0f} ms / max {stats['queue_wait_seconds_max'] * 1000:.0f} ms")
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
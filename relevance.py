@@ -0,0 +1,186 @@
+"""
+Local relevance scoring of resume text against a job description.
+
+``BM25Index`` indexes a list of documents (resume sections or bullets) in a
+sparse inverted index: for every term, the documents it occurs in and how
+often. Scoring a query only touches the postings of the query's terms, so
+it stays fast on large bullet sets. Document scores use Okapi BM25 with the
+usual ``k1``/``b`` parameters; each distinct query term counts with a weight
+of ``1 + log(count)``, since a job description repeats its key terms.
+
+``select_sections`` keeps the resume sections most relevant to a target
+role: every section scoring at least ``RELEVANCE_MIN_SHARE`` of the best
+score, and at least ``RELEVANCE_MIN_SECTIONS`` of them. The header (contact
+details) is always kept. ``focus_resume`` joins the kept sections for the
+prompts that only need the relevant part of the resume, and
+``job_summary`` trims the job description for those prompts.
+
+``python relevance.py --bullets 100000`` benchmarks index building and
+scoring on a synthetic bullet set.
+"""
+
+import argparse
+import heapq
+import math
+import os
+import random
+import re
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from resume_sections import Section, segment_resume
+
+MIN_SHARE = float(os.environ.get("RELEVANCE_MIN_SHARE", "0.3"))
+MIN_SECTIONS = int(os.environ.get("RELEVANCE_MIN_SECTIONS", "3"))
+JOB_SUMMARY_WORDS = int(os.environ.get("JOB_DESCRIPTION_MAX_WORDS", "250"))
+
+TERM = re.compile(r"[a-z0-9][a-z0-9+#]*(?:[.-][a-z0-9+#]+)*")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is", "it", "of", "on", "or",
+    "our", "that", "the", "their", "this", "to", "we", "will", "with", "you", "your", "who", "have",
+    "has", "was", "were", "all", "can", "using", "used", "work", "working", "team", "role", "experience",
+}
+
+
+def terms(text: str) -> List[str]:
+    """Lower-cased terms of ``text`` without stopwords"""
+    return [term for term in TERM.findall(text.lower()) if term not in STOPWORDS]
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed list of documents, stored as a sparse inverted index"""
+
+    def __init__(self, documents: Sequence[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.size = len(documents)
+        # term -> (document indexes, term frequencies)
+        self._postings: Dict[str, Tuple[List[int], List[int]]] = {}
+        self._lengths: List[int] = []
+        for index, document in enumerate(documents):
+            counts = Counter(terms(document))
+            self._lengths.append(sum(counts.values()))
+            for term, count in counts.items():
+                documents_of_term, frequencies = self._postings.setdefault(term, ([], []))
+                documents_of_term.append(index)
+                frequencies.append(count)
+        average = sum(self._lengths) / self.size if self.size else 0.0
+        # Per-document length normalization, computed once rather than per query term
+        self._norms = [k1 * (1 - b + b * length / average) if average else k1 for length in self._lengths]
+
+    def idf(self, term: str) -> float:
+        postings = self._postings.get(term)
+        frequency = len(postings[0]) if postings else 0
+        return math.log(1 + (self.size - frequency + 0.5) / (frequency + 0.5))
+
+    def scores(self, query: str) -> List[float]:
+        """BM25 score of every document for ``query``"""
+        scores = [0.0] * self.size
+        for term, count in Counter(terms(query)).items():
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            weight = self.idf(term) * (1 + math.log(count))
+            norms = self._norms
+            for index, frequency in zip(*postings):
+                scores[index] += weight * frequency * (self.k1 + 1) / (frequency + norms[index])
+        return scores
+
+    def top(self, query: str, count: int) -> List[Tuple[int, float]]:
+        """The ``count`` best (document index, score) pairs for ``query``, best first"""
+        scores = self.scores(query)
+        return heapq.nlargest(count, enumerate(scores), key=lambda item: item[1])
+
+
+class Selection(NamedTuple):
+    kept: List[Section]
+    dropped: List[Section]
+    scores: Dict[str, float]
+
+
+def select_sections(sections: List[Section], job_description: str, min_share: float = MIN_SHARE,
+                    min_sections: int = MIN_SECTIONS) -> Selection:
+    """Keep the sections most relevant to ``job_description``, in resume order"""
+    index = BM25Index([section.text for section in sections])
+    scores = index.scores(job_description)
+    best = max(scores, default=0.0)
+    if not best:
+        # Nothing in the resume matches the job description; keep it whole
+        return Selection(list(sections), [], {section.title: 0.0 for section in sections})
+    ranked = sorted(range(len(sections)), key=scores.__getitem__, reverse=True)
+    keep = {i for i in ranked if scores[i] >= min_share * best} | set(ranked[:min_sections])
+    keep |= {i for i, section in enumerate(sections) if section.title == "Header"}
+    return Selection(
+        [section for i, section in enumerate(sections) if i in keep],
+        [section for i, section in enumerate(sections) if i not in keep],
+        {section.title: score for section, score in zip(sections, scores)},
+    )
+
+
+def focus_resume(resume_content: str, job_description: Optional[str]) -> str:
+    """The resume with only the sections relevant to the target role, or the whole resume without one"""
+    if not job_description or not job_description.strip():
+        return resume_content
+    selection = select_sections(segment_resume(resume_content), job_description)
+    if not selection.dropped:
+        return resume_content
+    omitted = ", ".join(section.title for section in selection.dropped)
+    return "\n\n".join(section.text for section in selection.kept) + f"\n\n(Less relevant sections omitted: {omitted})"
+
+
+def focus_titles(resume_content: str, job_description: Optional[str]) -> Optional[List[str]]:
+    """Titles of the sections relevant to the target role, or None (all sections) without one"""
+    if not job_description or not job_description.strip():
+        return None
+    return [section.title for section in select_sections(segment_resume(resume_content), job_description).kept]
+
+
+def job_summary(job_description: str, max_words: int = JOB_SUMMARY_WORDS) -> str:
+    """The job description cut to ``max_words`` words"""
+    words = job_description.split()
+    if len(words) <= max_words:
+        return job_description.strip()
+    return " ".join(words[:max_words]) + " ..."
+
+
+def _synthetic_bullets(count: int, vocabulary: int, seed: int) -> Tuple[List[str], List[str]]:
+    rng = random.Random(seed)
+    # Zipf-like term frequencies, as in real text
+    words = [f"term{i}" for i in range(vocabulary)]
+    weights = [1 / (rank + 1) for rank in range(vocabulary)]
+    bullets = [" ".join(rng.choices(words, weights, k=rng.randint(8, 20))) for _ in range(count)]
+    queries = [" ".join(rng.choices(words, weights, k=150)) for _ in range(5)]
+    return bullets, queries
+
+
+def benchmark(bullets: int, vocabulary: int = 20000, seed: int = 0) -> Dict[str, float]:
+    """Time building the index over ``bullets`` synthetic bullets and scoring job-description-sized queries"""
+    documents, queries = _synthetic_bullets(bullets, vocabulary, seed)
+    started = time.perf_counter()
+    index = BM25Index(documents)
+    built = time.perf_counter()
+    for query in queries:
+        index.top(query, 20)
+    scored = time.perf_counter()
+    return {
+        "bullets": bullets,
+        "build_seconds": built - started,
+        "query_seconds": (scored - built) / len(queries),
+    }
+
+
+def main(argv: Optional[Iterable[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark BM25 relevance scoring on a synthetic bullet set")
+    parser.add_argument("--bullets", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--vocabulary", type=int, default=20000)
+    args = parser.parse_args(argv)
+    for count in args.bullets:
+        result = benchmark(count, args.vocabulary)
+        print(f"{result['bullets']:>8} bullets: index built in {result['build_seconds'] * 1000:8.1f} ms, "
+              f"{result['query_seconds'] * 1000:7.2f} ms per job description")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,63 +1,56 @@
-# Agent 3: Chat Interviewer
-class ChatInterviewer:
-    def __init__(self, resume_content, resume_analysis, interview_questions):
-        self.resume_content = resume_content
-        self.resume_analysis = resume_analysis
-        self.interview_questions = interview_questions
-        self.llm = create_llm(temperature=0.7)
-        self.system_prompt = f"""You are an AI interviewer named Alex conducting a friendly conversation to help improve the candidate's resume. 
-
-Here is their current resume:
-{resume_content}
-
-Here is an analysis of gaps and weaknesses in the resume:
-{resume_analysis}
-
-Here are some questions you should try to naturally incorporate into the conversation:
-{interview_questions}
-
-IMPORTANT INSTRUCTIONS:
-1. Be conversational and friendly, not robotic or interrogative
-2. Don't ask all questions at once - weave them naturally into the conversation
-3. Listen to the candidate's responses and ask meaningful follow-up questions
-4. Focus on extracting specific achievements, metrics, skills, and experiences
-5. Use the questions as a guide, but prioritize conversation flow
-6. Mirror and reflect the candidate's language and ideas back to them
-7. Your goal is to uncover valuable information missing from the resume
-8. Don't strictly follow the question list - be adaptable and responsive
-9. Keep responses concise and focused on one topic at a time
-
-Remember: This is a conversation to help enhance their resume, not a formal interview."""import os
+import os
+import sys
 import streamlit as st
-import tempfile
 from pathlib import Path
 import base64
 from typing import Dict, List, Any, Optional, Tuple
 import uuid
+import time
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
 
 # LangChain imports
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai import ChatOpenAI
-from langchain_community.document_loaders import PyPDFLoader, TextLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_core.output_parsers import StrOutputParser
 
-# LangGraph imports
-from langgraph.graph import END, StateGraph
-from langgraph.prebuilt import ToolNode
-import operator
+from async_agents import run_sync
+from llm_cache import cached_stream, get_llm_cache
+from llm_pool import get_llm_pool
+from model_router import get_agent_model, get_model_router
+from interview_context import DEFAULT_TOKEN_BUDGET, InterviewContext
+from workflow_loader import load_workflow_module
+from resume_ingestion import ResumeIngestionError, extract_resume_text
+from pdf_renderer import render_pdf
+from chunked_analysis import amap_sections, analysis_prompt, map_sections, needs_chunking, reduce_prompt
+from section_enhancement import aenhance_sections, averify_sections
+from resume_sections import segment_resume
+from instrumentation import agent_config, get_metrics, start_metrics_server
+from session_store import SessionTooLargeError, get_session_store
+from rate_limiter import get_rate_limiter, set_scope
+from stage_executor import PREFETCH, fingerprint, get_stage_executor, get_stage_registry
+from single_flight import get_single_flight
+from resume_index import (aupdate_analysis, aupdate_questions, get_resume_index, scope_key, update_analysis,
+                          update_questions)
+from heuristic_analysis import pre_analyze, prompt_notes, render_markdown
+from relevance import focus_resume, focus_titles, job_summary
 from pydantic import BaseModel, Field
 
+# Heavy dependencies load when their stage is first reached, not at start-up: the
+# LangGraph workflow with the first checkpoint, pypdf with the first PDF upload,
+# langchain_openai with the first model and reportlab with the first PDF download.
+# Run `python startup_profile.py` to check.
+
 # Configure page
 st.set_page_config(page_title="Resume Enhancement System", layout="wide")
 
 # State management using session state for better persistence
 if 'resume_content' not in st.session_state:
     st.session_state.resume_content = None
+if 'job_description' not in st.session_state:
+    st.session_state.job_description = ""
 if 'resume_analysis' not in st.session_state:
     st.session_state.resume_analysis = None
 if 'interview_questions' not in st.session_state:
@@ -74,6 +67,28 @@ if 'current_step' not in st.session_state:
     st.session_state.current_step = "upload"
 if 'api_key' not in st.session_state:
     st.session_state.api_key = None
+# Keep the session id in the URL so a reload reattaches to the checkpointed session
+if 'session_id' not in st.session_state:
+    # Only a session id from the URL can have earlier progress to restore
+    st.session_state.reattached = "sid" in st.query_params
+    st.session_state.session_id = st.query_params.get("sid") or uuid.uuid4().hex
+    st.query_params["sid"] = st.session_state.session_id
+
+# Pipeline state lives in the session store and completed stages also in the
+# LangGraph checkpoints (see ``load_workflow_module``), both keyed by session id,
+# so any process can serve a session
+session_store = get_session_store()
+
+# Per-agent metrics in Prometheus format on METRICS_PORT (once per process)
+start_metrics_server()
+get_metrics().register_collector("llm_cache", lambda: get_llm_cache().stats())
+get_metrics().register_collector("llm_pool", lambda: get_llm_pool().stats())
+get_metrics().register_collector("session_store", lambda: get_session_store().stats())
+get_metrics().register_collector("rate_limiter", lambda: get_rate_limiter().stats())
+get_metrics().register_collector("model_router", lambda: get_model_router().stats())
+get_metrics().register_collector("stages", lambda: get_stage_registry().stats())
+get_metrics().register_collector("single_flight", lambda: get_single_flight().stats())
+get_metrics().register_collector("resume_index", lambda: get_resume_index().stats())
 
 class AppState:
     def __init__(self):
@@ -82,6 +97,66 @@ class AppState:
 
 app_state = AppState()
 
+# Session persistence
+def persist(**values):
+    """Save part of the session's state (workflow state keys) to the session store"""
+    try:
+        session_store.update(st.session_state.session_id, values)
+    except SessionTooLargeError as e:
+        st.warning(f"Your latest progress could not be saved and will be lost on reload. {e}")
+
+def checkpoint(node, **values):
+    """Record a completed stage in the session store and the session's workflow checkpoint"""
+    persist(**values)
+    load_workflow_module().record_progress(st.session_state.session_id, node, values)
+
+def go_to(step):
+    """Move to ``step`` and remember it, so a reload or another process opens the same step"""
+    st.session_state.current_step = step
+    persist(current_step=step)
+
+def restore_session():
+    """Reload a session's state from the session store (or its checkpoint) in a new browser session"""
+    if st.session_state.get("restored") or st.session_state.resume_content:
+        return
+    st.session_state.restored = True
+    
+    # Sessions from before the session store only have their workflow checkpoint
+    values = session_store.load(st.session_state.session_id)
+    if not values and st.session_state.get("reattached"):
+        values = load_workflow_module().load_progress(st.session_state.session_id)
+    if not values.get("resume_content"):
+        return
+    
+    st.session_state.resume_content = values.get("resume_content")
+    st.session_state.job_description = values.get("job_description") or ""
+    st.session_state.resume_analysis = values.get("resume_analysis")
+    st.session_state.interview_questions = values.get("interview_questions")
+    st.session_state.interview_chat_history = values.get("chat_history") or []
+    st.session_state.interview_insights = values.get("interview_insights")
+    st.session_state.enhanced_resume = values.get("final_resume") or values.get("enhanced_resume")
+    st.session_state.verification_result = values.get("verification_result")
+    st.session_state.interviewer_state = values.get("interviewer")
+    st.session_state.section_revisions = values.get("section_revisions") or {}
+    
+    if values.get("current_step"):
+        st.session_state.current_step = values["current_step"]
+    elif st.session_state.verification_result:
+        st.session_state.current_step = "verification"
+    elif st.session_state.interview_insights:
+        st.session_state.current_step = "enhancement"
+    elif st.session_state.interview_questions:
+        st.session_state.current_step = "interview"
+    else:
+        st.session_state.current_step = "analysis"
+
+# Server cost tracking
+def record_cpu_time(scope, started):
+    """Keep the script-thread CPU time of recent runs of ``scope`` ("app" or "chat")"""
+    samples = st.session_state.setdefault("cpu_samples", {}).setdefault(scope, [])
+    samples.append((time.thread_time() - started) * 1000)
+    del samples[:-20]
+
 # UI functions
 def render_sidebar():
     st.sidebar.title("Resume Enhancement System")
@@ -107,117 +182,284 @@ def render_sidebar():
             st.sidebar.markdown(f"🔄 {step}")
         else:
             st.sidebar.markdown(f"⬜ {step}")
+    
+    # Response cache statistics
+    st.sidebar.markdown("---")
+    cache_stats = get_llm_cache().stats()
+    st.sidebar.caption(
+        f"Response cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+        f"({cache_stats['entries']} stored)"
+    )
+    flight_stats = get_single_flight().stats()
+    st.sidebar.caption(
+        f"In-progress calls shared: {flight_stats['coalesced']} "
+        f"({flight_stats['in_flight']} running now)"
+    )
+    pool_stats = get_llm_pool().stats()
+    st.sidebar.caption(
+        f"LLM clients: {pool_stats['clients']} pooled, "
+        f"{pool_stats['connection_reuse_rate']:.0%} of requests on reused connections"
+    )
+    for scope, samples in st.session_state.get("cpu_samples", {}).items():
+        median = sorted(samples)[len(samples) // 2]
+        st.sidebar.caption(f"Server CPU per {scope} run: {median:.1f} ms (median of last {len(samples)})")
+    
+    # Per-call timing for this session
+    if st.sidebar.toggle("Show agent timeline", key="show_timeline"):
+        timeline = get_metrics().session_timeline(st.session_state.session_id)
+        if timeline:
+            st.sidebar.dataframe(
+                [
+                    {
+                        "agent": event.get("agent") or event.get("node"),
+                        # The model that answered, which differs from the requested one after a failover
+                        "model": event.get("served_model") or event.get("model", ""),
+                        "failed": bool(event.get("error")),
+                        "seconds": round(event["duration"], 2),
+                        "ttft": round(event["ttft"], 2) if event.get("ttft") is not None else None,
+                        "tokens": event.get("prompt_tokens", 0) + event.get("completion_tokens", 0),
+                        "cost $": round(event.get("cost", 0.0), 4),
+                    }
+                    for event in timeline
+                ],
+                hide_index=True
+            )
+            total_cost = sum(event.get("cost", 0.0) for event in timeline)
+            st.sidebar.caption(f"Estimated session cost: ${total_cost:.4f}")
+        else:
+            st.sidebar.caption("No agent calls recorded yet")
 
 def create_download_link(content, filename, link_text):
     b64 = base64.b64encode(content.encode()).decode()
     return f'<a href="data:file/txt;base64,{b64}" download="{filename}">{link_text}</a>'
 
 def text_to_pdf(text, filename):
-    buffer = BytesIO()
-    c = canvas.Canvas(buffer, pagesize=letter)
-    width, height = letter
-    
-    # Set up text properties
-    c.setFont("Helvetica", 10)
-    y_position = height - 40
-    margin = 50
-    line_height = 14
-    
-    # Split text into lines
-    lines = text.split('\n')
-    
-    for line in lines:
-        # If line would go off page, start a new page
-        if y_position < margin:
-            c.showPage()
-            c.setFont("Helvetica", 10)
-            y_position = height - 40
-        
-        # Write the line
-        c.drawString(margin, y_position, line)
-        y_position -= line_height
-    
-    c.save()
-    pdf_content = buffer.getvalue()
-    buffer.close()
-    
-    return pdf_content
+    # Usually rendered in the background on the verification page; wrapped, markdown-aware
+    # layout, memoized by content so reruns don't re-render
+    return stages().claim("pdf", fingerprint(text)) or render_pdf(text)
 
 # LangChain agent definitions
-def create_llm(temperature=0):
-    """Create an LLM with the provided API key"""
+def create_llm(agent, temperature=0):
+    """Create the LLM routed to ``agent`` with the provided API key"""
     if not st.session_state.api_key:
         st.error("Please provide an OpenAI API key in the sidebar")
         st.stop()
     
-    return ChatOpenAI(
-        model="gpt-4o",
-        temperature=temperature,
-        api_key=st.session_state.api_key
-    )
+    # The model comes from the agent's tier in model_routing.json, with failover to its fallbacks;
+    # clients are shared process-wide so HTTP connections are reused across calls and sessions
+    return get_agent_model(agent, temperature=temperature, api_key=st.session_state.api_key)
+
+def run_config(agent):
+    """Run config that attributes a call's metrics to ``agent`` and this session
+
+    Also queues this thread's model requests under the session in the rate limiter.
+    """
+    set_scope(st.session_state.session_id)
+    return agent_config(agent, st.session_state.session_id)
+
+def run_prompt(llm, prompt, agent, stream=False):
+    """Run a prompt, returning the full text or a stream of text chunks"""
+    if stream:
+        return cached_stream(llm, prompt.format_messages(), config=run_config(agent))
+    
+    chain = prompt | llm | StrOutputParser()
+    return chain.invoke({}, config=run_config(agent))
+
+# Background stages: a stage starts as soon as its inputs are final, and its
+# result is picked up when the user reaches its page
+def stages():
+    """This session's stage executor"""
+    return get_stage_executor(st.session_state.session_id)
+
+def claim_stage(stage, inputs, message):
+    """The result of ``stage`` if it was started in the background for these inputs, else None"""
+    executor = stages()
+    if executor.pending(stage, inputs):
+        with st.spinner(message):
+            return executor.claim(stage, inputs)
+    return executor.claim(stage, inputs)
+
+# Near-duplicates of the same user's earlier resumes reuse their results
+def index_scope():
+    """This user's scope in the resume index; read on the script thread and passed on from there"""
+    return scope_key(st.session_state.api_key)
+
+def similar_resume(resume_content, field, scope):
+    """An earlier near-duplicate of this resume whose ``field`` can be updated rather than redone, or None"""
+    match = get_resume_index().find(resume_content, scope)
+    return match if match is not None and getattr(match, field) else None
+
+# Job-description-targeted mode: prompts get only the sections relevant to the target role
+def target_job_description():
+    """The session's target job description, or None; read on the script thread and passed on from there"""
+    return (st.session_state.get("job_description") or "").strip() or None
 
-# Agent 1: Resume Analyzer
-def analyze_resume(resume_content):
+def target_role_notes(job_description):
+    """The target role block for a prompt, or an empty string without one"""
+    if not job_description:
+        return ""
+    return f"The candidate is applying for this role:\n{job_summary(job_description)}\n\n"
+
+# Agent 1: Resume Analyzer (single-shot prompt: chunked_analysis.analysis_prompt)
+def analyze_resume(resume_content, stream=False):
     """Analyze resume for gaps and weaknesses"""
-    llm = create_llm(temperature=0)
+    llm = create_llm("analyzer", temperature=0)
     
-    prompt = ChatPromptTemplate.from_messages([
-        SystemMessage(content="""You are a professional resume analyzer. Your task is to:
-1. Analyze the resume in detail
-2. Identify gaps, weaknesses, and areas for improvement
-3. Note any missing information that would strengthen the resume
-4. Evaluate the resume's structure, format, and content
-5. Suggest specific improvements
-
-Be thorough in your analysis. Format your response with clear sections and bullet points."""),
-        HumanMessage(content=f"Here is the resume to analyze:\n\n{resume_content}")
-    ])
+    # A near-duplicate was analyzed before: its analysis is edited to the changed lines, which
+    # comes back as one structured answer rather than a stream
+    match = similar_resume(resume_content, "resume_analysis", index_scope())
+    st.session_state.analysis_match = match.similarity if match is not None else None
+    if match is not None:
+        analysis = update_analysis(llm, match, resume_content, config=run_config("analyzer"))
+        return iter([analysis]) if stream else analysis
     
-    chain = prompt | llm | StrOutputParser()
-    return chain.invoke({})
+    # Long CVs: analyze sections concurrently, then stream a short merge of the partial analyses
+    if needs_chunking(resume_content):
+        with st.spinner("Analyzing the resume section by section..."):
+            mapped = map_sections(llm, resume_content, config=run_config("analyzer"))
+        st.session_state.analysis_timing = mapped
+        return run_prompt(llm, reduce_prompt(resume_content, mapped["partial_analyses"]), "analyzer", stream)
+    
+    return run_prompt(llm, analysis_prompt(resume_content), "analyzer", stream)
+
+async def aanalyze_resume(llm, resume_content, config, scope=None):
+    """Analyze a resume without streaming
+
+    Returns the analysis with the map timing for long CVs, or the similarity of
+    the near-duplicate (of the same ``scope``) whose analysis was updated.
+    """
+    match = similar_resume(resume_content, "resume_analysis", scope)
+    if match is not None:
+        return {"resume_analysis": await aupdate_analysis(llm, match, resume_content, config=config),
+                "analysis_timing": None, "analysis_match": match.similarity}
+    if needs_chunking(resume_content):
+        mapped = await amap_sections(llm, resume_content, config=config)
+        chain = reduce_prompt(resume_content, mapped["partial_analyses"]) | llm | StrOutputParser()
+        return {"resume_analysis": await chain.ainvoke({}, config=config), "analysis_timing": mapped,
+                "analysis_match": None}
+    chain = analysis_prompt(resume_content) | llm | StrOutputParser()
+    return {"resume_analysis": await chain.ainvoke({}, config=config), "analysis_timing": None, "analysis_match": None}
 
 # Agent 2: Interview Question Generator
-def generate_interview_questions(resume_content, resume_analysis):
-    """Generate interview questions based on resume analysis"""
-    llm = create_llm(temperature=0.2)
-    
-    prompt = ChatPromptTemplate.from_messages([
+def questions_prompt(resume_content, resume_analysis, job_description=None):
+    return ChatPromptTemplate.from_messages([
         SystemMessage(content="""You are an expert interview question generator. Your task is to:
 1. Create 8-10 thoughtful interview questions based on the resume and its analysis
 2. Focus questions on areas that need clarification or expansion
 3. Include questions about missing information identified in the analysis
 4. Design questions that will help extract the candidate's accomplishments and skills not fully represented in the resume
 5. Format each question with clear numbering
+6. Where the automated checks list bullets without numbers or gaps between roles, ask for the missing figures or what happened in the gap
+7. If a target role is given, focus on the experience and skills that role asks for
 
 The questions should be conversational and help the interviewer gather valuable information to enhance the resume."""),
-        HumanMessage(content=f"""Here is the resume:
-{resume_content}
+        HumanMessage(content=f"""{target_role_notes(job_description)}Here is the resume:
+{focus_resume(resume_content, job_description)}
 
 Here is the analysis of the resume:
 {resume_analysis}
 
+{prompt_notes(pre_analyze(resume_content))}
+
 Based on this information, generate interview questions to help fill gaps and strengthen the resume.""")
     ])
+
+def questions_match(resume_content, job_description, scope):
+    """The near-duplicate whose questions can be updated, or None"""
+    # Indexed questions were written without a target role
+    return None if job_description else similar_resume(resume_content, "interview_questions", scope)
+
+def generate_interview_questions(resume_content, resume_analysis, stream=False, job_description=None):
+    """Generate interview questions based on resume analysis"""
+    llm = create_llm("question_generator", temperature=0.2)
     
-    chain = prompt | llm | StrOutputParser()
-    return chain.invoke({})
+    # A near-duplicate's questions are edited to the changed lines instead
+    match = questions_match(resume_content, job_description, index_scope())
+    st.session_state.questions_match = match.similarity if match is not None else None
+    if match is not None:
+        questions = update_questions(llm, match, resume_content, config=run_config("question_generator"))
+        return iter([questions]) if stream else questions
+    prompt = questions_prompt(resume_content, resume_analysis, job_description)
+    return run_prompt(llm, prompt, "question_generator", stream)
+
+async def agenerate_interview_questions(llm, resume_content, resume_analysis, config, job_description=None,
+                                        scope=None):
+    """Write the questions without streaming; returns them with the similarity of the near-duplicate used"""
+    match = questions_match(resume_content, job_description, scope)
+    if match is not None:
+        return {"interview_questions": await aupdate_questions(llm, match, resume_content, config=config),
+                "questions_match": match.similarity}
+    chain = questions_prompt(resume_content, resume_analysis, job_description) | llm | StrOutputParser()
+    return {"interview_questions": await chain.ainvoke({}, config=config), "questions_match": None}
 
 # Agent 3: Chat Interviewer
+DEFAULT_GREETING = "Hi there! I'm Alex, and I'll be chatting with you today to help enhance your resume. I've reviewed your current resume and noticed some areas we could expand on. Let's have a conversation about your experience and skills to gather more details. How does that sound?"
+
+def greeting_prompt(resume_content, resume_analysis):
+    return ChatPromptTemplate.from_messages([
+        SystemMessage(content="""You are an AI interviewer named Alex about to start a friendly conversation to help improve the candidate's resume. Write your opening message:
+1. Introduce yourself briefly
+2. Mention one or two specific things from their resume you would like to hear more about
+3. Ask whether they are ready to begin
+
+Keep it to three or four sentences."""),
+        HumanMessage(content=f"""Here is their resume:
+{resume_content}
+
+Here is the analysis of the resume:
+{resume_analysis}""")
+    ])
+
+async def awrite_greeting(llm, resume_content, resume_analysis, config):
+    chain = greeting_prompt(resume_content, resume_analysis) | llm | StrOutputParser()
+    return await chain.ainvoke({}, config=config)
+
+def start_greeting(resume_content, resume_analysis):
+    """Start writing a personalized opening message for the interview in the background
+
+    Runs on the agent event loop, so it is written while the questions stream.
+    """
+    # The config is built here, on the script thread, since the event loop cannot read st.session_state
+    stages().start(
+        "greeting", fingerprint(resume_content, resume_analysis), awrite_greeting,
+        create_llm("interviewer", temperature=0.7), resume_content, resume_analysis, run_config("interviewer")
+    )
+
+def opening_message():
+    """The personalized greeting if it was written successfully, else the standard one"""
+    inputs = fingerprint(st.session_state.resume_content, st.session_state.resume_analysis)
+    return claim_stage("greeting", inputs, "Preparing the interview...") or DEFAULT_GREETING
+
 class ChatInterviewer:
-    def __init__(self, resume_content, resume_analysis, interview_questions):
+    def __init__(self, resume_content, resume_analysis, interview_questions, token_budget=DEFAULT_TOKEN_BUDGET,
+                 context_state=None):
         self.resume_content = resume_content
         self.resume_analysis = resume_analysis
         self.interview_questions = interview_questions
-        self.llm = create_llm(temperature=0.7)
-        self.system_prompt = f"""You are an AI interviewer named Alex conducting a friendly conversation to help improve the candidate's resume. 
+        self.llm = create_llm("interviewer", temperature=0.7)
+        self.config = run_config("interviewer")
+        # Keeps each turn's prompt within the token budget by trimming covered
+        # items and summarizing older turns
+        self.context = InterviewContext(
+            resume_analysis, interview_questions,
+            summarizer=create_llm("interview_summarizer", temperature=0),
+            token_budget=token_budget,
+            summarizer_config=run_config("interview_summarizer")
+        )
+        if context_state:
+            self.context.restore(context_state)
+    
+    def render_system_prompt(self, resume_analysis, interview_questions, memory):
+        """Render the interviewer system prompt from the items still open"""
+        system_prompt = f"""You are an AI interviewer named Alex conducting a friendly conversation to help improve the candidate's resume. 
 
 Here is their current resume:
-{resume_content}
+{self.resume_content}
 
-Here is an analysis of gaps and weaknesses in the resume:
+Here is an analysis of the gaps and weaknesses in the resume that are still open:
 {resume_analysis}
 
-Here are some questions you should try to naturally incorporate into the conversation:
+Here are the questions you have not covered yet; try to naturally incorporate them into the conversation:
 {interview_questions}
 
 IMPORTANT INSTRUCTIONS:
@@ -232,24 +474,47 @@ IMPORTANT INSTRUCTIONS:
 9. Keep responses concise and focused on one topic at a time
 
 Remember: This is a conversation to help enhance their resume, not a formal interview."""
+        
+        if memory:
+            system_prompt += f"""
+
+Summary of the earlier part of the conversation (the most recent turns follow as messages):
+{memory}"""
+        return system_prompt
     
-    def get_response(self, message_history):
+    @property
+    def last_prompt_tokens(self):
+        return self.context.last_prompt_tokens
+    
+    def get_response(self, message_history, stream=False):
         """Get a response from the chat interviewer based on conversation history"""
-        messages = [SystemMessage(content=self.system_prompt)]
+        messages = self.context.build_messages(self.render_system_prompt, message_history)
         
-        for msg in message_history:
-            if msg["role"] == "user":
-                messages.append(HumanMessage(content=msg["content"]))
-            else:
-                messages.append(AIMessage(content=msg["content"]))
+        if stream:
+            return cached_stream(self.llm, messages, config=self.config)
         
-        response = self.llm.invoke(messages)
+        response = self.llm.invoke(messages, config=self.config)
         return response.content
+    
+    async def aget_response(self, message_history):
+        """Async counterpart of ``get_response`` without streaming"""
+        messages = await self.context.abuild_messages(self.render_system_prompt, message_history)
+        response = await self.llm.ainvoke(messages, config=self.config)
+        return response.content
+
+def build_interviewer():
+    """Rebuild the interviewer from the session's stored state; it is not kept between runs"""
+    return ChatInterviewer(
+        st.session_state.resume_content,
+        st.session_state.resume_analysis,
+        st.session_state.interview_questions,
+        context_state=st.session_state.get("interviewer_state")
+    )
 
 # Agent 4: Insights Generator
-def generate_insights(resume_content, chat_history):
+def generate_insights(resume_content, chat_history, stream=False):
     """Extract insights from interview chat to enhance resume"""
-    llm = create_llm(temperature=0.1)
+    llm = create_llm("insights", temperature=0.1)
     
     # Format chat history for the prompt
     formatted_chat = "\n".join([f"{'User' if msg['role'] == 'user' else 'Interviewer'}: {msg['content']}" for msg in chat_history])
@@ -273,132 +538,383 @@ Here is the interview conversation:
 Based on this conversation, extract valuable insights that could enhance the resume.""")
     ])
     
-    chain = prompt | llm | StrOutputParser()
-    return chain.invoke({})
+    return run_prompt(llm, prompt, "insights", stream)
 
-# Agent 5: Resume Enhancer
-def enhance_resume(original_resume, insights):
-    """Create an enhanced resume based on original and insights"""
-    llm = create_llm(temperature=0.2)
+INSIGHT_CATEGORIES = {
+    "skills": "Skills",
+    "achievements": "Achievements",
+    "experience": "Experience",
+    "education": "Education",
+    "other": "Additional Context",
+}
+
+class InsightItems(BaseModel):
+    """New resume insights found in a single interview exchange"""
+    skills: List[str] = Field(default_factory=list, description="Skills, tools and technologies the candidate mentioned")
+    achievements: List[str] = Field(default_factory=list, description="Specific achievements, ideally with metrics")
+    experience: List[str] = Field(default_factory=list, description="Responsibilities, projects and roles not fully covered by the resume")
+    education: List[str] = Field(default_factory=list, description="Education, certifications and training")
+    other: List[str] = Field(default_factory=list, description="Clarifications or other context about resume items")
+
+def extract_exchange_insights(llm, resume_content, current_insights, exchange, config=None):
+    """Extract only the insights that a single interview exchange adds to the running set"""
+    formatted_exchange = "\n".join([f"{'User' if msg['role'] == 'user' else 'Interviewer'}: {msg['content']}" for msg in exchange])
     
     prompt = ChatPromptTemplate.from_messages([
-        SystemMessage(content="""You are a professional resume writer. Your task is to:
-1. Create an enhanced version of the resume incorporating the insights from the interview
-2. Maintain the original resume's structure but improve it where needed
-3. Add specific achievements, metrics, and experiences from the insights
-4. Strengthen the language and impact of bullet points
-5. Ensure the resume remains factual and truthful - don't invent information
-6. Keep the resume concise and professional
-7. Focus on quantifiable achievements and specific skills
-
-Output the complete enhanced resume in a clean, professional format."""),
+        SystemMessage(content="""You are an expert at extracting valuable insights from interviews to enhance resumes. Your task is to:
+1. Read the latest exchange between the interviewer and the candidate
+2. Identify specific achievements, skills, experiences, and metrics mentioned in it
+3. Note any clarifications or additional context provided about resume items
+4. Only return insights that are NOT already in the insights gathered so far
+5. Keep each insight to one concise, factual line
+
+Return empty lists if the exchange adds nothing new."""),
         HumanMessage(content=f"""Here is the original resume:
-{original_resume}
+{resume_content}
 
-Here are the insights from the interview to incorporate:
-{insights}
+Here are the insights gathered so far:
+{current_insights or "None yet."}
 
-Create an enhanced version of the resume that incorporates these insights.""")
+Here is the latest exchange:
+{formatted_exchange}""")
     ])
     
-    chain = prompt | llm | StrOutputParser()
-    return chain.invoke({})
+    chain = prompt | llm.with_structured_output(InsightItems)
+    return chain.invoke({}, config=config)
+
+class IncrementalInsights:
+    """Maintain interview insights in the background, one exchange at a time"""
+    def __init__(self, resume_content):
+        self.resume_content = resume_content
+        # Build the LLM here, on the script thread, since the worker cannot read st.session_state
+        self.llm = create_llm("insight_tracker", temperature=0.1)
+        self.config = run_config("insight_tracker")
+        self.insights = {category: [] for category in INSIGHT_CATEGORIES}
+        self._lock = threading.Lock()
+        # A single worker folds exchanges in the order they happened
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="insights")
+        self._pending = []
+    
+    def submit(self, exchange):
+        """Queue an interviewer/candidate exchange to be folded into the insights"""
+        self._pending = [future for future in self._pending if not future.done()]
+        # Run in the script thread's context so the request keeps its rate limiter scope
+        self._pending.append(self._executor.submit(contextvars.copy_context().run, self._fold, list(exchange)))
+    
+    def _fold(self, exchange):
+        items = extract_exchange_insights(self.llm, self.resume_content, self.to_markdown(), exchange, self.config)
+        with self._lock:
+            for category in INSIGHT_CATEGORIES:
+                known = {item.lower() for item in self.insights[category]}
+                for item in getattr(items, category):
+                    if item.strip() and item.lower() not in known:
+                        self.insights[category].append(item.strip())
+                        known.add(item.lower())
+    
+    def to_markdown(self):
+        """Render the current insights as categorized bullet points"""
+        with self._lock:
+            sections = [
+                f"#### {title}\n" + "\n".join(f"- {item}" for item in self.insights[category])
+                for category, title in INSIGHT_CATEGORIES.items()
+                if self.insights[category]
+            ]
+        return "\n\n".join(sections)
+    
+    def result(self):
+        """Wait for queued exchanges to be folded in and return the insights"""
+        for future in self._pending:
+            future.result()
+        self._pending = []
+        return self.to_markdown()
+    
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+# Agent 5: Resume Enhancer
+def enhance_resume(original_resume, insights, revisions=None, job_description=None):
+    """Create an enhanced resume based on original and insights, one section at a time"""
+    llm = create_llm("enhancer", temperature=0.2)
+    
+    # Sections whose text, insights and requested revision are unchanged come from the section cache;
+    # the rest are enhanced concurrently on the agent event loop. With a target role, only the
+    # sections relevant to it are rewritten.
+    return run_sync(aenhance_sections(
+        llm, original_resume, insights, revisions, config=run_config("enhancer"), job_description=job_description
+    ))
 
 # Agent 6: Fact Checker
-def verify_resume(original_resume, enhanced_resume):
-    """Verify the enhanced resume for accuracy"""
-    llm = create_llm(temperature=0)
+def verify_resume(original_resume, enhanced_resume, chat_history=None):
+    """Verify the claims the enhanced resume adds to the original and the interview"""
+    llm = create_llm("fact_checker", temperature=0)
     
-    prompt = ChatPromptTemplate.from_messages([
-        SystemMessage(content="""You are a resume fact checker and accuracy verifier. Your task is to:
-1. Compare the original and enhanced resumes carefully
-2. Identify any potential inaccuracies, exaggerations, or fabrications in the enhanced resume
-3. Verify that all information in the enhanced resume is factually supported by either the original resume or could be reasonably inferred
-4. If you find issues, provide corrections that maintain the improved quality while ensuring accuracy
-5. If no issues are found, confirm the enhanced resume's accuracy
-
-Be thorough in your verification. The final resume must be both improved AND accurate."""),
-        HumanMessage(content=f"""Here is the original resume:
-{original_resume}
+    # Claims already backed by the original resume or the interview are checked locally and
+    # only lines with new claims go to the model; unchanged sections are not re-checked
+    return run_sync(averify_sections(
+        llm, original_resume, enhanced_resume, chat_history or [], config=run_config("fact_checker")
+    ))
 
-Here is the enhanced resume:
-{enhanced_resume}
+def finish_verification(verification):
+    """Store a verification result and checkpoint the final resume"""
+    st.session_state.enhanced_resume = verification["final_resume"]
+    st.session_state.verification_result = verification["verification_result"]
+    st.session_state.verification_tokens = (verification["prompt_tokens"], verification["full_prompt_tokens"])
+    checkpoint(
+        "verify_resume",
+        verification_result=st.session_state.verification_result,
+        final_resume=st.session_state.enhanced_resume
+    )
 
-Please verify the enhanced resume for accuracy and provide a corrected version if needed.""")
-    ])
+# Speculative prefetch of the next stage
+async def aprefetch_analysis(executor, resume_content, job_description, scope, analyzer, questioner, greeter):
+    """Analyze the resume, then start the questions and the greeting, which only need the analysis"""
+    analysis = await aanalyze_resume(analyzer[0], resume_content, analyzer[1], scope)
+    resume_analysis = analysis["resume_analysis"]
+    executor.start("questions", fingerprint(resume_content, resume_analysis, job_description),
+                   agenerate_interview_questions, questioner[0], resume_content, resume_analysis, questioner[1],
+                   job_description, scope)
+    executor.start("greeting", fingerprint(resume_content, resume_analysis), awrite_greeting,
+                   greeter[0], resume_content, resume_analysis, greeter[1])
+    return analysis
+
+def prefetch_analysis(resume_content, job_description):
+    """Start analyzing an uploaded resume before "Start Analysis" is clicked"""
+    if not PREFETCH:
+        return
+    # Models and configs are built here, on the script thread, for the whole chain. The analysis
+    # does not depend on the target role; questions prefetched for another one are not claimed.
+    stages().start(
+        "analysis", fingerprint(resume_content), aprefetch_analysis, stages(), resume_content, job_description,
+        index_scope(),
+        (create_llm("analyzer", temperature=0), run_config("analyzer")),
+        (create_llm("question_generator", temperature=0.2), run_config("question_generator")),
+        (create_llm("interviewer", temperature=0.7), run_config("interviewer"))
+    )
+
+def prefetch_verification(original_resume, enhanced_resume, chat_history):
+    """Start verifying the enhanced draft before "Continue to Verification" is clicked"""
+    if not PREFETCH:
+        return
+    stages().start(
+        "verification", fingerprint(original_resume, enhanced_resume, chat_history), averify_sections,
+        create_llm("fact_checker", temperature=0), original_resume, enhanced_resume, chat_history,
+        run_config("fact_checker")
+    )
+
+def prefetch_pdf(final_resume):
+    """Render the final resume's PDF on the stage thread pool before the download page asks for it"""
+    if PREFETCH:
+        stages().start("pdf", fingerprint(final_resume), render_pdf, final_resume)
+
+@st.fragment
+def render_interview_chat():
+    """Chat area of the interview step
+
+    Runs as a fragment, so sending a message reruns only this function instead
+    of the whole script (sidebar, step routing and the other page elements).
+    """
+    started = time.thread_time()
     
-    chain = prompt | llm | StrOutputParser()
-    return chain.invoke({})
+    # Display chat history
+    for message in st.session_state.interview_chat_history:
+        if message["role"] == "user":
+            st.chat_message("user").write(message["content"])
+        else:
+            st.chat_message("assistant").write(message["content"])
+    
+    # Chat input
+    user_input = st.chat_input("Type your message here...")
+    if user_input:
+        # Add user message to chat history
+        st.session_state.interview_chat_history.append({"role": "user", "content": user_input})
+        st.chat_message("user").write(user_input)
+        
+        # Fold the question and answer into the insights while the interviewer replies
+        st.session_state.insight_tracker.submit(st.session_state.interview_chat_history[-2:])
+        
+        # Stream the response from the interviewer
+        interviewer = build_interviewer()
+        with st.chat_message("assistant"):
+            response = st.write_stream(
+                interviewer.get_response(st.session_state.interview_chat_history, stream=True)
+            )
+        
+        # Add assistant response to chat history; it is already on screen, so no rerun is needed
+        st.session_state.interview_chat_history.append({"role": "assistant", "content": response})
+        st.session_state.interviewer_state = interviewer.context.snapshot()
+        # The interview is still in progress, so only the session store is updated; the
+        # graph checkpoint gets the transcript once the interview is finished
+        persist(chat_history=st.session_state.interview_chat_history, interviewer=st.session_state.interviewer_state)
+    
+    last_prompt_tokens = (st.session_state.get("interviewer_state") or {}).get("prompt_tokens")
+    if last_prompt_tokens:
+        st.caption(f"Last interviewer prompt: {last_prompt_tokens[-1]} tokens")
+    
+    record_cpu_time("chat", started)
+    
+    # Finish interview button
+    col1, col2, col3 = st.columns([1, 1, 1])
+    with col2:
+        if len(st.session_state.interview_chat_history) > 3:  # At least 2 user responses
+            if st.button("Finish Interview", key="finish_interview"):
+                checkpoint("conduct_interview", chat_history=st.session_state.interview_chat_history)
+                go_to("enhancement")
+                # Leaving the step needs a full app rerun, not just the fragment
+                st.rerun(scope="app")
 
 # Streamlit UI
+def rate_limit_errors():
+    """The OpenAI rate limit error, once the SDK is loaded; nothing can raise it before"""
+    openai = sys.modules.get("openai")
+    return (openai.RateLimitError,) if openai else ()
+
 def main():
+    started = time.thread_time()
+    try:
+        render_app()
+    except rate_limit_errors():
+        # Raised only once the rate limiter's retries are used up
+        st.error("The language model is overloaded right now. Please wait a minute and try again.")
+    finally:
+        # st.rerun() and st.stop() end a run by raising, so record in a finally block
+        record_cpu_time("app", started)
+
+def render_app():
+    restore_session()
     render_sidebar()
     
     # Upload step
-    if app_state.current_step == "upload":
+    if st.session_state.current_step == "upload":
         st.title("Resume Enhancement System")
         st.markdown("### Upload your resume to get started")
         st.markdown("This system will analyze your resume, conduct an interview, and create an enhanced version.")
         
+        # Optional: the questions, insights and enhancement then focus on the sections relevant to this role
+        st.session_state.job_description = st.text_area(
+            "Target job description (optional)", value=st.session_state.job_description,
+            help="Paste the posting you are applying for to focus the interview and the rewrite on it."
+        )
+        
         uploaded_file = st.file_uploader("Upload your resume (PDF or TXT)", type=["pdf", "txt"])
         
-        if uploaded_file is not None and app_state.api_key:
+        if uploaded_file is not None and st.session_state.api_key:
             # Process the uploaded file
-            with st.spinner("Processing your resume..."):
-                file_extension = uploaded_file.name.split(".")[-1].lower()
+            file_extension = uploaded_file.name.split(".")[-1].lower()
+            
+            try:
+                # Parsed straight from the upload buffer; reruns and repeat uploads
+                # of the same file are served from the extraction cache
+                with st.spinner("Processing your resume..."):
+                    st.session_state.resume_content = extract_resume_text(uploaded_file, file_extension)
+                # The rule-based checks take milliseconds and are shown right away
+                report = pre_analyze(st.session_state.resume_content)
+                st.caption(f"Quick checks: {len(report.findings)} findings in {report.seconds * 1000:.0f} ms")
+                with st.expander("Show quick checks"):
+                    st.markdown(render_markdown(report))
+                # The analysis only needs the text, so it starts while the user looks at the page
+                prefetch_analysis(st.session_state.resume_content, target_job_description())
                 
-                # Create a temporary file
-                with tempfile.NamedTemporaryFile(delete=False, suffix=f'.{file_extension}') as tmp_file:
-                    tmp_file.write(uploaded_file.getbuffer())
-                    file_path = tmp_file.name
+                # Add a button to proceed
+                if st.button("Start Analysis"):
+                    # Move to the next step
+                    persist(
+                        resume_content=st.session_state.resume_content,
+                        job_description=st.session_state.job_description
+                    )
+                    go_to("analysis")
+                    st.rerun()
                 
-                try:
-                    # Load the document based on file type
-                    if file_extension == "pdf":
-                        loader = PyPDFLoader(file_path)
-                        pages = loader.load()
-                        app_state.resume_content = "\n".join([page.page_content for page in pages])
-                    else:  # txt
-                        loader = TextLoader(file_path)
-                        documents = loader.load()
-                        app_state.resume_content = documents[0].page_content
-                    
-                    # Clean up the temporary file
-                    os.unlink(file_path)
-                    
-                    # Add a button to proceed
-                    if st.button("Start Analysis"):
-                        # Move to the next step
-                        app_state.current_step = "analysis"
-                        st.rerun()
-                    
-                except Exception as e:
-                    st.error(f"Error processing file: {str(e)}")
-        elif uploaded_file is not None and not app_state.api_key:
+            except ResumeIngestionError as e:
+                st.error(str(e))
+            except Exception as e:
+                st.error(f"Error processing file: {str(e)}")
+        elif uploaded_file is not None and not st.session_state.api_key:
             st.warning("Please enter your OpenAI API key in the sidebar before proceeding.")
     
     # Analysis step
     elif st.session_state.current_step == "analysis":
         st.title("Resume Analysis")
         
-        if not st.session_state.resume_analysis:
-            with st.spinner("Analyzing your resume..."):
-                st.session_state.resume_analysis = analyze_resume(st.session_state.resume_content)
+        # Rendered before the model analysis, which the checks' findings are also passed to
+        st.markdown("### Quick Checks")
+        st.markdown(render_markdown(pre_analyze(st.session_state.resume_content)))
         
         st.markdown("### Resume Analysis")
-        st.markdown(st.session_state.resume_analysis)
-        
-        if not st.session_state.interview_questions:
-            with st.spinner("Generating interview questions..."):
-                st.session_state.interview_questions = generate_interview_questions(
-                    st.session_state.resume_content, st.session_state.resume_analysis
+        if not st.session_state.resume_analysis:
+            # Usually started on upload; streamed here if it was not
+            prefetched = claim_stage("analysis", fingerprint(st.session_state.resume_content), "Finishing the analysis...")
+            if prefetched:
+                st.session_state.resume_analysis = prefetched["resume_analysis"]
+                st.session_state.analysis_timing = prefetched["analysis_timing"]
+                st.session_state.analysis_match = prefetched["analysis_match"]
+                st.markdown(st.session_state.resume_analysis)
+            else:
+                st.session_state.resume_analysis = st.write_stream(
+                    analyze_resume(st.session_state.resume_content, stream=True)
+                )
+            checkpoint(
+                "analyze_resume",
+                resume_content=st.session_state.resume_content,
+                resume_analysis=st.session_state.resume_analysis
+            )
+            # Updates of a near-duplicate's analysis are not indexed, so updates never build on updates
+            if not st.session_state.get("analysis_match"):
+                get_resume_index().add(
+                    st.session_state.resume_content, index_scope(), resume_analysis=st.session_state.resume_analysis
                 )
+        else:
+            st.markdown(st.session_state.resume_analysis)
+        
+        if st.session_state.get("analysis_match"):
+            st.caption(
+                f"Updated from the analysis of an earlier resume that is "
+                f"{st.session_state.analysis_match:.0%} the same"
+            )
+        
+        if st.session_state.get("analysis_timing"):
+            timing = st.session_state.analysis_timing
+            st.caption(
+                f"Analyzed in {timing['chunks']} parts concurrently: {timing['wall_seconds']:.1f}s "
+                f"(sum of part latencies: {timing['summed_call_seconds']:.1f}s)"
+            )
         
         st.markdown("### Interview Questions")
-        st.markdown(st.session_state.interview_questions)
+        job_description = target_job_description()
+        focus = focus_titles(st.session_state.resume_content, job_description)
+        if focus is not None:
+            total = len(segment_resume(st.session_state.resume_content))
+            st.caption(f"Targeting the job description: {len(focus)} of {total} sections are relevant to it")
+        if not st.session_state.interview_questions:
+            # The opening message only needs the analysis, so it is written while the questions stream
+            # (or was already started after the prefetched analysis)
+            start_greeting(st.session_state.resume_content, st.session_state.resume_analysis)
+            prefetched = claim_stage(
+                "questions",
+                fingerprint(st.session_state.resume_content, st.session_state.resume_analysis, job_description),
+                "Writing interview questions..."
+            )
+            if prefetched:
+                st.session_state.interview_questions = prefetched["interview_questions"]
+                st.session_state.questions_match = prefetched["questions_match"]
+                st.markdown(st.session_state.interview_questions)
+            else:
+                st.session_state.interview_questions = st.write_stream(
+                    generate_interview_questions(
+                        st.session_state.resume_content, st.session_state.resume_analysis, stream=True,
+                        job_description=job_description
+                    )
+                )
+            checkpoint("generate_questions", interview_questions=st.session_state.interview_questions)
+            if not job_description and not st.session_state.get("questions_match"):
+                get_resume_index().add(
+                    st.session_state.resume_content, index_scope(),
+                    interview_questions=st.session_state.interview_questions
+                )
+        else:
+            st.markdown(st.session_state.interview_questions)
         
         if st.button("Continue to Interview", key="to_interview"):
-            st.session_state.current_step = "interview"
+            go_to("interview")
             st.rerun()
     
     # Interview step
@@ -406,81 +922,70 @@ def main():
         st.title("Interview Chat")
         st.markdown("Chat with our AI interviewer to help enhance your resume. The interviewer will ask questions to gather additional information about your experience and skills.")
         
-        # Initialize interviewer if not already done
-        if "interviewer" not in st.session_state:
-            st.session_state.interviewer = ChatInterviewer(
-                st.session_state.resume_content,
-                st.session_state.resume_analysis,
-                st.session_state.interview_questions
+        # The interviewer is rebuilt from the stored state for every turn; the insight
+        # tracker is local to this process (without it, insights come from one full pass)
+        if "insight_tracker" not in st.session_state:
+            st.session_state.insight_tracker = IncrementalInsights(
+                focus_resume(st.session_state.resume_content, target_job_description())
             )
         
         # Initialize chat history if empty
         if not st.session_state.interview_chat_history:
             initial_message = {
                 "role": "assistant", 
-                "content": "Hi there! I'm Alex, and I'll be chatting with you today to help enhance your resume. I've reviewed your current resume and noticed some areas we could expand on. Let's have a conversation about your experience and skills to gather more details. How does that sound?"
+                "content": opening_message()
             }
             st.session_state.interview_chat_history.append(initial_message)
+            persist(chat_history=st.session_state.interview_chat_history)
         
-        # Display chat history
-        for message in st.session_state.interview_chat_history:
-            if message["role"] == "user":
-                st.chat_message("user").write(message["content"])
-            else:
-                st.chat_message("assistant").write(message["content"])
-        
-        # Chat input
-        user_input = st.chat_input("Type your message here...")
-        if user_input:
-            # Add user message to chat history
-            st.session_state.interview_chat_history.append({"role": "user", "content": user_input})
-            st.chat_message("user").write(user_input)
-            
-            # Get response from interviewer
-            with st.spinner("Thinking..."):
-                response = st.session_state.interviewer.get_response(st.session_state.interview_chat_history)
-            
-            # Add assistant response to chat history
-            st.session_state.interview_chat_history.append({"role": "assistant", "content": response})
-            st.chat_message("assistant").write(response)
-            
-            # Force UI refresh
-            st.rerun()
-        
-        # Finish interview button
-        col1, col2, col3 = st.columns([1, 1, 1])
-        with col2:
-            if len(st.session_state.interview_chat_history) > 3:  # At least 2 user responses
-                if st.button("Finish Interview", key="finish_interview"):
-                    st.session_state.current_step = "enhancement"
-                    st.rerun()
+        # Only the chat area reruns per message
+        render_interview_chat()
     
     # Enhancement step
     elif st.session_state.current_step == "enhancement":
         st.title("Resume Enhancement")
         
-        if not st.session_state.interview_insights:
-            with st.spinner("Generating insights from interview..."):
-                st.session_state.interview_insights = generate_insights(
-                    st.session_state.resume_content, 
-                    st.session_state.interview_chat_history
-                )
-        
         st.markdown("### Insights from Interview")
-        st.markdown(st.session_state.interview_insights)
+        if not st.session_state.interview_insights and "insight_tracker" in st.session_state:
+            # Insights were gathered during the interview; only the last exchange may still be in flight
+            with st.spinner("Finalizing interview insights..."):
+                try:
+                    st.session_state.interview_insights = st.session_state.insight_tracker.result()
+                except Exception:
+                    # Fall back to a full pass over the transcript below
+                    st.session_state.interview_insights = None
+            if st.session_state.interview_insights:
+                checkpoint("generate_insights", interview_insights=st.session_state.interview_insights)
         
-        if not st.session_state.enhanced_resume:
-            with st.spinner("Creating enhanced resume..."):
-                st.session_state.enhanced_resume = enhance_resume(
-                    st.session_state.resume_content,
-                    st.session_state.interview_insights
+        if not st.session_state.interview_insights:
+            st.session_state.interview_insights = st.write_stream(
+                generate_insights(
+                    focus_resume(st.session_state.resume_content, target_job_description()),
+                    st.session_state.interview_chat_history,
+                    stream=True
                 )
+            )
+            checkpoint("generate_insights", interview_insights=st.session_state.interview_insights)
+        else:
+            st.markdown(st.session_state.interview_insights)
         
         st.markdown("### Enhanced Resume Draft")
+        if not st.session_state.enhanced_resume:
+            with st.spinner("Enhancing the resume section by section..."):
+                enhanced = enhance_resume(
+                    st.session_state.resume_content, st.session_state.interview_insights,
+                    job_description=target_job_description()
+                )
+            st.session_state.enhanced_resume = enhanced["resume"]
+            checkpoint("enhance_resume", enhanced_resume=st.session_state.enhanced_resume)
         st.markdown(st.session_state.enhanced_resume)
+        # Verification only needs the draft, so it runs while the user reads it
+        prefetch_verification(
+            st.session_state.resume_content, st.session_state.enhanced_resume, st.session_state.interview_chat_history
+        )
         
         if st.button("Continue to Verification", key="to_verification"):
-            st.session_state.current_step = "verification"
+            go_to("verification")
             st.rerun()
     
     # Verification step
@@ -488,27 +993,62 @@ def main():
         st.title("Resume Verification")
         
         if not st.session_state.verification_result:
-            with st.spinner("Verifying enhanced resume for accuracy..."):
-                st.session_state.verification_result = verify_resume(
+            verification = claim_stage(
+                "verification",
+                fingerprint(
                     st.session_state.resume_content,
-                    st.session_state.enhanced_resume
-                )
-                
-                # Check if verification result contains a corrected resume
-                # This is a simple heuristic - if the verification result is long, it likely contains a corrected resume
-                if len(st.session_state.verification_result.split()) > 200:
-                    # Extract the corrected resume from the verification result
-                    st.session_state.enhanced_resume = st.session_state.verification_result
-                    st.session_state.verification_result = "The enhanced resume has been verified and corrected for accuracy."
+                    st.session_state.enhanced_resume,
+                    st.session_state.interview_chat_history
+                ),
+                "Verifying new claims..."
+            )
+            if verification is None:
+                with st.spinner("Verifying new claims..."):
+                    verification = verify_resume(
+                        st.session_state.resume_content,
+                        st.session_state.enhanced_resume,
+                        st.session_state.interview_chat_history
+                    )
+            finish_verification(verification)
         
         st.markdown("### Verification Result")
         st.markdown(st.session_state.verification_result)
+        if st.session_state.get("verification_tokens"):
+            prompt_tokens, full_prompt_tokens = st.session_state.verification_tokens
+            st.caption(f"Verifier prompt: {prompt_tokens} tokens (both full resumes: about {full_prompt_tokens})")
         
         st.markdown("### Final Enhanced Resume")
         st.markdown(st.session_state.enhanced_resume)
+        prefetch_pdf(st.session_state.enhanced_resume)
+        
+        # Revising one section re-enhances and re-verifies that section only
+        with st.expander("Revise a section"):
+            section_titles = [section.title for section in segment_resume(st.session_state.resume_content)]
+            section_title = st.selectbox("Section", section_titles, key="revision_section")
+            revisions = st.session_state.setdefault("section_revisions", {})
+            revision = st.text_area("What should change?", value=revisions.get(section_title, ""),
+                                    key=f"revision_text_{section_title}")
+            if st.button("Update Section", key="revise_section") and revision.strip():
+                revisions[section_title] = revision.strip()
+                persist(section_revisions=revisions)
+                with st.spinner(f"Updating {section_title}..."):
+                    enhanced = enhance_resume(
+                        st.session_state.resume_content, st.session_state.interview_insights, revisions,
+                        target_job_description()
+                    )
+                    checkpoint("enhance_resume", enhanced_resume=enhanced["resume"])
+                    finish_verification(verify_resume(
+                        st.session_state.resume_content, enhanced["resume"], st.session_state.interview_chat_history
+                    ))
+                st.session_state.revision_summary = (
+                    f"Re-enhanced {len(enhanced['regenerated'])} of {len(enhanced['sections'])} sections"
+                )
+                st.rerun()
+            if st.session_state.get("revision_summary"):
+                st.caption(st.session_state.revision_summary)
         
         if st.button("Continue to Download", key="to_download"):
-            st.session_state.current_step = "download"
+            go_to("download")
             st.rerun()
     
     # Download step
@@ -550,6 +1090,11 @@ def main():
         # Start over button
         if st.button("Start Over with a New Resume", key="start_over"):
             # Reset the state
+            if "insight_tracker" in st.session_state:
+                st.session_state.insight_tracker.close()
+            # Cancels whatever is still running for the old resume
+            get_stage_registry().close(st.session_state.session_id)
+            session_store.delete(st.session_state.session_id)
             for key in list(st.session_state.keys()):
                 if key != 'api_key':
                     del st.session_state[key]
@@ -561,6 +1106,8 @@ def main():
             st.session_state.enhanced_resume = None
             st.session_state.verification_result = None
             st.session_state.current_step = "upload"
+            # Start a fresh checkpointed session
+            st.query_params["sid"] = uuid.uuid4().hex
             st.rerun()
 
 if __name__ == "__main__":
@@ -0,0 +1,424 @@
+"""
+Near-duplicate detection for resumes, to reuse an earlier analysis.
+
+Many resumes are template-derived or lightly edited versions of one another.
+They miss the exact-match LLM cache, yet their analysis and interview
+questions barely differ. ``ResumeIndex`` keeps a MinHash signature of every
+analyzed resume:
+
+- the text is lower-cased and cut into overlapping word shingles
+  (``RESUME_INDEX_SHINGLE_WORDS`` words each)
+- ``NUM_PERMUTATIONS`` seeded hash functions give one minimum each; the
+  share of equal minimums between two signatures estimates the Jaccard
+  similarity of their shingle sets
+- the signature is cut into ``BANDS`` bands, and resumes sharing any band
+  are the candidates, so a lookup is a few dict lookups however many
+  resumes are indexed (locality-sensitive hashing)
+
+Entries are scoped to the user who produced them (``scope_key``, a hash of
+their API key): a lookup only sees that user's earlier resumes, so one
+person's analysis never reaches another person's prompt. Without a scope
+the index is not used.
+
+``find`` returns the most similar earlier resume of the same scope at or
+above ``RESUME_INDEX_THRESHOLD`` together with its analysis and questions.
+``update_analysis`` and ``update_questions`` then send the model only the
+earlier result (one id per line), the diff and the changed sections, and ask
+for a structured list of edits (replace, remove or insert a line), which
+``apply_edits`` merges into the earlier result locally. Results produced that
+way are not indexed again, so updates never build on updates. Resubmitting
+the exact same text is left to the LLM cache. Signatures are memoized by
+text, so the lookups for the analysis, the questions and the final ``add``
+of one resume compute it once.
+
+Entries live in a local SQLite file so they survive restarts, and the least
+recently used ones are evicted above ``RESUME_INDEX_MAX_ENTRIES``.
+"""
+
+import difflib
+import hashlib
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, List, Literal, NamedTuple, Optional, Tuple
+
+from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.prompts import ChatPromptTemplate
+from pydantic import BaseModel, Field
+
+from resume_sections import Section, segment_resume
+
+DEFAULT_INDEX_PATH = os.environ.get("RESUME_INDEX_PATH", ".resume_index.sqlite3")
+DEFAULT_MAX_ENTRIES = int(os.environ.get("RESUME_INDEX_MAX_ENTRIES", "2000"))
+DEFAULT_THRESHOLD = float(os.environ.get("RESUME_INDEX_THRESHOLD", "0.75"))
+SHINGLE_WORDS = int(os.environ.get("RESUME_INDEX_SHINGLE_WORDS", "3"))
+# 16 bands of 4 rows: resumes with a similarity of 0.75 become candidates with a probability above 0.99
+NUM_PERMUTATIONS = 64
+BANDS = 16
+ROWS = NUM_PERMUTATIONS // BANDS
+
+MERSENNE_PRIME = (1 << 61) - 1
+# Fixed seed, so signatures stored by one process stay comparable in the next
+_rng = random.Random(20240611)
+_PERMUTATIONS = [(_rng.randrange(1, MERSENNE_PRIME), _rng.randrange(MERSENNE_PRIME)) for _ in range(NUM_PERMUTATIONS)]
+WORD = re.compile(r"[a-z0-9]+")
+NUMBERED_ITEM = re.compile(r"^(\s*)\d+([.)]\s)")
+ITEM_ID = re.compile(r"^\s*\[\d+\]\s*")
+
+
+Entry = Tuple[str, str]  # (scope, key)
+
+
+class ResumeMatch(NamedTuple):
+    key: str
+    similarity: float
+    resume_content: str
+    resume_analysis: Optional[str]
+    interview_questions: Optional[str]
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def scope_key(api_key: Optional[str]) -> Optional[str]:
+    """The index scope of the user with ``api_key``, or None without one; the key itself is never stored"""
+    return text_key(f"resume-index\0{api_key}") if api_key else None
+
+
+def shingles(text: str, size: int = SHINGLE_WORDS) -> set:
+    """Hashes of the overlapping ``size``-word shingles of ``text``"""
+    words = WORD.findall(text.lower())
+    if not words:
+        return set()
+    return {
+        int.from_bytes(hashlib.blake2b(" ".join(words[i:i + size]).encode("utf-8"), digest_size=8).digest(), "big")
+        for i in range(max(len(words) - size + 1, 1))
+    }
+
+
+@lru_cache(maxsize=256)
+def signature(text: str) -> Optional[Tuple[int, ...]]:
+    """MinHash signature of ``text``, or None if it has no words; memoized by content"""
+    hashes = [value % MERSENNE_PRIME for value in shingles(text)]
+    if not hashes:
+        return None
+    return tuple(min((a * value + b) % MERSENNE_PRIME for value in hashes) for a, b in _PERMUTATIONS)
+
+
+def similarity(first: Tuple[int, ...], second: Tuple[int, ...]) -> float:
+    """Estimated Jaccard similarity of the texts behind two signatures"""
+    return sum(x == y for x, y in zip(first, second)) / NUM_PERMUTATIONS
+
+
+def _bands(scope: str, sig: Tuple[int, ...]) -> List[Tuple[str, int, int]]:
+    return [(scope, band, hash(sig[band * ROWS:(band + 1) * ROWS])) for band in range(BANDS)]
+
+
+class ResumeIndex:
+    """MinHash/LSH index of analyzed resumes per user scope, backed by SQLite, with LRU eviction"""
+
+    def __init__(self, path: str = DEFAULT_INDEX_PATH, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 threshold: float = DEFAULT_THRESHOLD):
+        self.path = path
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.lookups = 0
+        self.matches = 0
+        self.evictions = 0
+        # (scope, key) -> signature in least-recently-used order, and (scope, band, band hash) -> entries
+        self._signatures: "OrderedDict[Entry, Tuple[int, ...]]" = OrderedDict()
+        self._buckets: Dict[Tuple[str, int, int], set] = {}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(resume_index)")]
+        if columns and "scope" not in columns:
+            # Entries from before scoping cannot be attributed to a user
+            self._conn.execute("DROP TABLE resume_index")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS resume_index (
+                scope TEXT NOT NULL,
+                key TEXT NOT NULL,
+                signature TEXT NOT NULL,
+                resume_content TEXT NOT NULL,
+                resume_analysis TEXT,
+                interview_questions TEXT,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (scope, key)
+            )"""
+        )
+        self._conn.commit()
+        for scope, key, sig in self._conn.execute(
+            "SELECT scope, key, signature FROM resume_index ORDER BY last_used ASC"
+        ):
+            self._insert((scope, key), tuple(json.loads(sig)))
+
+    def find(self, resume_content: str, scope: Optional[str]) -> Optional[ResumeMatch]:
+        """Return the most similar other resume of ``scope`` at or above the threshold"""
+        if not scope:
+            return None
+        return self.find_signature(scope, text_key(resume_content), signature(resume_content))
+
+    def find_signature(self, scope: str, key: str, sig: Optional[Tuple[int, ...]]) -> Optional[ResumeMatch]:
+        """``find`` for a precomputed key and signature"""
+        with self._lock:
+            self.lookups += 1
+            if sig is None:
+                return None
+            candidates = set()
+            for band in _bands(scope, sig):
+                candidates |= self._buckets.get(band, set())
+            candidates.discard((scope, key))
+            scored = [(similarity(sig, self._signatures[candidate]), candidate) for candidate in candidates]
+            scored = [(score, candidate) for score, candidate in scored if score >= self.threshold]
+            if not scored:
+                return None
+            score, best = max(scored)
+            row = self._conn.execute(
+                "SELECT resume_content, resume_analysis, interview_questions FROM resume_index "
+                "WHERE scope = ? AND key = ?",
+                best,
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE resume_index SET last_used = ? WHERE scope = ? AND key = ?", (time.time(), *best)
+            )
+            self._conn.commit()
+            self._signatures.move_to_end(best)
+            self.matches += 1
+        return ResumeMatch(best[1], score, *row)
+
+    def add(self, resume_content: str, scope: Optional[str], resume_analysis: Optional[str] = None,
+            interview_questions: Optional[str] = None) -> None:
+        """Index a resume of ``scope``, or update the analysis and questions stored for it
+
+        Only pass results written from the full resume, not updates of a near-duplicate's results.
+        """
+        sig = signature(resume_content)
+        if sig is None or not scope:
+            return
+        entry = (scope, text_key(resume_content))
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                """INSERT INTO resume_index
+                       (scope, key, signature, resume_content, resume_analysis, interview_questions, last_used)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(scope, key) DO UPDATE SET
+                       resume_analysis = COALESCE(excluded.resume_analysis, resume_analysis),
+                       interview_questions = COALESCE(excluded.interview_questions, interview_questions),
+                       last_used = excluded.last_used""",
+                (*entry, json.dumps(sig), resume_content, resume_analysis, interview_questions, now),
+            )
+            self._insert(entry, sig)
+            overflow = list(self._signatures)[:max(len(self._signatures) - self.max_entries, 0)]
+            for stale in overflow:
+                self._remove(stale)
+                self._conn.execute("DELETE FROM resume_index WHERE scope = ? AND key = ?", stale)
+                self.evictions += 1
+            self._conn.commit()
+
+    def _insert(self, entry: Entry, sig: Tuple[int, ...]) -> None:
+        self._remove(entry)
+        self._signatures[entry] = sig
+        for band in _bands(entry[0], sig):
+            self._buckets.setdefault(band, set()).add(entry)
+
+    def _remove(self, entry: Entry) -> None:
+        sig = self._signatures.pop(entry, None)
+        if sig is None:
+            return
+        for band in _bands(entry[0], sig):
+            bucket = self._buckets.get(band)
+            if bucket is not None:
+                bucket.discard(entry)
+                if not bucket:
+                    del self._buckets[band]
+
+    def stats(self) -> Dict[str, Any]:
+        """Return lookup/match counters and the number of indexed resumes"""
+        with self._lock:
+            return {
+                "entries": len(self._signatures),
+                "lookups": self.lookups,
+                "matches": self.matches,
+                "match_rate": self.matches / self.lookups if self.lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+
+_index: Optional[ResumeIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_resume_index() -> ResumeIndex:
+    """Return the process-wide resume index, loading it on first use"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = ResumeIndex()
+        return _index
+
+
+def resume_changes(previous: str, current: str) -> str:
+    """The lines that differ between two versions of a resume, as a unified diff with one line of context"""
+    diff = difflib.unified_diff(previous.splitlines(), current.splitlines(), n=1, lineterm="")
+    # Drop the "---"/"+++" file header
+    return "\n".join(list(diff)[2:])
+
+
+DIFF_NOTE = "Lines starting with '-' were removed, lines starting with '+' were added, the rest are unchanged context."
+
+
+class ResultEdit(BaseModel):
+    """One change to a line of an earlier analysis or question list"""
+    action: Literal["replace", "remove", "insert"] = Field(
+        description="replace the line with text, remove it, or insert text as a new line after it"
+    )
+    item_id: int = Field(description="The id of the line to change; 0 with insert adds a line at the top")
+    text: str = Field(default="", description="For replace and insert: the full new line, in the same format")
+
+
+class ResultEdits(BaseModel):
+    """The edits that bring an earlier result up to date; none if it still applies"""
+    edits: List[ResultEdit] = Field(default_factory=list)
+
+
+def _item_lines(text: str) -> List[int]:
+    # Line indexes of the items; item id n is the n-th non-empty line
+    return [index for index, line in enumerate(text.splitlines()) if line.strip()]
+
+
+def numbered_items(text: str) -> str:
+    """``text`` with an id in brackets before every non-empty line, for the model to refer to"""
+    lines = text.splitlines()
+    return "\n".join(f"[{item_id}] {lines[index]}" for item_id, index in enumerate(_item_lines(text), 1))
+
+
+def apply_edits(previous: str, edits: List[ResultEdit], renumber: bool = False) -> str:
+    """Merge ``edits`` into ``previous``; edits of unknown lines and empty replacements are ignored
+
+    ``renumber`` numbers the numbered lines of the result 1, 2, 3, ... again, for question lists.
+    """
+    lines = previous.splitlines()
+    items = _item_lines(previous)
+    replaced: Dict[int, Optional[str]] = {}
+    inserted: Dict[int, List[str]] = {}
+    for edit in edits:
+        text = ITEM_ID.sub("", edit.text).rstrip()
+        if edit.action == "insert" and edit.item_id == 0:
+            position = -1
+        elif 1 <= edit.item_id <= len(items):
+            position = items[edit.item_id - 1]
+        else:
+            continue
+        if edit.action == "remove":
+            replaced[position] = None
+        elif text.strip() and edit.action == "insert":
+            inserted.setdefault(position, []).append(text)
+        elif text.strip():
+            replaced[position] = text
+    merged = list(inserted.get(-1, []))
+    for index, line in enumerate(lines):
+        line = replaced.get(index, line)
+        if line is not None:
+            merged.append(line)
+        merged.extend(inserted.get(index, []))
+    if renumber:
+        number = 0
+        for index, line in enumerate(merged):
+            if NUMBERED_ITEM.match(line):
+                number += 1
+                merged[index] = NUMBERED_ITEM.sub(lambda match: f"{match.group(1)}{number}{match.group(2)}", line, 1)
+    return "\n".join(merged)
+
+
+def changed_sections(previous: str, current: str) -> List[Section]:
+    """The sections (one per role in experience-like sections) of ``current`` that are not in ``previous``"""
+    earlier = {section.text for section in segment_resume(previous)}
+    return [section for section in segment_resume(current) if section.text not in earlier]
+
+
+def _changes(match: ResumeMatch, resume_content: str) -> str:
+    sections = "\n\n".join(section.text for section in changed_sections(match.resume_content, resume_content))
+    return f"""Changes to the resume. {DIFF_NOTE}
+{resume_changes(match.resume_content, resume_content)}
+
+The changed sections as they are now:
+{sections or "None; only lines were removed."}"""
+
+
+EDIT_RULES = """Each line of your earlier {result} has an id in brackets. Return only the edits that bring it up to date:
+1. replace a line the changes make inaccurate, with the updated line
+2. remove a line the changes make obsolete
+3. insert a new line after a given id (0 for the top) for new or changed content
+Write new lines in the format of the lines around them, without the id. Return no edits if the {result} still applies."""
+
+
+def delta_analysis_prompt(match: ResumeMatch, resume_content: str) -> ChatPromptTemplate:
+    """Prompt for the edits that update the analysis of a near-duplicate resume to the changes in this one"""
+    return ChatPromptTemplate.from_messages([
+        SystemMessage(content=f"""You are a professional resume analyzer. You are given your analysis of an earlier version of a resume and the changes made to the resume since.
+
+{EDIT_RULES.format(result="analysis")}
+
+Do not add points about weak verbs, bullets without numbers or overlong bullets, missing sections or date gaps; automated checks report those separately."""),
+        HumanMessage(content=f"""Analysis of the earlier version:
+{numbered_items(match.resume_analysis)}
+
+{_changes(match, resume_content)}""")
+    ])
+
+
+def delta_questions_prompt(match: ResumeMatch, resume_content: str) -> ChatPromptTemplate:
+    """Prompt for the edits that update the interview questions of a near-duplicate resume to the changes in this one"""
+    return ChatPromptTemplate.from_messages([
+        SystemMessage(content=f"""You are an expert interview question generator. You are given the interview questions you wrote for an earlier version of a resume and the changes made to the resume since.
+
+{EDIT_RULES.format(result="question list")}
+
+Replace questions the changes already answer, add questions about new or changed content that needs clarification or expansion, and keep 8-10 questions in total. Numbering is fixed afterwards."""),
+        HumanMessage(content=f"""Interview questions for the earlier version:
+{numbered_items(match.interview_questions)}
+
+{_changes(match, resume_content)}""")
+    ])
+
+
+def _merged(previous: str, edits: Optional[ResultEdits], renumber: bool = False) -> str:
+    # Structured output can come back as None; the near-duplicate's result is then kept as it is
+    return apply_edits(previous, edits.edits if edits is not None else [], renumber)
+
+
+def update_analysis(llm, match: ResumeMatch, resume_content: str, config: Optional[Dict[str, Any]] = None) -> str:
+    """The analysis of ``match`` updated to the changes in ``resume_content``"""
+    chain = delta_analysis_prompt(match, resume_content) | llm.with_structured_output(ResultEdits)
+    return _merged(match.resume_analysis, chain.invoke({}, config=config))
+
+
+async def aupdate_analysis(llm, match: ResumeMatch, resume_content: str,
+                           config: Optional[Dict[str, Any]] = None) -> str:
+    """Async counterpart of ``update_analysis``"""
+    chain = delta_analysis_prompt(match, resume_content) | llm.with_structured_output(ResultEdits)
+    return _merged(match.resume_analysis, await chain.ainvoke({}, config=config))
+
+
+def update_questions(llm, match: ResumeMatch, resume_content: str, config: Optional[Dict[str, Any]] = None) -> str:
+    """The interview questions of ``match`` updated to the changes in ``resume_content``, renumbered"""
+    chain = delta_questions_prompt(match, resume_content) | llm.with_structured_output(ResultEdits)
+    return _merged(match.interview_questions, chain.invoke({}, config=config), renumber=True)
+
+
+async def aupdate_questions(llm, match: ResumeMatch, resume_content: str,
+                            config: Optional[Dict[str, Any]] = None) -> str:
+    """Async counterpart of ``update_questions``"""
+    chain = delta_questions_prompt(match, resume_content) | llm.with_structured_output(ResultEdits)
+    return _merged(match.interview_questions, await chain.ainvoke({}, config=config), renumber=True)
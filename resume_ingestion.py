@@ -0,0 +1,124 @@
+"""
+In-memory resume ingestion.
+
+Uploads are parsed straight from the upload buffer; nothing is written to a
+temporary file. PDFs above a page threshold are extracted in parallel across
+worker processes (pypdf is pure Python, so threads would serialize on the
+GIL). Size and page limits are enforced before any text is extracted, and the
+extracted text is cached by content hash, so Streamlit reruns and repeat
+uploads of the same file skip extraction entirely. pypdf is imported with the
+first PDF, so the app starts without it.
+"""
+
+import hashlib
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import BinaryIO, List, Optional, Union
+
+MAX_UPLOAD_BYTES = int(os.environ.get("RESUME_MAX_BYTES", str(10 * 1024 * 1024)))
+MAX_PAGES = int(os.environ.get("RESUME_MAX_PAGES", "50"))
+PARALLEL_PAGE_THRESHOLD = int(os.environ.get("RESUME_PARALLEL_PAGES", "8"))
+MAX_WORKERS = min(4, os.cpu_count() or 1)
+CACHE_SIZE = 128
+
+ResumeSource = Union[bytes, bytearray, memoryview, BinaryIO]
+
+
+class ResumeIngestionError(ValueError):
+    """Raised when an upload is too large, too long or cannot be parsed"""
+
+
+_text_cache: "OrderedDict[str, str]" = OrderedDict()
+_cache_lock = threading.Lock()
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Spawn rather than fork: the Streamlit server process is multi-threaded
+            _executor = ProcessPoolExecutor(
+                max_workers=MAX_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _executor
+
+
+def _extract_page_range(data: bytes, start: int, stop: int) -> List[str]:
+    """Extract the text of pages ``start:stop`` (runs in a worker process)"""
+    from pypdf import PdfReader
+
+    reader = PdfReader(BytesIO(data))
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def _extract_pdf(stream: BinaryIO, view: memoryview) -> str:
+    from pypdf import PdfReader
+
+    try:
+        reader = PdfReader(stream)
+        page_count = len(reader.pages)
+    except Exception as e:
+        raise ResumeIngestionError(f"Could not read the PDF: {e}") from e
+    if page_count > MAX_PAGES:
+        raise ResumeIngestionError(f"The resume has {page_count} pages; the limit is {MAX_PAGES}.")
+
+    if page_count < PARALLEL_PAGE_THRESHOLD or MAX_WORKERS < 2:
+        pages = [page.extract_text() or "" for page in reader.pages]
+    else:
+        # Each worker re-opens the document from its own copy of the bytes
+        data = view.tobytes()
+        chunk = -(-page_count // MAX_WORKERS)
+        futures = [
+            _get_executor().submit(_extract_page_range, data, start, min(start + chunk, page_count))
+            for start in range(0, page_count, chunk)
+        ]
+        pages = [text for future in futures for text in future.result()]
+    return "\n".join(pages)
+
+
+def extract_resume_text(source: ResumeSource, file_extension: str) -> str:
+    """Return the text of a PDF or TXT resume held in memory
+
+    ``source`` is raw bytes or a seekable binary buffer such as Streamlit's
+    ``UploadedFile``, which is read in place without copying.
+    """
+    file_extension = file_extension.lower().lstrip(".")
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        stream = BytesIO(bytes(source))
+    elif hasattr(source, "getbuffer"):
+        stream = source
+    else:
+        stream = BytesIO(source.read())
+    view = stream.getbuffer()
+    try:
+        if view.nbytes > MAX_UPLOAD_BYTES:
+            raise ResumeIngestionError(
+                f"The file is {view.nbytes / 1024 / 1024:.1f} MB; the limit is {MAX_UPLOAD_BYTES / 1024 / 1024:.0f} MB."
+            )
+        key = f"{file_extension}:{hashlib.sha256(view).hexdigest()}"
+        with _cache_lock:
+            if key in _text_cache:
+                _text_cache.move_to_end(key)
+                return _text_cache[key]
+
+        if file_extension == "pdf":
+            stream.seek(0)
+            text = _extract_pdf(stream, view)
+        elif file_extension == "txt":
+            text = str(view, "utf-8-sig", errors="replace")
+        else:
+            raise ResumeIngestionError(f"Unsupported file type: .{file_extension}")
+    finally:
+        view.release()
+
+    with _cache_lock:
+        _text_cache[key] = text
+        while len(_text_cache) > CACHE_SIZE:
+            _text_cache.popitem(last=False)
+    return text
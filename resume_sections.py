@@ -0,0 +1,168 @@
+"""
+Splitting resumes into sections.
+
+Resumes are split at their section headings (markdown headings, ALL CAPS
+lines and the usual section names such as "Experience" or "Publications").
+``chunk_resume`` packs consecutive sections into chunks under a token limit.
+Sections that are still too long, and documents without recognisable
+headings, fall back to ``RecursiveCharacterTextSplitter`` (imported only then).
+``segment_resume`` goes one level further and splits experience-like sections
+into one entry per role, and numbers repeated titles so that every segment's
+title identifies it.
+"""
+
+import re
+from typing import TYPE_CHECKING, List, NamedTuple
+
+from interview_context import count_tokens
+
+if TYPE_CHECKING:
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+SECTION_NAMES = {
+    "summary", "professional summary", "profile", "objective", "about", "about me",
+    "experience", "work experience", "professional experience", "employment", "employment history",
+    "work history", "education", "skills", "technical skills", "core competencies", "projects",
+    "publications", "selected publications", "presentations", "talks", "conference presentations",
+    "awards", "honors", "honors and awards", "grants", "funding", "certifications", "licenses",
+    "teaching", "teaching experience", "research", "research experience", "research interests",
+    "service", "professional service", "volunteer", "volunteering", "leadership", "languages",
+    "interests", "references", "patents", "memberships", "affiliations", "training", "courses",
+}
+
+# Sections made of entries (a header line followed by bullets) rather than free text
+ENTRY_SECTIONS = ("experience", "employment", "work history", "projects", "teaching", "research",
+                  "leadership", "volunteer", "service")
+
+MARKDOWN_HEADING = re.compile(r"^\s*#{1,3}\s+(.+?)\s*#*\s*$")
+BULLET = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+")
+MAX_HEADING_WORDS = 5
+MAX_TITLE_CHARS = 80
+
+
+class Section(NamedTuple):
+    title: str
+    text: str
+
+
+def section_heading(line: str) -> str:
+    """Return the section title if ``line`` is a section heading, else an empty string"""
+    match = MARKDOWN_HEADING.match(line)
+    if match:
+        return match.group(1).strip("*_ ")
+    stripped = line.strip().strip("*_").rstrip(":").strip()
+    if not stripped or len(stripped.split()) > MAX_HEADING_WORDS:
+        return ""
+    if stripped.lower() in SECTION_NAMES:
+        return stripped
+    letters = [char for char in stripped if char.isalpha()]
+    if len(letters) >= 4 and all(char.isupper() for char in letters):
+        return stripped
+    return ""
+
+
+def split_sections(text: str) -> List[Section]:
+    """Split a resume at its section headings; text before the first heading becomes "Header" """
+    sections, title, lines = [], "Header", []
+    for line in text.splitlines():
+        heading = section_heading(line)
+        if heading:
+            if any(part.strip() for part in lines):
+                sections.append(Section(title, "\n".join(lines).strip()))
+            title, lines = heading, [line]
+        else:
+            lines.append(line)
+    if any(part.strip() for part in lines):
+        sections.append(Section(title, "\n".join(lines).strip()))
+    return sections
+
+
+def split_entries(section: Section) -> List[Section]:
+    """Split an experience-like section into one section per role
+
+    An entry starts at a non-bullet line that follows the previous entry's
+    bullets; the section heading stays with the first entry.
+    """
+    entries, current, in_bullets = [], [], False
+    for line in section.text.splitlines():
+        is_bullet = bool(BULLET.match(line))
+        if line.strip() and not is_bullet and in_bullets:
+            entries.append(current)
+            current, in_bullets = [], False
+        current.append(line)
+        in_bullets = in_bullets or is_bullet
+    entries.append(current)
+    if len(entries) < 2:
+        return [section]
+
+    result = []
+    for entry in entries:
+        # Entries are titled by their first line that is not the section heading
+        header = next(
+            (line.strip() for line in entry if line.strip() and not section_heading(line)), section.title
+        )
+        title = f"{section.title}: {header.strip('#*_ ')}"[:MAX_TITLE_CHARS]
+        result.append(Section(title, "\n".join(entry).strip()))
+    return result
+
+
+def unique_titles(sections: List[Section]) -> List[Section]:
+    """Number repeated titles ("Experience: Engineer", "Experience: Engineer (2)", ...) so each one is unique"""
+    used, result = set(), []
+    for section in sections:
+        title, number = section.title, 1
+        while title in used:
+            number += 1
+            title = f"{section.title} ({number})"
+        used.add(title)
+        result.append(section._replace(title=title))
+    return result
+
+
+def segment_resume(text: str) -> List[Section]:
+    """Split a resume into sections, with one section per role in experience-like sections
+
+    Titles are unique within the resume, so they can key the sections' insights, revisions and results.
+    """
+    segments = []
+    for section in split_sections(text):
+        if any(name in section.title.lower() for name in ENTRY_SECTIONS):
+            segments.extend(split_entries(section))
+        else:
+            segments.append(section)
+    return unique_titles(segments)
+
+
+def _splitter(max_tokens: int) -> "RecursiveCharacterTextSplitter":
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    return RecursiveCharacterTextSplitter(
+        chunk_size=max_tokens, chunk_overlap=max_tokens // 20, length_function=count_tokens
+    )
+
+
+def chunk_resume(text: str, max_tokens: int) -> List[str]:
+    """Split a resume into chunks of at most ``max_tokens``, keeping sections together where possible"""
+    sections = split_sections(text)
+    if len(sections) < 2:
+        return _splitter(max_tokens).split_text(text)
+
+    chunks, current, current_tokens = [], [], 0
+    for section in sections:
+        tokens = count_tokens(section.text)
+        if tokens > max_tokens:
+            if current:
+                chunks.append("\n\n".join(current))
+                current, current_tokens = [], 0
+            pieces = _splitter(max_tokens).split_text(section.text)
+            chunks.append(pieces[0])
+            chunks.extend(f"{section.title} (continued)\n{piece}" for piece in pieces[1:])
+        elif current and current_tokens + tokens > max_tokens:
+            chunks.append("\n\n".join(current))
+            current, current_tokens = [section.text], tokens
+        else:
+            current.append(section.text)
+            current_tokens += tokens
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
@@ -0,0 +1,299 @@
+"""
+Section-level, incremental enhancement and verification.
+
+The resume is segmented into stable sections (header, summary, one section
+per role, education, skills, ...; see ``resume_sections.segment_resume``).
+Each interview insight is assigned to the sections it is about, and that
+assignment is the dependency map. A section's enhancement depends only on its
+own text, its insights and any revision the user asked for. Its verification
+depends only on its enhanced text and the sources (original resume and
+interview answers).
+
+Both stages are cached per section under a hash of those inputs, so a
+revision to one job entry re-enhances and re-verifies that entry alone.
+Sections whose inputs changed are processed concurrently.
+
+With a target job description, only the sections relevant to it (see
+``relevance.select_sections``) are rewritten, towards that role; the others
+are kept as they are unless the user asked for a revision.
+"""
+
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Union
+
+from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables.config import get_executor_for_config
+
+from async_agents import gather_bounded
+from claim_check import averify_claims, candidate_answers, report, verify_claims
+from interview_context import count_tokens, keywords
+from relevance import job_summary, select_sections
+from resume_sections import Section, segment_resume
+
+MAX_CONCURRENCY = int(os.environ.get("SECTION_MAX_CONCURRENCY", "4"))
+CACHE_SIZE = 512
+
+INSIGHT_ITEM = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+(.*\S)")
+INSIGHT_HEADING = re.compile(r"^\s*#{1,6}\s+(.*\S)|^\s*\*\*(.+?)\*\*\s*:?\s*$")
+
+# Insight categories that belong to a section with a matching title
+CATEGORY_SECTIONS = {
+    "skill": ("skill", "competenc", "technolog"),
+    "education": ("education", "certification", "training", "course"),
+}
+
+
+class SectionResult(NamedTuple):
+    title: str
+    text: str
+    cached: bool
+
+
+class _SectionJob(NamedTuple):
+    title: str
+    key: str
+    prompt: ChatPromptTemplate
+
+
+_enhanced_cache: "OrderedDict[str, str]" = OrderedDict()
+_verified_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _cache_get(cache: OrderedDict, key: str):
+    with _cache_lock:
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+    return None
+
+
+def _cache_put(cache: OrderedDict, key: str, value) -> None:
+    with _cache_lock:
+        cache[key] = value
+        while len(cache) > CACHE_SIZE:
+            cache.popitem(last=False)
+
+
+def _digest(*parts: str) -> str:
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+def parse_insights(insights: str) -> List[tuple]:
+    """Return the (category, item) pairs of a bulleted insights document"""
+    items, category = [], ""
+    for line in (insights or "").splitlines():
+        heading = INSIGHT_HEADING.match(line)
+        if heading:
+            category = (heading.group(1) or heading.group(2)).lower()
+            continue
+        item = INSIGHT_ITEM.match(line)
+        if item:
+            items.append((category, item.group(1)))
+    return items
+
+
+def assign_insights(sections: List[Section], insights: str) -> Dict[str, List[str]]:
+    """Map each section title to the insights it depends on
+
+    Skills and education insights go to the matching section when there is one;
+    every other insight goes to the section it shares the most keywords with,
+    or to the summary (else the header) when it matches none.
+    """
+    assigned: Dict[str, List[str]] = {section.title: [] for section in sections}
+    section_keywords = {section.title: keywords(section.text) for section in sections}
+    fallback = next(
+        (section.title for section in sections if "summary" in section.title.lower() or "profile" in section.title.lower()),
+        sections[0].title if sections else None
+    )
+    for category, item in parse_insights(insights):
+        target = None
+        for category_name, title_parts in CATEGORY_SECTIONS.items():
+            if category_name in category:
+                target = next(
+                    (section.title for section in sections if any(part in section.title.lower() for part in title_parts)),
+                    None
+                )
+        if target is None:
+            item_keywords = keywords(item)
+            overlap, title = max(
+                ((len(item_keywords & section_keywords[section.title]), section.title) for section in sections),
+                default=(0, None)
+            )
+            target = title if overlap else fallback
+        if target is not None:
+            assigned[target].append(item)
+    return assigned
+
+
+def section_prompt(outline: str, section: Section, insights: List[str], revision: str,
+                   target: str = "") -> ChatPromptTemplate:
+    request = f"\n\nThe candidate asked for this change to the section:\n{revision}" if revision else ""
+    role = f"\n\nThe candidate is applying for this role; emphasize what is relevant to it:\n{target}" if target else ""
+    return ChatPromptTemplate.from_messages([
+        SystemMessage(content="""You are a professional resume writer rewriting one section of a resume. Your task is to:
+1. Improve the section using the interview insights listed for it
+2. Keep the section's heading, structure and format
+3. Add specific achievements, metrics, and skills from the insights
+4. Strengthen the language and impact of bullet points
+5. Ensure the section remains factual and truthful - don't invent information
+
+Output only the rewritten section."""),
+        HumanMessage(content=f"""Sections of the full resume:
+{outline}
+
+Section to rewrite:
+{section.text}
+
+Interview insights for this section:
+{chr(10).join(f"- {item}" for item in insights) or "None."}{request}{role}""")
+    ])
+
+
+def _run_concurrently(function, items: List[Any], config: Dict[str, Any]) -> List[Any]:
+    # Same executor as Runnable.batch: bounded by max_concurrency, carries the tracing context
+    with get_executor_for_config(config) as executor:
+        return list(executor.map(function, items))
+
+
+def _plan_enhancement(original_resume: str, insights: str, revisions: Dict[str, str],
+                      job_description: Optional[str] = None) -> List[Union[SectionResult, _SectionJob]]:
+    """Return a reusable ``SectionResult`` or the ``_SectionJob`` to run for each section"""
+    sections = segment_resume(original_resume)
+    assigned = assign_insights(sections, insights)
+    outline = "\n".join(f"- {section.title}" for section in sections)
+    target = job_summary(job_description) if job_description and job_description.strip() else ""
+    focus = {section.title for section in select_sections(sections, job_description).kept} if target else None
+    plan = []
+    for section in sections:
+        revision = revisions.get(section.title, "")
+        # Contact details are only rewritten when there is something to add
+        if section.title == "Header" and not assigned[section.title] and not revision:
+            plan.append(SectionResult(section.title, section.text, True))
+            continue
+        # Sections unrelated to the target role are kept as they are
+        if focus is not None and section.title not in focus and not revision:
+            plan.append(SectionResult(section.title, section.text, True))
+            continue
+        key = _digest(section.text, *assigned[section.title], revision, target)
+        cached = _cache_get(_enhanced_cache, key)
+        if cached is not None:
+            plan.append(SectionResult(section.title, cached, True))
+        else:
+            plan.append(_SectionJob(
+                section.title, key, section_prompt(outline, section, assigned[section.title], revision, target)
+            ))
+    return plan
+
+
+def _enhanced(job: _SectionJob, text: str) -> SectionResult:
+    text = text.strip()
+    _cache_put(_enhanced_cache, job.key, text)
+    return SectionResult(job.title, text, False)
+
+
+def _enhancement_result(results: List[SectionResult]) -> Dict[str, Any]:
+    return {
+        "resume": "\n\n".join(result.text for result in results),
+        "sections": results,
+        "regenerated": [result.title for result in results if not result.cached],
+    }
+
+
+def enhance_sections(llm, original_resume: str, insights: str, revisions: Optional[Dict[str, str]] = None,
+                     config: Optional[Dict[str, Any]] = None, job_description: Optional[str] = None) -> Dict[str, Any]:
+    """Enhance the resume section by section, reusing cached sections whose inputs are unchanged
+
+    ``revisions`` maps section titles (unique per resume, see ``segment_resume``) to a change the
+    candidate asked for.
+    ``job_description`` limits the rewrite to the sections relevant to that role.
+    """
+    chain = llm | StrOutputParser()
+    config = {**(config or {}), "max_concurrency": MAX_CONCURRENCY}
+
+    def enhance(item: Union[SectionResult, _SectionJob]) -> SectionResult:
+        if isinstance(item, SectionResult):
+            return item
+        return _enhanced(item, chain.invoke(item.prompt.format_messages(), config=config))
+
+    plan = _plan_enhancement(original_resume, insights, revisions or {}, job_description)
+    return _enhancement_result(_run_concurrently(enhance, plan, config))
+
+
+async def aenhance_sections(llm, original_resume: str, insights: str, revisions: Optional[Dict[str, str]] = None,
+                            config: Optional[Dict[str, Any]] = None,
+                            job_description: Optional[str] = None) -> Dict[str, Any]:
+    """Async counterpart of ``enhance_sections``"""
+    chain = llm | StrOutputParser()
+
+    async def enhance(item: Union[SectionResult, _SectionJob]) -> SectionResult:
+        if isinstance(item, SectionResult):
+            return item
+        return _enhanced(item, await chain.ainvoke(item.prompt.format_messages(), config=config))
+
+    plan = _plan_enhancement(original_resume, insights, revisions or {}, job_description)
+    return _enhancement_result(await gather_bounded((enhance(item) for item in plan), MAX_CONCURRENCY))
+
+
+def _verification_result(original_resume: str, enhanced_resume: str, sections: List[Section],
+                         results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "final_resume": "\n\n".join(result["final_resume"] for result in results),
+        "verification_result": report(
+            sum(result["claims_checked"] for result in results),
+            [item for result in results for item in result["flagged"]],
+            [item for result in results for item in result["applied"]],
+            [item for result in results for item in result["unverified"]],
+        ),
+        "reverified": [section.title for section, result in zip(sections, results) if not result["cached"]],
+        "prompt_tokens": sum(result["prompt_tokens"] for result in results if not result["cached"]),
+        "full_prompt_tokens": count_tokens(original_resume) + count_tokens(enhanced_resume),
+    }
+
+
+def verify_sections(llm, original_resume: str, enhanced_resume: str, chat_history: List[Dict[str, str]],
+                    config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Verify the enhanced resume section by section, re-checking only sections whose text changed"""
+    sections = segment_resume(enhanced_resume)
+    sources = _digest(original_resume, candidate_answers(chat_history))
+    config = {**(config or {}), "max_concurrency": MAX_CONCURRENCY}
+
+    def verify(section: Section) -> Dict[str, Any]:
+        key = _digest(section.text, sources)
+        cached = _cache_get(_verified_cache, key)
+        if cached is not None:
+            return {**cached, "cached": True}
+        result = verify_claims(llm, original_resume, section.text, chat_history, config=config)
+        # A failed verification is retried next time
+        if not result["unverified"]:
+            _cache_put(_verified_cache, key, result)
+        return {**result, "cached": False}
+
+    return _verification_result(original_resume, enhanced_resume, sections, _run_concurrently(verify, sections, config))
+
+
+async def averify_sections(llm, original_resume: str, enhanced_resume: str, chat_history: List[Dict[str, str]],
+                           config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Async counterpart of ``verify_sections``"""
+    sections = segment_resume(enhanced_resume)
+    sources = _digest(original_resume, candidate_answers(chat_history))
+
+    async def verify(section: Section) -> Dict[str, Any]:
+        key = _digest(section.text, sources)
+        cached = _cache_get(_verified_cache, key)
+        if cached is not None:
+            return {**cached, "cached": True}
+        result = await averify_claims(llm, original_resume, section.text, chat_history, config=config)
+        # A failed verification is retried next time
+        if not result["unverified"]:
+            _cache_put(_verified_cache, key, result)
+        return {**result, "cached": False}
+
+    results = await gather_bounded((verify(section) for section in sections), MAX_CONCURRENCY)
+    return _verification_result(original_resume, enhanced_resume, sections, results)
@@ -0,0 +1,225 @@
+"""
+Externalized, size-bounded session state for the Streamlit app.
+
+``st.session_state`` only lives as long as one browser connection to one
+process. The pipeline state of a session (resume, analysis, questions,
+transcript, the interviewer's running memory, the current step, ...) is kept
+here instead, keyed by session id, as zlib-compressed JSON:
+
+- ``MemorySessionStore`` keeps it in process, bounded by a session count
+- ``SQLiteSessionStore`` keeps it in a local SQLite file, so a restarted
+  process, or any replica sharing the file, can pick a session up
+
+Every session is capped at ``SESSION_MAX_BYTES`` compressed, and sessions
+idle for longer than ``SESSION_IDLE_SECONDS`` are evicted. The backend is
+chosen with ``SESSION_STORE`` ("sqlite" or "memory").
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+SESSION_STORE = os.environ.get("SESSION_STORE", "sqlite")
+SESSION_STORE_PATH = os.environ.get("SESSION_STORE_PATH", ".sessions.sqlite3")
+MAX_SESSION_BYTES = int(os.environ.get("SESSION_MAX_BYTES", str(512 * 1024)))
+MAX_SESSIONS = int(os.environ.get("SESSION_STORE_MAX_SESSIONS", "10000"))
+IDLE_TIMEOUT_SECONDS = float(os.environ.get("SESSION_IDLE_SECONDS", str(7 * 24 * 3600)))
+EVICT_INTERVAL_SECONDS = 60
+
+
+class SessionTooLargeError(ValueError):
+    """Raised when a session's state would exceed the per-session size cap"""
+
+
+def encode(values: Dict[str, Any]) -> bytes:
+    return zlib.compress(json.dumps(values, separators=(",", ":")).encode("utf-8"))
+
+
+def decode(data: bytes) -> Dict[str, Any]:
+    return json.loads(zlib.decompress(data).decode("utf-8"))
+
+
+class SessionStore:
+    """Compact session state with a per-session size cap and idle eviction
+
+    Backends implement ``_read``, ``_write``, ``_delete``, ``_evict`` and ``_usage``.
+    """
+
+    def __init__(self, max_bytes: int = MAX_SESSION_BYTES, max_sessions: int = MAX_SESSIONS,
+                 idle_timeout: float = IDLE_TIMEOUT_SECONDS):
+        self.max_bytes = max_bytes
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.saved = 0
+        self.rejected = 0
+        self.evicted = 0
+        self._last_eviction = 0.0
+        self._lock = threading.Lock()
+
+    def load(self, session_id: str) -> Dict[str, Any]:
+        """Return the stored state of a session, or an empty dict for an unknown one"""
+        with self._lock:
+            data = self._read(session_id, time.time())
+        return decode(data) if data else {}
+
+    def update(self, session_id: str, values: Dict[str, Any]) -> Dict[str, Any]:
+        """Merge ``values`` into a session's state and return the result
+
+        Raises ``SessionTooLargeError`` and keeps the previous state if the
+        result would not fit the size cap.
+        """
+        now = time.time()
+        with self._lock:
+            data = self._read(session_id, now)
+            merged = {**(decode(data) if data else {}), **values}
+            data = encode(merged)
+            if len(data) > self.max_bytes:
+                self.rejected += 1
+                raise SessionTooLargeError(
+                    f"Session state is {len(data)} bytes compressed, over the {self.max_bytes} byte limit"
+                )
+            self._write(session_id, data, now)
+            self.saved += 1
+            if now - self._last_eviction > EVICT_INTERVAL_SECONDS:
+                self._last_eviction = now
+                self.evicted += self._evict(now)
+        return merged
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._delete(session_id)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the number and total size of stored sessions and the save/reject/evict counters"""
+        with self._lock:
+            sessions, size = self._usage()
+        return {
+            "sessions": sessions,
+            "bytes": size,
+            "saved": self.saved,
+            "rejected": self.rejected,
+            "evicted": self.evicted,
+        }
+
+
+class MemorySessionStore(SessionStore):
+    """In-process backend, least recently used sessions dropped above ``max_sessions``"""
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._sessions: "OrderedDict[str, list]" = OrderedDict()
+
+    def _read(self, session_id: str, now: float) -> Optional[bytes]:
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return None
+        entry[1] = now
+        self._sessions.move_to_end(session_id)
+        return entry[0]
+
+    def _write(self, session_id: str, data: bytes, now: float) -> None:
+        self._sessions[session_id] = [data, now]
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.evicted += 1
+
+    def _delete(self, session_id: str) -> None:
+        self._sessions.pop(session_id, None)
+
+    def _evict(self, now: float) -> int:
+        # Entries are kept in least-recently-used order, so stop at the first fresh one
+        evicted = 0
+        while self._sessions:
+            session_id, (_, last_used) = next(iter(self._sessions.items()))
+            if now - last_used <= self.idle_timeout:
+                break
+            del self._sessions[session_id]
+            evicted += 1
+        return evicted
+
+    def _usage(self) -> tuple:
+        return len(self._sessions), sum(len(data) for data, _ in self._sessions.values())
+
+
+class SQLiteSessionStore(SessionStore):
+    """SQLite backend shared by every process (and replica) that opens the same file"""
+
+    def __init__(self, path: str = SESSION_STORE_PATH, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                data BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_last_used ON sessions (last_used)")
+        self._conn.commit()
+
+    def _read(self, session_id: str, now: float) -> Optional[bytes]:
+        row = self._conn.execute("SELECT data FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        if row is None:
+            return None
+        self._conn.execute("UPDATE sessions SET last_used = ? WHERE session_id = ?", (now, session_id))
+        self._conn.commit()
+        return row[0]
+
+    def _write(self, session_id: str, data: bytes, now: float) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO sessions (session_id, data, size, last_used) VALUES (?, ?, ?, ?)",
+            (session_id, data, len(data), now),
+        )
+        self._conn.commit()
+
+    def _delete(self, session_id: str) -> None:
+        self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+        self._conn.commit()
+
+    def _evict(self, now: float) -> int:
+        """Drop idle sessions, then the least recently used ones above the session bound"""
+        evicted = max(self._conn.execute(
+            "DELETE FROM sessions WHERE last_used < ?", (now - self.idle_timeout,)
+        ).rowcount, 0)
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()
+        overflow = count - self.max_sessions
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM sessions WHERE session_id IN "
+                "(SELECT session_id FROM sessions ORDER BY last_used ASC LIMIT ?)",
+                (overflow,),
+            )
+            evicted += overflow
+        self._conn.commit()
+        return evicted
+
+    def _usage(self) -> tuple:
+        count, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM sessions").fetchone()
+        return count, size
+
+
+_store: Optional[SessionStore] = None
+_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    """Return the process-wide session store configured by ``SESSION_STORE``"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            if SESSION_STORE == "memory":
+                _store = MemorySessionStore()
+            elif SESSION_STORE == "sqlite":
+                _store = SQLiteSessionStore()
+            else:
+                raise ValueError(f"Unknown SESSION_STORE {SESSION_STORE!r}; use 'sqlite' or 'memory'")
+        return _store
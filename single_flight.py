@@ -0,0 +1,217 @@
+"""
+Single-flight deduplication of in-progress agent calls.
+
+The LLM cache only helps once a call has finished. A Streamlit rerun fired
+while a call is still running (a double click, a widget change, a second
+tab) asks for the same prompt again, and so do identical resumes uploaded by
+different users at the same moment. ``SingleFlight`` tracks the calls in
+flight by their cache key, so a caller asking for a key that is already
+being generated attaches to that call instead of starting another:
+
+- invoked calls coalesce in the LLM cache: a lookup that misses makes the
+  caller the key's leader, and the cache update that stores its result ends
+  the flight; the waiting callers then read the result from the cache
+- streamed calls are produced on a background thread into a shared buffer
+  that every caller reads from the start, so a rerun that abandons a stream
+  picks it up again instead of paying for it twice
+
+``SingleFlight`` is also a callback handler on every pooled model: when a
+leader's call fails, ``on_llm_error`` ends its flight and the waiting callers
+make the call themselves. A cache flight that has not ended after
+``SINGLE_FLIGHT_TIMEOUT_SECONDS`` is given up on the same way.
+"""
+
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+TIMEOUT_SECONDS = float(os.environ.get("SINGLE_FLIGHT_TIMEOUT_SECONDS", "120"))
+
+# The flight led by the model call running in this context, ended by on_llm_error if that call fails
+_lease: contextvars.ContextVar[Optional[Tuple[str, "Flight"]]] = contextvars.ContextVar(
+    "single_flight_lease", default=None
+)
+
+
+class Flight:
+    """One in-progress call: its outcome and, for streamed calls, the chunks produced so far"""
+
+    def __init__(self, streamed: bool = False):
+        self.streamed = streamed
+        self.started = time.monotonic()
+        # Resolves to True once the result is available, False if the call failed
+        self.future: Future = Future()
+        self.chunks: List[str] = []
+        self.error: Optional[BaseException] = None
+        self._condition = threading.Condition()
+
+    def append(self, chunk: str) -> None:
+        with self._condition:
+            self.chunks.append(chunk)
+            self._condition.notify_all()
+
+    def end(self, error: Optional[BaseException] = None) -> bool:
+        """Mark the call finished; returns False if it already was"""
+        with self._condition:
+            if self.future.done():
+                return False
+            self.error = error
+            self.future.set_result(error is None)
+            self._condition.notify_all()
+        return True
+
+    def expired(self, timeout: float) -> bool:
+        # Streams are produced by a thread of this process and always end
+        return not self.streamed and time.monotonic() - self.started > timeout
+
+    def tail(self) -> Iterator[str]:
+        """Yield every chunk of a streamed call, from the first, until it ends"""
+        position = 0
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: len(self.chunks) > position or self.future.done())
+                chunks = self.chunks[position:]
+                done = self.future.done()
+            position += len(chunks)
+            yield from chunks
+            if done and position == len(self.chunks):
+                return
+
+
+class SingleFlight(BaseCallbackHandler):
+    """Thread-safe registry of in-progress calls keyed by their LLM cache key"""
+
+    # Ends a failed leader's flight in the context that took the lease, also on the async path
+    run_inline = True
+
+    def __init__(self, timeout: float = TIMEOUT_SECONDS):
+        self.timeout = timeout
+        self._flights: Dict[str, Flight] = {}
+        self._counters: Dict[str, int] = {"leaders": 0, "coalesced": 0, "failed": 0, "expired": 0}
+        self._lock = threading.Lock()
+
+    def join(self, key: str, streamed: bool = False) -> Tuple[Flight, bool]:
+        """Return the flight for ``key`` and whether the caller leads it, starting one if there is none"""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None and not flight.expired(self.timeout):
+                self._counters["coalesced"] += 1
+                return flight, False
+            if flight is not None:
+                self._counters["expired"] += 1
+                flight.end(TimeoutError(f"Call for {key} did not finish within {self.timeout:g}s"))
+            flight = self._flights[key] = Flight(streamed)
+            self._counters["leaders"] += 1
+            return flight, True
+
+    def lead(self, key: str, flight: Flight) -> None:
+        """Tie ``flight`` to the model call about to run in this context"""
+        _lease.set((key, flight))
+
+    def finish(self, key: str, flight: Optional[Flight] = None, error: Optional[BaseException] = None) -> None:
+        """End ``flight`` (or whichever flight ``key`` has) and let the next caller start a new one"""
+        with self._lock:
+            current = self._flights.get(key)
+            if current is None or (flight is not None and current is not flight):
+                return
+            del self._flights[key]
+            if error is not None:
+                self._counters["failed"] += 1
+        current.end(error)
+
+    def wait(self, flight: Flight) -> bool:
+        """Wait for a cache flight; True if its result is now in the cache"""
+        remaining = max(flight.started + self.timeout - time.monotonic(), 0)
+        try:
+            return flight.future.result(remaining)
+        except FutureTimeoutError:
+            return False
+
+    async def await_flight(self, flight: Flight) -> bool:
+        """Async counterpart of ``wait``"""
+        remaining = max(flight.started + self.timeout - time.monotonic(), 0)
+        try:
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(flight.future)), remaining)
+        except asyncio.TimeoutError:
+            return False
+
+    def stream(self, key: str, read: Callable[..., Optional[str]], produce: Callable[[], Iterator[str]]) -> Iterator[str]:
+        """Stream the text for ``key``: from ``read()`` if cached, else from the single in-progress ``produce()``
+
+        ``produce`` runs on a background thread in the caller's context and is
+        expected to store its result where ``read`` finds it. ``read(False)``
+        re-reads without counting another cache miss.
+        """
+        cached = read()
+        while cached is None:
+            flight, leader = self.join(key, streamed=True)
+            if leader:
+                # The previous flight may have ended between the read and the join
+                cached = read(False)
+                if cached is not None:
+                    self.finish(key, flight)
+                    break
+                context = contextvars.copy_context()
+                threading.Thread(
+                    target=context.run, args=(self._produce, key, flight, produce), name="single-flight", daemon=True
+                ).start()
+            if not flight.streamed:
+                # An invoked call for the same prompt: its result will be in the cache
+                self.wait(flight)
+                cached = read(False)
+                continue
+            yielded = False
+            for chunk in flight.tail():
+                yielded = True
+                yield chunk
+            if flight.error is None:
+                return
+            if leader or yielded:
+                raise flight.error
+            # The stream failed before producing anything: read or lead again
+            cached = read(False)
+        yield cached
+
+    def _produce(self, key: str, flight: Flight, produce: Callable[[], Iterator[str]]) -> None:
+        try:
+            for chunk in produce():
+                flight.append(chunk)
+        except BaseException as error:
+            self.finish(key, flight, error)
+        else:
+            self.finish(key, flight)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        lease = _lease.get()
+        if lease is not None:
+            _lease.set(None)
+            self.finish(*lease, error=error)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return how many calls led a flight, how many attached to one, and how many are in flight"""
+        with self._lock:
+            stats = dict(self._counters)
+            stats["in_flight"] = len(self._flights)
+        calls = stats["leaders"] + stats["coalesced"]
+        stats["coalesced_rate"] = stats["coalesced"] / calls if calls else 0.0
+        return stats
+
+
+_single_flight: Optional[SingleFlight] = None
+_single_flight_lock = threading.Lock()
+
+
+def get_single_flight() -> SingleFlight:
+    """Return the process-wide single-flight registry, creating it on first use"""
+    global _single_flight
+    with _single_flight_lock:
+        if _single_flight is None:
+            _single_flight = SingleFlight()
+        return _single_flight
@@ -0,0 +1,182 @@
+"""
+Background execution of pipeline stages, ahead of the user.
+
+Most stages are deterministic once their inputs exist: the analysis only
+needs the uploaded resume, the questions and the interview greeting only the
+analysis, the verification only the enhanced draft. A stage can therefore be
+started as soon as its inputs are final, and its result is waiting when the
+user navigates to its page.
+
+``StageExecutor`` holds one session's stage futures outside the Streamlit
+script run, each tagged with a fingerprint of the stage's inputs:
+
+- ``start`` runs a stage unless it is already running or done for the same
+  inputs; starting it with different inputs cancels the old run and every
+  stage started after it, since later stages build on earlier results
+- ``claim`` waits for a stage's result and hands it over; ``None`` means the
+  stage was never started for these inputs, or failed, and the caller runs it
+  itself
+- ``cancel`` drops stages that are no longer wanted (e.g. on Start Over)
+
+Coroutine functions run on the agent event loop, so cancelling them also
+cancels their in-flight model requests. Plain functions (e.g. PDF rendering)
+run on a shared thread pool and can only be cancelled before they start.
+Executors are kept per session in a bounded registry; an evicted session's
+stages are cancelled. ``STAGE_PREFETCH=0`` turns speculative starts off.
+"""
+
+import asyncio
+import contextvars
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from async_agents import submit
+
+PREFETCH = os.environ.get("STAGE_PREFETCH", "1") != "0"
+MAX_WORKERS = int(os.environ.get("STAGE_MAX_WORKERS", "4"))
+MAX_SESSIONS = int(os.environ.get("STAGE_MAX_SESSIONS", "1000"))
+
+
+def fingerprint(*inputs: Any) -> str:
+    """Hash of a stage's inputs"""
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class StageExecutor:
+    """One session's background stages, keyed by stage name and input fingerprint"""
+
+    def __init__(self, registry: "StageRegistry"):
+        self._registry = registry
+        # stage -> (inputs fingerprint, future), in the order the stages were started
+        self._stages: "OrderedDict[str, Tuple[str, Future]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def start(self, stage: str, inputs: str, function: Callable[..., Any], *args: Any) -> Future:
+        """Run ``function(*args)`` as ``stage`` for the inputs fingerprinted as ``inputs``"""
+        with self._lock:
+            entry = self._stages.get(stage)
+            if entry is not None and entry[0] == inputs and not entry[1].cancelled():
+                return entry[1]
+            if entry is not None:
+                self._cancel_from(stage)
+            if asyncio.iscoroutinefunction(function):
+                future = submit(function(*args))
+            else:
+                # Run in the caller's context so the request keeps its rate limiter scope
+                future = self._registry.pool.submit(contextvars.copy_context().run, function, *args)
+            self._stages[stage] = (inputs, future)
+        self._registry.count("started")
+        return future
+
+    def pending(self, stage: str, inputs: str) -> bool:
+        """Whether ``stage`` is still running for these inputs"""
+        with self._lock:
+            entry = self._stages.get(stage)
+        return entry is not None and entry[0] == inputs and not entry[1].done()
+
+    def claim(self, stage: str, inputs: str, timeout: Optional[float] = None) -> Optional[Any]:
+        """Wait for the result of ``stage`` for these inputs and remove it from the executor"""
+        with self._lock:
+            entry = self._stages.get(stage)
+            if entry is None or entry[0] != inputs:
+                return None
+        try:
+            result = entry[1].result(timeout)
+        except Exception:
+            # Includes cancellation; the caller falls back to running the stage
+            self._registry.count("failed")
+            result = None
+        else:
+            self._registry.count("claimed")
+        with self._lock:
+            if self._stages.get(stage) is entry:
+                del self._stages[stage]
+        return result
+
+    def cancel(self, stage: Optional[str] = None) -> None:
+        """Cancel ``stage`` and the stages started after it, or every stage"""
+        with self._lock:
+            if stage is None:
+                self._cancel_from(next(iter(self._stages), None))
+            elif stage in self._stages:
+                self._cancel_from(stage)
+
+    def _cancel_from(self, stage: Optional[str]) -> None:
+        if stage is None:
+            return
+        names = list(self._stages)
+        for name in names[names.index(stage):]:
+            _, future = self._stages.pop(name)
+            if future.cancel():
+                self._registry.count("cancelled")
+
+    def running(self) -> int:
+        with self._lock:
+            return sum(not future.done() for _, future in self._stages.values())
+
+
+class StageRegistry:
+    """Bounded, thread-safe map of session id to ``StageExecutor`` with a shared thread pool"""
+
+    def __init__(self, max_sessions: int = MAX_SESSIONS, max_workers: int = MAX_WORKERS):
+        self.max_sessions = max_sessions
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="stages")
+        self._executors: "OrderedDict[str, StageExecutor]" = OrderedDict()
+        self._counters: Dict[str, int] = {"started": 0, "claimed": 0, "failed": 0, "cancelled": 0}
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> StageExecutor:
+        with self._lock:
+            executor = self._executors.get(session_id)
+            if executor is None:
+                executor = self._executors[session_id] = StageExecutor(self)
+            self._executors.move_to_end(session_id)
+            evicted = []
+            while len(self._executors) > self.max_sessions:
+                evicted.append(self._executors.popitem(last=False)[1])
+        for stale in evicted:
+            stale.cancel()
+        return executor
+
+    def close(self, session_id: str) -> None:
+        """Cancel a session's stages and forget it"""
+        with self._lock:
+            executor = self._executors.pop(session_id, None)
+        if executor is not None:
+            executor.cancel()
+
+    def count(self, counter: str) -> None:
+        with self._lock:
+            self._counters[counter] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return stage counters and the number of sessions and stages currently tracked"""
+        with self._lock:
+            executors = list(self._executors.values())
+            stats = dict(self._counters)
+        stats["sessions"] = len(executors)
+        stats["running"] = sum(executor.running() for executor in executors)
+        return stats
+
+
+_registry: Optional[StageRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_stage_registry() -> StageRegistry:
+    """Return the process-wide stage registry, creating it on first use"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = StageRegistry()
+        return _registry
+
+
+def get_stage_executor(session_id: str) -> StageExecutor:
+    """Shortcut for ``get_stage_registry().get(session_id)``"""
+    return get_stage_registry().get(session_id)
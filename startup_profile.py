@@ -0,0 +1,143 @@
+"""
+Cold-start profile of the Streamlit app.
+
+Runs the app's first script run (the upload page of a new session) in a fresh
+interpreter under ``python -X importtime`` and reports:
+
+- the wall time of that first run, and of a warm rerun
+- the modules the app imported, heaviest first by cumulative import time
+  (Streamlit itself is loaded beforehand, as the server does)
+- any of ``DEFERRED_MODULES`` that got loaded although no stage needs it yet
+
+The exit status is 1 if the first run is over the budget or loads a deferred
+module, so this doubles as a start-up latency regression check:
+
+    python startup_profile.py
+    python startup_profile.py --budget-ms 2000 --top 10 --json startup.json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+APP_PATH = str(Path(__file__).with_name("resume-enhancement-app.py"))
+BUDGET_MS = float(os.environ.get("STARTUP_BUDGET_MS", "2000"))
+MARKER = "startup-profile: app run starts"
+
+# Loaded by the stage that needs them, never by the upload page
+DEFERRED_MODULES = (
+    "langgraph",                  # workflow checkpoints, first completed stage
+    "langchain_openai",           # first real model
+    "openai",
+    "pypdf",                      # first PDF upload
+    "reportlab.pdfgen",           # first PDF download
+)
+
+
+def _first_run() -> Dict[str, Any]:
+    """Time the first and a second run of the app in this process (the child side)"""
+    from streamlit.testing.v1 import AppTest
+
+    sys.stderr.write(MARKER + "\n")
+    sys.stderr.flush()
+    at = AppTest.from_file(APP_PATH, default_timeout=120)
+    started = time.perf_counter()
+    at.run()
+    cold = time.perf_counter() - started
+    started = time.perf_counter()
+    at.run()
+    warm = time.perf_counter() - started
+    return {
+        "cold_ms": cold * 1000,
+        "warm_ms": warm * 1000,
+        "deferred_loaded": sorted(
+            name for name in DEFERRED_MODULES
+            if any(module == name or module.startswith(name + ".") for module in sys.modules)
+        ),
+        "exceptions": [e.message for e in at.exception],
+    }
+
+
+def parse_importtime(log: str) -> List[Dict[str, Any]]:
+    """Top-level imports after ``MARKER`` in ``-X importtime`` output, heaviest first"""
+    imports = []
+    started = False
+    for line in log.splitlines():
+        if line == MARKER:
+            started = True
+            continue
+        if not started or not line.startswith("import time:"):
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        # Skips the header; nested imports are indented below the module that triggered them
+        if not cumulative_us.strip().isdigit() or name.startswith("  "):
+            continue
+        imports.append({"module": name.strip(), "ms": int(cumulative_us) / 1000})
+    return sorted(imports, key=lambda entry: entry["ms"], reverse=True)
+
+
+def profile(budget_ms: float = BUDGET_MS) -> Dict[str, Any]:
+    """Profile the app's first run in a fresh interpreter and check it against the budget"""
+    with tempfile.TemporaryDirectory(prefix="resume-startup-") as workdir:
+        env = {
+            **os.environ,
+            "METRICS_PORT": "",
+            "AGENT_TRACE_PATH": "",
+            "LLM_CACHE_PATH": os.path.join(workdir, "llm_cache.sqlite3"),
+            "RESUME_INDEX_PATH": os.path.join(workdir, "resume_index.sqlite3"),
+            "WORKFLOW_CHECKPOINT_PATH": os.path.join(workdir, "checkpoints.sqlite3"),
+            "SESSION_STORE_PATH": os.path.join(workdir, "sessions.sqlite3"),
+        }
+        child = subprocess.run(
+            [sys.executable, "-X", "importtime", __file__, "--child"],
+            capture_output=True, text=True, env=env, cwd=workdir, check=True,
+        )
+    report = json.loads(child.stdout.strip().splitlines()[-1])
+    report["imports"] = parse_importtime(child.stderr)
+    report["import_ms"] = sum(entry["ms"] for entry in report["imports"])
+    report["budget_ms"] = budget_ms
+    report["passed"] = report["cold_ms"] <= budget_ms and not report["deferred_loaded"] and not report["exceptions"]
+    return report
+
+
+def print_report(report: Dict[str, Any], top: int) -> None:
+    print(f"First run {report['cold_ms']:.0f} ms (budget {report['budget_ms']:.0f} ms), "
+          f"of which imports {report['import_ms']:.0f} ms; warm rerun {report['warm_ms']:.0f} ms")
+    print(f"\n{'Heaviest imports':<40}{'ms':>10}")
+    for entry in report["imports"][:top]:
+        print(f"  {entry['module']:<38}{entry['ms']:>10.1f}")
+    if report["deferred_loaded"]:
+        print(f"\nLoaded at start-up but should be deferred: {', '.join(report['deferred_loaded'])}")
+    for message in report["exceptions"]:
+        print(f"\nThe app raised: {message}")
+    print("\nOK" if report["passed"] else "\nFAILED")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Profile the app's cold start and check it against a budget")
+    parser.add_argument("--budget-ms", type=float, default=BUDGET_MS, help="Maximum wall time of the first run")
+    parser.add_argument("--top", type=int, default=15, help="Number of imports to list")
+    parser.add_argument("--json", help="Also write the report to this file")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(_first_run()))
+        return 0
+
+    report = profile(args.budget_ms)
+    print_report(report, args.top)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0 if report["passed"] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
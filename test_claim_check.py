@@ -0,0 +1,49 @@
+from langchain_core.runnables import RunnableLambda
+
+from claim_check import ClaimVerdict, ClaimVerification, apply_verdicts, flag_lines, verify_claims
+
+ORIGINAL = """Jane Doe
+EXPERIENCE
+Engineer, Acme 2019 - 2024
+- Built the billing service"""
+
+ENHANCED = """Jane Doe
+EXPERIENCE
+Engineer, Acme 2019 - 2024
+- Built the billing service used by 40 teams
+- Cut costs by 30% with Kubernetes"""
+
+
+class VerdictModel:
+    """Chat model stand-in whose structured output is a fixed list of verdicts"""
+
+    def __init__(self, verdicts):
+        self.verdicts = verdicts
+
+    def with_structured_output(self, schema):
+        return RunnableLambda(lambda messages: ClaimVerification(verdicts=self.verdicts))
+
+
+def test_lines_without_a_verdict_are_unverified():
+    flagged = flag_lines(ORIGINAL, ENHANCED, [])["flagged"]
+    assert [item.line_id for item in flagged] == [3, 4]
+
+    result = apply_verdicts(ENHANCED, flagged, [ClaimVerdict(line_id=4, verdict="remove", reason="not in sources")])
+
+    assert [item.line_id for item, _ in result["applied"]] == [4]
+    assert [item.line_id for item in result["unverified"]] == [3]
+    assert "Kubernetes" not in result["final_resume"]
+    assert "used by 40 teams" in result["final_resume"]
+
+
+def test_partial_verdicts_are_reported_as_failed():
+    llm = VerdictModel([ClaimVerdict(line_id=4, verdict="remove", reason="not in sources")])
+
+    result = verify_claims(llm, ORIGINAL, ENHANCED, [])
+
+    assert [item.line_id for item in result["unverified"]] == [3]
+    report = result["verification_result"]
+    assert "❌ Removed: Cut costs by 30% with Kubernetes" in report
+    assert "⚠️ Verification failed: no verdicts came back for 1 lines" in report
+    assert report.rstrip().endswith("- Built the billing service used by 40 teams")
+    assert "✅ Kept: Built the billing service" not in report
@@ -0,0 +1,71 @@
+import asyncio
+
+import httpx
+from langchain_openai import ChatOpenAI
+
+from instrumentation import AgentMetrics, agent_config
+from rate_limiter import AsyncRateLimitedTransport, RateLimitedTransport, RateLimiter
+
+COMPLETION = {
+    "id": "chatcmpl-test",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "gpt-4o",
+    "choices": [{"index": 0, "message": {"role": "assistant", "content": "ok"}, "finish_reason": "stop"}],
+    "usage": {"prompt_tokens": 5, "completion_tokens": 1, "total_tokens": 6},
+}
+
+
+def throttle_once():
+    """Mock OpenAI handler answering the first request with 429 and the rest with a completion"""
+    requests = []
+
+    def handle(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if len(requests) == 1:
+            return httpx.Response(429, headers={"retry-after-ms": "0"}, json={"error": {"message": "slow down"}})
+        return httpx.Response(200, json=COMPLETION)
+    return handle, requests
+
+
+def model(metrics, **clients):
+    return ChatOpenAI(model="gpt-4o", api_key="test", max_retries=0, callbacks=[metrics], **clients)
+
+
+def test_transport_retry_is_counted_against_the_call():
+    handle, requests = throttle_once()
+    limiter, metrics = RateLimiter(), AgentMetrics(trace_path="")
+    client = httpx.Client(transport=RateLimitedTransport(httpx.MockTransport(handle), limiter))
+
+    model(metrics, http_client=client).invoke("hi", config=agent_config("analyzer", "session-1"))
+
+    assert len(requests) == 2
+    assert limiter.retries == 1
+    assert metrics._agents[("analyzer", "gpt-4o")]["retries"] == 1
+    assert [event["retries"] for event in metrics.session_timeline("session-1")] == [1]
+    assert 'resume_agent_retries_total{agent="analyzer",model="gpt-4o"} 1' in metrics.render_prometheus()
+
+
+def test_async_transport_retry_is_counted_against_the_call():
+    handle, requests = throttle_once()
+    limiter, metrics = RateLimiter(), AgentMetrics(trace_path="")
+    client = httpx.AsyncClient(transport=AsyncRateLimitedTransport(httpx.MockTransport(handle), limiter))
+
+    asyncio.run(model(metrics, http_async_client=client).ainvoke("hi", config=agent_config("analyzer", "session-2")))
+
+    assert len(requests) == 2
+    assert metrics._agents[("analyzer", "gpt-4o")]["retries"] == 1
+    assert [event["retries"] for event in metrics.session_timeline("session-2")] == [1]
+
+
+def test_call_without_retries_counts_none():
+    handle, _ = throttle_once()
+    metrics = AgentMetrics(trace_path="")
+    client = httpx.Client(transport=RateLimitedTransport(httpx.MockTransport(handle), RateLimiter()))
+    llm = model(metrics, http_client=client)
+
+    llm.invoke("hi", config=agent_config("analyzer"))
+    llm.invoke("again", config=agent_config("analyzer"))
+
+    totals = metrics._agents[("analyzer", "gpt-4o")]
+    assert (totals["calls"], totals["retries"]) == (2, 1)
@@ -0,0 +1,67 @@
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+from resume_sections import MAX_TITLE_CHARS, segment_resume
+from section_enhancement import _plan_enhancement, _SectionJob, assign_insights, enhance_sections
+
+RESUME = """Jane Doe
+jane@example.com
+
+EXPERIENCE
+Software Engineer
+Acme Corp, 2020 - 2024
+- Built the payments API
+Software Engineer
+Globex, 2016 - 2020
+- Maintained the reporting pipeline
+
+SKILLS
+Python, SQL"""
+
+INSIGHTS = """## Achievements
+- The payments API handled 2 million requests a day
+- The reporting pipeline cut monthly close from 5 days to 2"""
+
+
+def test_entries_with_the_same_heading_get_their_own_titles():
+    titles = [section.title for section in segment_resume(RESUME)]
+
+    assert titles == ["Header", "EXPERIENCE: Software Engineer", "EXPERIENCE: Software Engineer (2)", "SKILLS"]
+
+
+def test_titles_cut_to_the_same_text_are_numbered():
+    role = "Principal Engineer for Distributed Systems, Platform Infrastructure and Developer Tooling"
+    resume = f"EXPERIENCE\n{role}, Acme\n- Led the team\n{role}, Globex\n- Built the platform"
+
+    titles = [section.title for section in segment_resume(resume)]
+
+    assert len(set(titles)) == 2
+    assert titles[1] == titles[0] + " (2)"
+    assert len(titles[0]) == MAX_TITLE_CHARS
+
+
+def test_insights_go_to_the_entry_they_are_about():
+    assigned = assign_insights(segment_resume(RESUME), INSIGHTS)
+
+    assert assigned["EXPERIENCE: Software Engineer"] == ["The payments API handled 2 million requests a day"]
+    assert assigned["EXPERIENCE: Software Engineer (2)"] == ["The reporting pipeline cut monthly close from 5 days to 2"]
+
+
+def test_revision_applies_to_one_of_two_same_titled_entries():
+    revisions = {"EXPERIENCE: Software Engineer (2)": "Mention the move to Airflow"}
+
+    jobs = [item for item in _plan_enhancement(RESUME, INSIGHTS, revisions) if isinstance(item, _SectionJob)]
+    prompts = {job.title: job.prompt.format_messages()[1].content for job in jobs}
+
+    assert "Mention the move to Airflow" in prompts["EXPERIENCE: Software Engineer (2)"]
+    assert "Mention the move to Airflow" not in prompts["EXPERIENCE: Software Engineer"]
+
+
+def test_regenerated_lists_both_entries():
+    llm = GenericFakeChatModel(messages=iter([AIMessage(content=f"rewritten {i}") for i in range(10)]))
+
+    enhanced = enhance_sections(llm, RESUME, INSIGHTS + "\n\n## Skills\n- Airflow")
+
+    assert "EXPERIENCE: Software Engineer" in enhanced["regenerated"]
+    assert "EXPERIENCE: Software Engineer (2)" in enhanced["regenerated"]
+    assert len(enhanced["sections"]) == 4
@@ -0,0 +1,38 @@
+"""
+Import helper for the hyphenated scripts in this repository.
+
+``langgraph-implementation.py`` cannot be imported with a plain ``import``
+statement, so headless runners load it through ``load_workflow_module``.
+"""
+
+import importlib.util
+import os
+import sys
+import threading
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_load_lock = threading.RLock()
+
+
+def load_module(filename, module_name):
+    """Load a Python file from the repository directory as a module"""
+    # Batch workers load concurrently; without the lock a second thread could
+    # pick up the module from sys.modules before it finished executing
+    with _load_lock:
+        if module_name in sys.modules:
+            return sys.modules[module_name]
+        spec = importlib.util.spec_from_file_location(module_name, os.path.join(REPO_DIR, filename))
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[module_name] = module
+        try:
+            spec.loader.exec_module(module)
+        except Exception:
+            del sys.modules[module_name]
+            raise
+        return module
+
+
+def load_workflow_module():
+    """Load langgraph-implementation.py (node functions and ``build_resume_workflow``)"""
+    return load_module("langgraph-implementation.py", "langgraph_implementation")